@@ -1,9 +1,11 @@
 from http import HTTPStatus
+from bson.errors import InvalidId
 from quart import Blueprint, request, jsonify
 from app.midi.serializer import TrackSerializer
 from common.repository.mongo_repository_factory import MongoRepositoryFactory
 from worker.tasks import search
 import logging
+import time
 import common.config as config
 
 
@@ -18,24 +20,46 @@ async def midi_post():
     if not data:
         raise TypeError()
 
+    deadline = None
+    if "maxLatencyMs" in data:
+        max_latency = data["maxLatencyMs"]
+        # bool is an int, JSON true would pass as 1 ms
+        if (
+            isinstance(max_latency, bool)
+            or not isinstance(max_latency, (int, float))
+            or max_latency <= 0
+        ):
+            raise TypeError()
+        deadline = time.time() + max_latency / 1000
+
     job_repository = MongoRepositoryFactory().create_job_repository()
     job = job_repository.create_job()
     logger.debug(f"created job {job}")
-    search.send(data, job.id)
-    results = None
-    if job.results is not None:
-        results = [TrackSerializer.serialize_search_result(i) for i in job.results]
-    return jsonify({"id": job.id, "status": job.status.value, "results": results})
+    search.send(data, job.id, deadline)
+    return jsonify(TrackSerializer.serialize_job(job))
 
 
 @midi_bp.get("/<id>")
 async def midi_get(id: str):
     job_repository = MongoRepositoryFactory().create_job_repository()
     job = job_repository.get_job(id)
-    results = None
-    if job.results is not None:
-        results = [TrackSerializer.serialize_search_result(i) for i in job.results]
-    return jsonify({"id": job.id, "status": job.status.value, "results": results})
+    return jsonify(TrackSerializer.serialize_job(job))
+
+
+@midi_bp.post("/<id>/cancel")
+async def midi_cancel(id: str):
+    job_repository = MongoRepositoryFactory().create_job_repository()
+    try:
+        job_repository.get_job(id)
+    except InvalidId:
+        logger.debug(f"Received invalid job id {id}")
+        return "Invalid job id", HTTPStatus.BAD_REQUEST
+    except ValueError:
+        logger.debug(f"Received unknown job id {id}")
+        return "Unknown job", HTTPStatus.NOT_FOUND
+    job_repository.cancel_job(id)
+    logger.debug(f"cancelled job {id}")
+    return jsonify(TrackSerializer.serialize_job(job_repository.get_job(id)))
 
 
 @midi_bp.errorhandler(KeyError)
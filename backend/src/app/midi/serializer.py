@@ -1,4 +1,5 @@
-from typing import Union
+from typing import Any, Union
+from common.entity.job import Job
 from common.entity.search_result import SearchResult
 from common.entity.song import Note, SongMetadata, Track
 from math import floor
@@ -39,6 +40,19 @@ class TrackSerializer:
         s["similarity"] = search_result.similarity
         return s
 
+    @staticmethod
+    def serialize_job(job: Job) -> dict[str, Any]:
+        results = None
+        if job.results is not None:
+            results = [TrackSerializer.serialize_search_result(i) for i in job.results]
+        return {
+            "id": job.id,
+            "status": job.status.value,
+            "results": results,
+            "progress": job.progress,
+            "partial": job.partial,
+        }
+
     @staticmethod
     def serialize_note(note: Note) -> dict[str, Union[str, int]]:
         n: dict[str, Union[str, int]] = {
@@ -1,4 +1,5 @@
-from common.search_engine.strategy.similarity_strategy import SimilarityStrategy
+import dataclasses
+from common.search_engine.strategy.strategy_registry import strategy_registry
 from quart import Blueprint, jsonify
 import logging
 import common.config as config
@@ -13,7 +14,12 @@ similarity_strategy_bp = Blueprint(
 @similarity_strategy_bp.get("/")
 def strategy_get():
     res = []
-    for strategy in SimilarityStrategy.__subclasses__():
-        s = strategy()  # type: ignore
-        res.append({"name": s.name, "shortcut": s.shortcut})
+    for s in strategy_registry.strategies():
+        res.append(
+            {
+                "name": s.name,
+                "shortcut": s.shortcut,
+                "capabilities": dataclasses.asdict(s.capabilities),
+            }
+        )
     return jsonify(res)
@@ -14,6 +14,7 @@ QUERY_PREFIX = "query"
 VELOCITY_THRESHOLD = 0
 DEFAULT_PPQ = 480
 MEASURE_LENGTH = DEFAULT_PPQ * 4
+INDEXED_SEGMENT_LENGTHS = [MEASURE_LENGTH * i for i in range(1, 9)]
 CLOUD_STORAGE_CREDENTIALS = os.getenv("CLOUD_STORAGE_CREDENTIALS", "")
 BUCKET_NAME = os.getenv("BUCKET_NAME", "")
 REDIS_URL = os.getenv("REDIS_URL", "")
@@ -24,11 +25,35 @@ DEFAULT_STRATEGY = "lcs"
 USE_N_GRAM_PREP = False
 REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL", "")
 REDIS_QUEUE_URL = os.getenv("REDIS_QUEUE_URL", "")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 7 * 24 * 3600))
+RESULT_CACHE_PREFIX = "search_result:"
 PROCESS_COUNT = int(os.getenv("PROCESS_COUNT", 8))
+MIN_SONGS_PER_PROCESS = int(os.getenv("MIN_SONGS_PER_PROCESS", 50))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", 1024))
+# Batch size of strategies scoring segments one by one, smaller batches let the
+# cutoff of bounded strategies tighten sooner
+SERIAL_BATCH_SIZE = int(os.getenv("SERIAL_BATCH_SIZE", 64))
+# Compile similarity kernels with Numba, when it is installed
+USE_JIT = os.getenv("USE_JIT", "1") == "1"
+# Number of worker messages a single search is split into, 1 disables sharding
+SEARCH_SHARD_COUNT = int(os.getenv("SEARCH_SHARD_COUNT", 1))
+# Minimum number of seconds between partial result updates of a running job
+PROGRESS_UPDATE_INTERVAL = float(os.getenv("PROGRESS_UPDATE_INTERVAL", 1))
+# Searches reporting progress are split into more chunks, than there are processes
+PROGRESS_CHUNKS_PER_PROCESS = int(os.getenv("PROGRESS_CHUNKS_PER_PROCESS", 4))
+SEARCH_POOL_PRELOAD = ["common.search_engine.strategy.similarity_strategy"]
+SEGMENT_INDEX_PATH = os.getenv(
+    "SEGMENT_INDEX_PATH", os.path.join(MIDI_DIR, "index", "segment_index.pkl")
+)
+# Workers read songs from the packed corpus instead of MongoDB, if it exists
+PACKED_CORPUS_PATH = os.getenv("PACKED_CORPUS_PATH", os.path.join(MIDI_DIR, "packed"))
 MONGODB_URL = os.getenv("MONGODB_URL", "")
 SONGS_DB = "songs_db"
 SONGS_COLLECTION = "songs_collection"
 JOBS_COLLECTION = "jobs_collection"
+META_COLLECTION = "meta_collection"
+CORPUS_VERSION_KEY = "corpus_version"
 ANALYSIS_OUTPUT_DIR = "analysis_output"
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID", "")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET", "")
@@ -6,6 +6,7 @@ from common.entity.search_result import SearchResult
 
 class JobStatus(Enum):
     PENDING = "pending"
+    RUNNING = "running"
     COMPLETED = "completed"
 
 
@@ -14,3 +15,7 @@ class Job:
     id: str
     status: JobStatus
     results: Optional[list[SearchResult]]
+    # Percent of the corpus scanned, results of a running job are partial
+    progress: int = 0
+    # Set, when the search was stopped by its deadline or cancelled
+    partial: bool = False
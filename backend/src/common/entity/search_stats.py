@@ -0,0 +1,36 @@
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class SearchStats:
+    """Counters collected while processing a single query."""
+
+    candidates: int = 0
+    unique_candidates: int = 0
+    pruned_lb_kim: int = 0
+    pruned_lb_keogh: int = 0
+    # Songs or index rows left unsearched, when a search stopped early
+    skipped: int = 0
+
+    @property
+    def pruned(self) -> int:
+        return self.pruned_lb_kim + self.pruned_lb_keogh
+
+    def __add__(self, other: "SearchStats") -> "SearchStats":
+        return SearchStats(
+            **{
+                i.name: getattr(self, i.name) + getattr(other, i.name)
+                for i in fields(self)
+            }
+        )
+
+    def __str__(self) -> str:
+        unique = self.unique_candidates
+        unique_rate = unique / self.candidates if self.candidates else 0
+        pruned_rate = self.pruned / unique if unique else 0
+        return (
+            f"{self.candidates} candidates, {unique} unique ({unique_rate:.1%}), "
+            f"{self.pruned} pruned ({pruned_rate:.1%}): "
+            f"{self.pruned_lb_kim} by LB_Kim, {self.pruned_lb_keogh} by LB_Keogh, "
+            f"{self.skipped} skipped"
+        )
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional, Sequence, Union
 import numpy.typing as npt
 import numpy as np
 
@@ -11,10 +11,95 @@ class Note:
     pitch: int
 
 
-@dataclass
+# Times and lengths are in MIDI ticks, that may exceed the int32 range
+NOTE_DTYPE = np.dtype([("time", np.int64), ("length", np.int64), ("pitch", np.int64)])
+
+
 class Track:
-    notes: list[Note]
-    grid_length: int
+    """Notes of a track stored in one structured array of NOTE_DTYPE.
+
+    Tracks can be created from a list of Notes and notes recreates them, so
+    callers, that work with Note objects, keep working. times, lengths and
+    pitches are views of the array columns.
+    """
+
+    def __init__(
+        self, notes: Union[Sequence[Note], npt.NDArray[Any]], grid_length: int
+    ) -> None:
+        self.array = Track.__to_array(notes)
+        self.grid_length = grid_length
+
+    @staticmethod
+    def __to_array(notes: Union[Sequence[Note], npt.NDArray[Any]]) -> npt.NDArray[Any]:
+        if isinstance(notes, np.ndarray):
+            return notes.astype(NOTE_DTYPE, copy=False)
+        array = np.zeros(len(notes), dtype=NOTE_DTYPE)
+        array["time"] = [i.time for i in notes]
+        array["length"] = [i.length for i in notes]
+        array["pitch"] = [i.pitch for i in notes]
+        return array
+
+    @staticmethod
+    def from_columns(
+        times: npt.ArrayLike,
+        lengths: npt.ArrayLike,
+        pitches: npt.ArrayLike,
+        grid_length: int,
+    ) -> "Track":
+        times = np.asarray(times)
+        array = np.zeros(len(times), dtype=NOTE_DTYPE)
+        array["time"] = times
+        array["length"] = lengths
+        array["pitch"] = pitches
+        return Track(array, grid_length)
+
+    @property
+    def times(self) -> npt.NDArray[np.int64]:
+        return self.array["time"]
+
+    @property
+    def lengths(self) -> npt.NDArray[np.int64]:
+        return self.array["length"]
+
+    @property
+    def pitches(self) -> npt.NDArray[np.int64]:
+        return self.array["pitch"]
+
+    @property
+    def notes(self) -> list[Note]:
+        """New Note objects of the track, changing them does not change it."""
+        return [
+            Note(time, length, pitch)
+            for time, length, pitch in zip(
+                self.times.tolist(), self.lengths.tolist(), self.pitches.tolist()
+            )
+        ]
+
+    @notes.setter
+    def notes(self, notes: Sequence[Note]) -> None:
+        self.array = Track.__to_array(notes)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Track):
+            return NotImplemented
+        return self.grid_length == other.grid_length and np.array_equal(
+            self.array, other.array
+        )
+
+    def __repr__(self) -> str:
+        return f"Track(notes={self.notes!r}, grid_length={self.grid_length!r})"
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"array": self.array, "grid_length": self.grid_length}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        # Tracks pickled before the array representation store a list of Notes
+        notes = state["array"] if "array" in state else state["notes"]
+        self.array = Track.__to_array(notes)
+        self.grid_length = state["grid_length"]
 
 
 @dataclass
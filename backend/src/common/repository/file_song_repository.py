@@ -6,6 +6,7 @@ from common.util.parser import MidiParser
 from miditoolkit.midi import MidiFile
 import pickle
 import logging
+import uuid
 from common.entity.song import Song
 from common.repository.song_repository import SongRepository
 import common.config as config
@@ -30,6 +31,7 @@ class FileSongRepository(SongRepository):
         filename = get_filename_from_metadata(song.metadata, "pkl")
         obj = pickle.dumps(song)
         await self.file_storage.write(filename, obj)
+        await self.__bump_corpus_version()
 
     async def insert_many(self, songs: Iterable[Song]) -> None:
         keys = []
@@ -41,6 +43,7 @@ class FileSongRepository(SongRepository):
         await asyncio.gather(
             *[self.file_storage.write(k, pickle.dumps(v)) for k, v in zip(keys, songs)]
         )
+        await self.__bump_corpus_version()
 
     async def list_keys(self) -> list[str]:
         extensions = ("mid", "pkl")
@@ -143,3 +146,15 @@ class FileSongRepository(SongRepository):
     async def upsert(self, key: str, song: Song) -> None:
         obj = pickle.dumps(song)
         await self.file_storage.write(key, obj)
+        await self.__bump_corpus_version()
+
+    async def __bump_corpus_version(self) -> None:
+        # Written by other processes too, so a random token is used, not a counter
+        await self.file_storage.write(
+            config.CORPUS_VERSION_KEY, uuid.uuid4().hex.encode()
+        )
+
+    def get_corpus_version(self) -> str:
+        if config.CORPUS_VERSION_KEY not in self.file_storage.list_all():
+            return ""
+        return self.file_storage.read_sync(config.CORPUS_VERSION_KEY).decode()
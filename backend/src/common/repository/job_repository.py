@@ -17,6 +17,46 @@ class JobRepository(ABC):
 
     @abstractmethod
     def update_job(
-        self, id: str, status: JobStatus, results: Optional[list[SearchResult]]
+        self,
+        id: str,
+        status: JobStatus,
+        results: Optional[list[SearchResult]],
+        partial: bool = False,
     ) -> None:
         pass
+
+    @abstractmethod
+    def cancel_job(self, id: str) -> None:
+        """Ask the worker to stop the job's search, completed jobs are left
+        unchanged."""
+        pass
+
+    @abstractmethod
+    def is_cancelled(self, id: str) -> bool:
+        pass
+
+    @abstractmethod
+    def update_progress(
+        self, id: str, progress: int, results: list[SearchResult]
+    ) -> None:
+        """Mark the job as running with partial results.
+
+        Jobs, that are already completed, are left unchanged.
+        """
+        pass
+
+    @abstractmethod
+    def add_shard_results(
+        self,
+        id: str,
+        shard: int,
+        shard_count: int,
+        results: list[SearchResult],
+        partial: bool = False,
+    ) -> Optional[tuple[list[list[SearchResult]], bool]]:
+        """Store results of one shard of the job's search.
+
+        If this was the last shard to report, returns results of all shards
+        ordered by shard and whether any of them is partial, None otherwise.
+        """
+        pass
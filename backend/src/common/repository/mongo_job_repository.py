@@ -1,6 +1,6 @@
 import logging
-from typing import Optional
-from pymongo import MongoClient
+from typing import Any, Optional
+from pymongo import MongoClient, ReturnDocument
 from bson.objectid import ObjectId
 from common.entity.job import Job, JobStatus
 from common.entity.search_result import SearchResult
@@ -26,17 +26,92 @@ class MongoJobRepository(JobRepository):
 
     def create_job(self) -> Job:
         status = JobStatus.PENDING
-        res = self.__get_client().insert_one({"status": status.value, "results": None})
+        res = self.__get_client().insert_one(
+            {"status": status.value, "results": None, "progress": 0}
+        )
         job_id = str(res.inserted_id)
         return Job(job_id, status, None)
 
     def update_job(
-        self, id: str, status: JobStatus, results: Optional[list[SearchResult]]
+        self,
+        id: str,
+        status: JobStatus,
+        results: Optional[list[SearchResult]],
+        partial: bool = False,
     ) -> None:
         ser_res = None
         if results is not None:
             ser_res = [MongoSerializer.serialize_search_result(i) for i in results]
+        update: dict[str, Any] = {
+            "status": status.value,
+            "results": ser_res,
+            "partial": partial,
+        }
+        # Partial results keep the progress of the last update
+        if status == JobStatus.COMPLETED and not partial:
+            update["progress"] = 100
+        self.__get_client().update_one({"_id": ObjectId(id)}, {"$set": update})
+
+    def update_progress(
+        self, id: str, progress: int, results: list[SearchResult]
+    ) -> None:
+        ser_res = [MongoSerializer.serialize_search_result(i) for i in results]
         self.__get_client().update_one(
+            {"_id": ObjectId(id), "status": {"$ne": JobStatus.COMPLETED.value}},
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING.value,
+                    "results": ser_res,
+                    "progress": progress,
+                }
+            },
+        )
+
+    def cancel_job(self, id: str) -> None:
+        self.__get_client().update_one(
+            {"_id": ObjectId(id), "status": {"$ne": JobStatus.COMPLETED.value}},
+            {"$set": {"cancelled": True}},
+        )
+
+    def is_cancelled(self, id: str) -> bool:
+        res = self.__get_client().find_one({"_id": ObjectId(id)}, {"cancelled": 1})
+        if not res:
+            raise ValueError("Unknown id")
+        return res.get("cancelled", False)
+
+    def add_shard_results(
+        self,
+        id: str,
+        shard: int,
+        shard_count: int,
+        results: list[SearchResult],
+        partial: bool = False,
+    ) -> Optional[tuple[list[list[SearchResult]], bool]]:
+        ser_res = [MongoSerializer.serialize_search_result(i) for i in results]
+        # Push and count in one atomic update, so exactly one shard sees the last
+        res = self.__get_client().find_one_and_update(
             {"_id": ObjectId(id)},
-            {"$set": {"status": status.value, "results": ser_res}},
+            {
+                "$push": {
+                    "shard_results": {
+                        "shard": shard,
+                        "results": ser_res,
+                        "partial": partial,
+                    }
+                },
+                "$inc": {"shards_done": 1},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+        if not res:
+            raise ValueError("Unknown id")
+        if res["shards_done"] < shard_count:
+            return None
+        shards = sorted(res["shard_results"], key=lambda a: a["shard"])
+        return (
+            [
+                [MongoSerializer.deserialize_search_result(j) for j in i["results"]]
+                for i in shards
+            ],
+            any(i["partial"] for i in shards),
         )
@@ -23,13 +23,32 @@ class MongoSongRepository(SongRepository):
     def __get_sync_client(self):
         return MongoClient(self.mongo_url)[config.SONGS_DB][config.SONGS_COLLECTION]
 
+    def __get_meta_client(self):
+        return AsyncIOMotorClient(self.mongo_url)[config.SONGS_DB][
+            config.META_COLLECTION
+        ]
+
+    def __get_sync_meta_client(self):
+        return MongoClient(self.mongo_url)[config.SONGS_DB][config.META_COLLECTION]
+
+    async def __bump_corpus_version(self) -> None:
+        await self.__get_meta_client().update_one(
+            {"_id": config.CORPUS_VERSION_KEY}, {"$inc": {"version": 1}}, upsert=True
+        )
+
+    def get_corpus_version(self) -> str:
+        res = self.__get_sync_meta_client().find_one({"_id": config.CORPUS_VERSION_KEY})
+        return str(res["version"]) if res else "0"
+
     async def insert(self, song: Song) -> None:
         await self.__get_client().insert_one(MongoSerializer.serialize_song(song))
+        await self.__bump_corpus_version()
 
     async def insert_many(self, songs: Iterable[Song]) -> None:
         await self.__get_client().insert_many(
             (MongoSerializer.serialize_song(i) for i in songs)
         )
+        await self.__bump_corpus_version()
 
     async def list_keys(self) -> list[str]:
         client = self.__get_client()
@@ -74,3 +93,4 @@ class MongoSongRepository(SongRepository):
         client = self.__get_client()
         ser = MongoSerializer.serialize_song(song)
         await client.replace_one({"_id": key}, ser, upsert=True)
+        await self.__bump_corpus_version()
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+from typing import Any, AsyncIterable, Iterable
+import numpy as np
+import numpy.typing as npt
+from common.entity.song import NOTE_DTYPE, Song, Track
+from common.repository.song_repository import ReadOnlyRepositoryError, SongRepository
+from common.util.mongo_serializer import MongoSerializer
+import common.config as config
+
+
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+
+FORMAT_VERSION = 3
+# Arrays of the packed corpus, every one is stored in its own .npy file
+ARRAYS = ("notes", "track_offsets", "grid_lengths", "song_offsets")
+HEADER_FILE = "corpus.json"
+
+
+class PackedSongRepository(SongRepository):
+    """Read-only repository of a corpus packed into memory-mapped arrays.
+
+    Notes of all tracks are stored in one structured array. Track `i` is
+    `notes[track_offsets[i] : track_offsets[i + 1]]`, song `j` consists of
+    tracks `song_offsets[j]` to `song_offsets[j + 1]`. Keys, metadata and the
+    format version are stored in a JSON header. Use pack() to create it.
+    """
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE)) as f:
+            header = json.load(f)
+        if header["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported packed corpus format {header['format']}")
+        self.keys: list[str] = header["keys"]
+        self.metadata = [
+            MongoSerializer.deserialize_song_metadata(i) for i in header["metadata"]
+        ]
+        self.corpus_version: str = header["corpus_version"]
+        self.__key_ids = {k: i for i, k in enumerate(self.keys)}
+        self.__map_arrays()
+        super().__init__()
+
+    def __map_arrays(self) -> None:
+        # Pages are only read, when the songs using them are loaded
+        self.notes = np.load(os.path.join(self.path, "notes.npy"), mmap_mode="r")
+        self.track_offsets = np.load(
+            os.path.join(self.path, "track_offsets.npy"), mmap_mode="r"
+        )
+        self.grid_lengths = np.load(
+            os.path.join(self.path, "grid_lengths.npy"), mmap_mode="r"
+        )
+        self.song_offsets = np.load(
+            os.path.join(self.path, "song_offsets.npy"), mmap_mode="r"
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Pool workers map the files themselves instead of receiving copies
+        state = self.__dict__.copy()
+        for i in ARRAYS:
+            del state[i]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__map_arrays()
+
+    @staticmethod
+    async def pack(repository: SongRepository, path: str) -> "PackedSongRepository":
+        """Write all songs of repository to path in the packed format."""
+        # Read before the songs, so that a concurrent insert marks it outdated
+        corpus_version = repository.get_corpus_version()
+        keys = await repository.list_keys()
+        metadata = []
+        notes: list[npt.NDArray[Any]] = []
+        track_lengths: list[int] = []
+        grid_lengths: list[int] = []
+        song_lengths: list[int] = []
+        for i, key in enumerate(keys):
+            song = repository.load_song(key)
+            metadata.append(MongoSerializer.serialize_song_metadata(song.metadata))
+            song_lengths.append(len(song.tracks))
+            for track in song.tracks:
+                notes.append(track.array)
+                track_lengths.append(len(track))
+                grid_lengths.append(track.grid_length)
+            logger.debug(f"Packed song {key} ({i + 1}/{len(keys)})")
+
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            "notes": np.concatenate([np.zeros(0, dtype=NOTE_DTYPE)] + notes),
+            "track_offsets": PackedSongRepository.__offsets(track_lengths),
+            "grid_lengths": np.array(grid_lengths, dtype=np.int64),
+            "song_offsets": PackedSongRepository.__offsets(song_lengths),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+        # The header is written last, so incomplete corpora cannot be opened
+        with open(os.path.join(path, HEADER_FILE), "w") as f:
+            json.dump(
+                {
+                    "format": FORMAT_VERSION,
+                    "corpus_version": corpus_version,
+                    "keys": keys,
+                    "metadata": metadata,
+                },
+                f,
+            )
+        return PackedSongRepository(path)
+
+    @staticmethod
+    def __offsets(lengths: list[int]) -> npt.NDArray[np.int64]:
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths, dtype=np.int64)
+        return offsets
+
+    async def list_keys(self) -> list[str]:
+        return list(self.keys)
+
+    def load_song(self, key: str) -> Song:
+        song_id = self.__key_ids.get(key)
+        if song_id is None:
+            raise ValueError("Unknown key")
+        start, stop = self.song_offsets[song_id : song_id + 2]
+        return Song(
+            [self.__load_track(i) for i in range(start, stop)],
+            self.metadata[song_id],
+        )
+
+    def __load_track(self, track_id: int) -> Track:
+        start, stop = self.track_offsets[track_id : track_id + 2]
+        # Tracks are views of the mapped notes, nothing is copied
+        return Track(self.notes[start:stop], int(self.grid_lengths[track_id]))
+
+    async def load_song_async(self, file_path: str) -> Song:
+        return self.load_song(file_path)
+
+    async def get_all_songs(self) -> AsyncIterable[Song]:
+        for i in self.keys:
+            yield self.load_song(i)
+
+    async def get_song_slugs(self) -> list[str]:
+        return [i.slug for i in self.metadata]
+
+    async def insert(self, song: Song) -> None:
+        raise ReadOnlyRepositoryError("Packed corpus is read-only")
+
+    async def insert_many(self, songs: Iterable[Song]) -> None:
+        raise ReadOnlyRepositoryError("Packed corpus is read-only")
+
+    async def upsert(self, key: str, song: Song) -> None:
+        raise ReadOnlyRepositoryError("Packed corpus is read-only")
+
+    def get_corpus_version(self) -> str:
+        return self.corpus_version
+
+    def is_current(self, repository: SongRepository) -> bool:
+        """Whether the packed songs still match the songs of repository."""
+        return self.corpus_version == repository.get_corpus_version()
@@ -8,6 +8,10 @@ import common.config as config
 logger = logging.getLogger(config.DEFAULT_LOGGER)
 
 
+class ReadOnlyRepositoryError(RuntimeError):
+    """Raised on writes to a repository, that cannot store songs."""
+
+
 class SongRepository(ABC):
     def __init__(self) -> None:
         pass
@@ -43,3 +47,8 @@ class SongRepository(ABC):
     @abstractmethod
     async def upsert(self, key: str, song: Song) -> None:
         pass
+
+    @abstractmethod
+    def get_corpus_version(self) -> str:
+        """Version of the stored songs, that changes with every write."""
+        pass
@@ -0,0 +1,92 @@
+import numpy as np
+import numpy.typing as npt
+from numpy.lib.stride_tricks import sliding_window_view
+from common.entity.song import Track
+from common.search_engine.strategy.segmentation_strategy import TrackSegments
+
+N_GRAM_LENGTH = 5
+
+
+def note_arrays(
+    track: Track,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Times and pitches of the notes of track."""
+    return track.times.astype(np.int64), track.pitches.astype(np.int64)
+
+
+def extract_melody(
+    times: npt.NDArray[np.int64], pitches: npt.NDArray[np.int64]
+) -> npt.NDArray[np.int64]:
+    """Indices of the melody notes.
+
+    A note starting later than all previous notes starts a new melody note.
+    Following notes with the same time and a higher pitch than the note, that
+    started it, replace it, the last one wins. Other notes are dropped.
+    """
+    if len(times) == 0:
+        return np.zeros(0, dtype=np.int64)
+    running_max = np.maximum.accumulate(times)
+    starts = np.ones(len(times), dtype=np.bool_)
+    starts[1:] = times[1:] > running_max[:-1]
+    groups = np.cumsum(starts) - 1
+
+    first_pitch = pitches[starts][groups]
+    replaces = (times == running_max) & (pitches > first_pitch)
+    candidates = np.flatnonzero(starts | replaces)
+    candidate_groups = groups[candidates]
+    last = np.ones(len(candidates), dtype=np.bool_)
+    last[:-1] = candidate_groups[1:] != candidate_groups[:-1]
+    return candidates[last]
+
+
+def extract_melodic_contour(pitches: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Direction of each step of the melody, the first note gets 0."""
+    contour = np.zeros(len(pitches), dtype=np.int64)
+    contour[1:] = np.sign(np.diff(pitches))
+    return contour
+
+
+def classify_n_grams(contour: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Class of every n-gram of contour.
+
+    The class is 0b10 followed by 2 bits per step of the n-gram except the first
+    one, going up is 0b01, staying 0b10 and going down 0b11.
+    """
+    steps = N_GRAM_LENGTH - 1
+    if len(contour) < N_GRAM_LENGTH:
+        return np.zeros(0, dtype=np.int64)
+    codes = 2 - contour[1:]
+    weights = 4 ** np.arange(steps - 1, -1, -1, dtype=np.int64)
+    windows = sliding_window_view(codes, steps)
+    return (0b10 << (2 * steps)) | (windows @ weights)
+
+
+def n_gram_classes(
+    times: npt.NDArray[np.int64], pitches: npt.NDArray[np.int64]
+) -> set[int]:
+    """Classes of all n-grams of the melodic contour of the given notes."""
+    melody = pitches[extract_melody(times, pitches)]
+    return set(np.unique(classify_n_grams(extract_melodic_contour(melody))).tolist())
+
+
+def generate_n_gram_classes(track: Track) -> set[int]:
+    """Classes of all n-grams of the melodic contour of track."""
+    return n_gram_classes(*note_arrays(track))
+
+
+def generate_segment_n_gram_classes(segments: TrackSegments) -> list[set[int]]:
+    """generate_n_gram_classes of every segment, without creating its Track."""
+    times = segments.times()
+    pitches = segments.pitches()
+    bounds = segments.bounds
+    return [
+        n_gram_classes(
+            times[bounds[i] : bounds[i + 1]], pitches[bounds[i] : bounds[i + 1]]
+        )
+        for i in range(len(segments))
+    ]
+
+
+def min_common_classes(query_classes: set[int]) -> int:
+    """Segments have to share more classes with the query to be compared."""
+    return len(query_classes) // 3
@@ -1,14 +1,19 @@
 from common.search_engine.strategy.melody_extraction_strategy import (
     MelodyExtractionStrategy,
 )
+from typing import Sequence
 import numpy.typing as npt
 import numpy as np
 from common.search_engine.strategy.standardization_strategy import (
     StandardizationStrategy,
 )
-from common.search_engine.strategy.segmentation_strategy import SegmentationStrategy
+from common.search_engine.strategy.segmentation_strategy import (
+    SegmentationStrategy,
+    TrackSegments,
+)
 from common.entity.song import Segment, Song, Track
 import common.config as config
+from common.util.helpers import concat_lines
 
 
 class Preprocessor:
@@ -26,6 +31,25 @@ class Preprocessor:
         melody = self.melody_extraction_strategy.extract(track)
         return self.standardization_strategy.standardize(melody)
 
+    def prep_tracks(self, tracks: Sequence[Track]) -> list[npt.NDArray[np.int64]]:
+        """prep_track of every track, melodies are extracted in one batch."""
+        melodies = self.melody_extraction_strategy.extract_batch(tracks)
+        return self.__standardize_batch(melodies)
+
+    def prep_segments(self, segments: TrackSegments) -> list[npt.NDArray[np.int64]]:
+        """prep_track of every segment, without creating their Tracks."""
+        melodies = self.melody_extraction_strategy.extract_segments(segments)
+        return self.__standardize_batch(melodies)
+
+    def __standardize_batch(
+        self, melodies: list[npt.NDArray[np.int64]]
+    ) -> list[npt.NDArray[np.int64]]:
+        if not melodies:
+            return []
+        values, offsets = concat_lines(melodies)
+        standardized = self.standardization_strategy.standardize_batch(values, offsets)
+        return np.split(standardized, offsets[1:-1])
+
     def preprocess(
         self, song: Song, segment_len: int = config.MEASURE_LENGTH
     ) -> list[Segment]:
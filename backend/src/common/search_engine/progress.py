@@ -0,0 +1,34 @@
+import time
+from typing import Callable
+from common.entity.search_result import SearchResult
+import common.config as config
+
+
+class ProgressReporter:
+    """Passes partial results of a running search to callback.
+
+    Updates are rate limited to one per min_interval seconds, partial results
+    are only computed for updates, that are passed on.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[int, list[SearchResult]], None],
+        min_interval: float = config.PROGRESS_UPDATE_INTERVAL,
+    ) -> None:
+        self.callback = callback
+        self.min_interval = min_interval
+        self.__last_update = time.monotonic()
+
+    def update(
+        self, scanned: int, total: int, results: Callable[[], list[SearchResult]]
+    ) -> None:
+        """Report that scanned out of total items were searched."""
+        if scanned >= total:
+            # Final results are stored by the caller
+            return
+        now = time.monotonic()
+        if now - self.__last_update < self.min_interval:
+            return
+        self.__last_update = now
+        self.callback(100 * scanned // total, results())
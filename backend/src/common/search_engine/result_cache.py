@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+import redis
+from cachetools import LRUCache
+from common.entity.search_result import SearchResult
+from common.util.mongo_serializer import MongoSerializer
+import common.config as config
+
+
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+
+
+class ResultCache:
+    """Search results cached in an in-process LRU and optionally in Redis.
+
+    Keys contain the corpus version, so results of an old corpus are never
+    returned after songs are inserted or upserted.
+    """
+
+    def __init__(
+        self,
+        redis_url: str = config.REDIS_CACHE_URL,
+        max_size: int = config.RESULT_CACHE_SIZE,
+        ttl: int = config.RESULT_CACHE_TTL,
+    ) -> None:
+        self.ttl = ttl
+        self.__local: LRUCache = LRUCache(max_size)
+        self.__redis: Optional[redis.Redis] = None
+        if redis_url:
+            self.__redis = redis.from_url(redis_url)
+
+    @staticmethod
+    def make_key(
+        query_prep: npt.NDArray[np.int64],
+        grid_length: int,
+        strategy_shortcut: str,
+        use_n_gram_prep: bool,
+        corpus_version: str,
+        n: int,
+        query_classes: Optional[set[int]] = None,
+    ) -> str:
+        """Key of the results of a query.
+
+        N-gram classes are computed from the query before standardization, so
+        they have to be part of the key of n-gram searches.
+        """
+        key = hashlib.sha256(np.asarray(query_prep, dtype=np.int64).tobytes())
+        params = [grid_length, strategy_shortcut, use_n_gram_prep, corpus_version, n]
+        if query_classes is not None:
+            params.append(sorted(query_classes))
+        key.update(json.dumps(params).encode())
+        return config.RESULT_CACHE_PREFIX + key.hexdigest()
+
+    def get(self, key: str) -> Optional[list[SearchResult]]:
+        if key in self.__local:
+            logger.debug(f"Result cache hit {key}")
+            return list(self.__local[key])
+        if self.__redis is None:
+            return None
+
+        try:
+            cached = self.__redis.get(key)
+        except redis.RedisError as e:
+            logger.warning(f"Reading result cache failed: {e}")
+            return None
+        if cached is None:
+            return None
+        logger.debug(f"Redis result cache hit {key}")
+        results = [
+            MongoSerializer.deserialize_search_result(i) for i in json.loads(cached)
+        ]
+        self.__local[key] = results
+        return list(results)
+
+    def set(self, key: str, results: list[SearchResult]) -> None:
+        self.__local[key] = list(results)
+        if self.__redis is None:
+            return
+
+        serialized = [MongoSerializer.serialize_search_result(i) for i in results]
+        try:
+            self.__redis.set(key, json.dumps(serialized), ex=self.ttl)
+        except redis.RedisError as e:
+            logger.warning(f"Writing result cache failed: {e}")
@@ -0,0 +1,23 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from common.search_engine.progress import ProgressReporter
+
+
+@dataclass
+class SearchContext:
+    """Limits and progress reporting of a single search.
+
+    The search stops scheduling chunks, once the deadline (time.time()) passes
+    or is_cancelled returns True. partial is set, if some songs were skipped.
+    """
+
+    deadline: Optional[float] = None
+    is_cancelled: Optional[Callable[[], bool]] = None
+    progress: Optional[ProgressReporter] = None
+    partial: bool = False
+
+    def should_stop(self) -> bool:
+        if self.deadline is not None and time.time() >= self.deadline:
+            return True
+        return self.is_cancelled is not None and self.is_cancelled()
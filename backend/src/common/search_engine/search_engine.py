@@ -1,21 +1,32 @@
+import functools
 import logging
+import time
 from common.entity.search_result import SearchResult
+from common.entity.search_stats import SearchStats
 import common.config as config
 import numpy.typing as npt
 import numpy as np
 from common.repository.song_repository import SongRepository
-from common.search_engine.strategy.similarity_strategy import SimilarityStrategy
-from common.entity.song import Track
-import multiprocessing as mp
+from common.search_engine.strategy.similarity_strategy import (
+    PreparedQuery,
+    SimilarityStrategy,
+)
+from common.entity.song import SongMetadata, Track
 from common.search_engine.preprocessor import Preprocessor
-import itertools
-from common.util.helpers import split_list
+from common.search_engine.search_context import SearchContext
+from common.search_engine.search_pool import SearchPool
+from common.search_engine.top_k import LazyTrack, TopK
+from typing import Any, Callable, Hashable, Iterator, Optional
+from common.util.helpers import pad_lines, split_list
 
 
 logger = logging.getLogger(config.DEFAULT_LOGGER)
 
 END_TOKEN = "STOP"
 
+# Segment of a song, that is waiting to be compared with the query
+Candidate = tuple[SongMetadata, LazyTrack, npt.NDArray[np.int64]]
+
 
 class SearchEngine:
     def __init__(
@@ -27,74 +38,252 @@ class SearchEngine:
         self.repository = repository
         self.similarity_strategy = similarity_strategy
         self.preprocessor = preprocessor
+        self.__pool: Optional[SearchPool] = None
+        # Pool shared with other engines, which this engine does not own
+        self.__shared_pool: Optional[Callable[[], SearchPool]] = None
+        self.__pool_key: Hashable = None
+        self.__prepared: Optional[tuple[bytes, PreparedQuery]] = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The pool stays in the process, that owns the engine
+        state = self.__dict__.copy()
+        state["_SearchEngine__pool"] = None
+        state["_SearchEngine__shared_pool"] = None
+        return state
+
+    def use_shared_pool(
+        self, get_pool: Callable[[], SearchPool], key: Hashable
+    ) -> None:
+        """Run tasks in the pool returned by get_pool, whose workers hold this
+        engine under key, instead of starting an own pool."""
+        self.close()
+        self.__shared_pool = get_pool
+        self.__pool_key = key
+
+    def prepare_query(self, query_prep: npt.NDArray[np.int64]) -> PreparedQuery:
+        """Query prepared by the similarity strategy. It is reused by every
+        batch of the same query, that is processed by this engine (worker)."""
+        key = query_prep.tobytes()
+        if self.__prepared is None or self.__prepared[0] != key:
+            self.__prepared = (key, self.similarity_strategy.prepare(query_prep))
+        return self.__prepared[1]
+
+    @property
+    def batch_size(self) -> int:
+        """Number of candidates scored at once. Strategies without vectorized
+        scoring use small batches, so that their cutoffs tighten sooner."""
+        if self.similarity_strategy.capabilities.batchable:
+            return config.BATCH_SIZE
+        return config.SERIAL_BATCH_SIZE
+
+    def close(self) -> None:
+        """Stop the own pool of the engine, shared pools are left running."""
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool = None
+
+    def run_tasks(
+        self,
+        method: str,
+        args: list[tuple],
+        song_count: int,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> list:
+        """Call method once for every item of args.
+
+        Calls run in the shared pool, if the engine uses one, or in the engine's
+        own process pool, which is started on first use and kept until close()
+        is called. Corpora too small to benefit from multiple
+        processes are processed serially. on_result is called with the index and
+        result of every call as soon as it finishes. Once should_stop returns
+        True, no more calls are started and their results are None.
+        """
+        processes = SearchPool.get_process_count(song_count)
+        tasks: Iterator[tuple[int, Any]]
+        if processes <= 1:
+            tasks = self.__run_serially(method, args, should_stop)
+        else:
+            tasks = self.__get_pool(processes).imap_unordered(
+                self.__pool_key, method, args, should_stop
+            )
+
+        results: list = [None] * len(args)
+        for i, res in tasks:
+            results[i] = res
+            if on_result is not None:
+                on_result(i, res)
+        return results
+
+    def __get_pool(self, processes: int) -> SearchPool:
+        if self.__shared_pool is not None:
+            return self.__shared_pool()
+        if self.__pool is None or self.__pool.processes != processes:
+            self.close()
+            self.__pool = SearchPool({self.__pool_key: self}, processes)
+        return self.__pool
+
+    def __run_serially(
+        self,
+        method: str,
+        args: list[tuple],
+        should_stop: Optional[Callable[[], bool]],
+    ) -> Iterator[tuple[int, Any]]:
+        for i, a in enumerate(args):
+            if i > 0 and should_stop is not None and should_stop():
+                return
+            yield i, getattr(self, method)(*a)
+
+    @staticmethod
+    def get_chunk_count(song_count: int, context: Optional[SearchContext]) -> int:
+        """Number of chunks the search is split into. Searches with a context use
+        smaller chunks to report progress more often and to stop sooner."""
+        processes = SearchPool.get_process_count(song_count)
+        if context is None:
+            return processes
+        return processes * config.PROGRESS_CHUNKS_PER_PROCESS
 
     async def find_similar_async(
-        self, n: int, query_track: Track
+        self,
+        n: int,
+        query_track: Track,
+        keys: Optional[list[str]] = None,
+        context: Optional[SearchContext] = None,
     ) -> list[SearchResult]:
+        """Find n songs most similar to query_track.
+
+        Only songs with the given repository keys are searched, if keys are set.
+        Partial results are reported to the context's progress as chunks of songs
+        finish. Stopped searches return the best results found so far.
+        """
         query_prep = self.preprocessor.prep_track(query_track)
-        results = []
+        highest_first = self.similarity_strategy.highest_first
+        deadline = context.deadline if context is not None else None
 
-        with mp.get_context("forkserver").Pool(config.PROCESS_COUNT) as pool:
+        if keys is None:
             keys = await self.repository.list_keys()
-            chunks = split_list(keys, config.PROCESS_COUNT)
-            tasks = [
-                pool.apply_async(self.process_songs, (i, query_track, query_prep, n))
-                for i in chunks
-            ]
-            results = [i.get() for i in tasks]
-
-        res = self.postprocess_result_list(
-            list(itertools.chain.from_iterable(results)), n
-        )
-        logger.debug(f"Found {len(res)} similar songs")
-        return res
+        song_count = len(keys)
+        chunks = [
+            i
+            for i in split_list(keys, self.get_chunk_count(song_count, context))
+            if len(i)
+        ]
+        finished: list[list[SearchResult]] = []
+        scanned = 0
 
-    def postprocess_result_list(
-        self, results: list[SearchResult], n: int
-    ) -> list[SearchResult]:
-        sorted_results = sorted(
-            results,
-            reverse=self.similarity_strategy.highest_first,
-            key=lambda a: (
-                a.similarity,
-                a.metadata.name,
-                a.metadata.artist,
+        def on_result(i: int, result: tuple[list[SearchResult], SearchStats]):
+            nonlocal scanned
+            finished.append(result[0])
+            scanned += len(chunks[i]) - result[1].skipped
+            if context is not None and context.progress is not None:
+                context.progress.update(
+                    scanned, song_count, lambda: TopK.merge(finished, n, highest_first)
+                )
+
+        results = self.run_tasks(
+            "process_songs",
+            [(i, query_track, query_prep, n, deadline) for i in chunks],
+            song_count,
+            on_result,
+            context.should_stop if context is not None else None,
+        )
+        stats = sum(
+            (
+                SearchStats(skipped=len(c)) if r is None else r[1]
+                for c, r in zip(chunks, results)
             ),
+            SearchStats(),
         )
-        logger.info("Postprocessing search results")
-        metadata: set[tuple[str, str]] = set()
-        unique_results: list[SearchResult] = []
-        for i in sorted_results:
-            meta_tuple = (i.metadata.artist, i.metadata.name)
-            if meta_tuple not in metadata:
-                metadata.add(meta_tuple)
-                unique_results.append(i)
-        if len(unique_results) >= n:
-            return unique_results[0:n]
-
-        return unique_results
+        logger.info(f"Search stats: {stats}")
+        if context is not None and stats.skipped:
+            context.partial = True
+
+        res = TopK.merge((i[0] for i in results if i is not None), n, highest_first)
+        logger.debug(f"Found {len(res)} similar songs")
+        return res
 
     def process_songs(
-        self, keys: list[str], query_track: Track, query_prep: npt.NDArray[np.int64], n
-    ) -> list[SearchResult]:
-        results: list[SearchResult] = []
-        for key in keys:
-            results.extend(self.process_song(key, query_track, query_prep))
-        return self.postprocess_result_list(results, n)
+        self,
+        keys: list[str],
+        query_track: Track,
+        query_prep: npt.NDArray[np.int64],
+        n,
+        deadline: Optional[float] = None,
+    ) -> tuple[list[SearchResult], SearchStats]:
+        """Best n results of the songs with the given keys. Songs left after the
+        deadline (time.time()) are skipped."""
+        stats = SearchStats()
+        top = TopK(n, self.similarity_strategy.highest_first)
+        known_scores: dict[bytes, Optional[float]] = dict()
+        batch: list[Candidate] = []
+        for i, key in enumerate(keys):
+            if deadline is not None and time.time() >= deadline:
+                stats.skipped = len(keys) - i
+                break
+            batch.extend(self.process_song(key, query_track, query_prep))
+            if len(batch) >= self.batch_size:
+                self.update_results(top, query_prep, batch, stats, known_scores)
+                batch = []
+        self.update_results(top, query_prep, batch, stats, known_scores)
+        return top.results(), stats
 
     def process_song(
         self, key: str, query_track: Track, query_prep: npt.NDArray[np.int64]
-    ) -> list[SearchResult]:
-        results: list[SearchResult] = []
+    ) -> list[Candidate]:
+        candidates: list[Candidate] = []
         song = self.repository.load_song(key)
 
         for track in song.tracks:
-            segments = self.preprocessor.segmentation_strategy.segment(
+            segments = self.preprocessor.segmentation_strategy.segment_views(
                 track, query_track.grid_length
             )
-            for segment in segments:
-                val = self.similarity_strategy.compare(
-                    query_prep, self.preprocessor.prep_track(segment)
+            for i, prep in enumerate(self.preprocessor.prep_segments(segments)):
+                candidates.append(
+                    (song.metadata, functools.partial(segments.track, i), prep)
                 )
-                results.append(SearchResult(song.metadata, val, segment))
-        return results
+        return candidates
+
+    def update_results(
+        self,
+        top: TopK,
+        query_prep: npt.NDArray[np.int64],
+        batch: list[Candidate],
+        stats: SearchStats,
+        known_scores: dict[bytes, Optional[float]],
+    ) -> None:
+        """Compare the query with all candidate segments in one batch and push
+        them into top.
+
+        Every distinct standardized segment is compared once, its score is kept
+        in known_scores and reused for all its occurrences. Candidates, that
+        cannot beat the worst result of a full top, are pruned (None score) or
+        their comparison is abandoned early.
+        """
+        if not batch:
+            return
+        keys = [i[2].tobytes() for i in batch]
+        new_lines = {k: i[2] for k, i in zip(keys, batch) if k not in known_scores}
+        stats.candidates += len(batch)
+        stats.unique_candidates += len(new_lines)
+
+        if new_lines:
+            # Only bounded strategies can make use of the threshold
+            bounded = self.similarity_strategy.capabilities.bounded
+            threshold = top.threshold if bounded else None
+            segments, lengths = pad_lines(list(new_lines.values()))
+            prepared = self.prepare_query(query_prep)
+            keep = self.similarity_strategy.prune(
+                prepared, segments, lengths, threshold, stats
+            )
+            scores = iter(
+                self.similarity_strategy.score(
+                    prepared, segments[keep], lengths[keep], threshold
+                ).tolist()
+            )
+            for k, kept in zip(new_lines, keep):
+                known_scores[k] = next(scores) if kept else None
+
+        for (metadata, segment, _), k in zip(batch, keys):
+            score = known_scores[k]
+            if score is not None:
+                top.push(metadata, score, segment)
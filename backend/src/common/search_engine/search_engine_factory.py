@@ -1,13 +1,19 @@
 from common.repository.song_repository import SongRepository
 from common.search_engine.search_engine import SearchEngine
+from common.search_engine.search_engine_n_gram_index import SearchEngineNGramIndex
 from common.search_engine.search_engine_n_gram_prep import SearchEngineNGramPrep
+from common.search_engine.search_engine_segment_index import (
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.segment_index import SegmentIndex
 from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
 from common.search_engine.strategy.standardization_strategy import (
     RelativeIntervalStrategy,
 )
-from common.search_engine.strategy.similarity_strategy import SimilarityStrategy
+from common.search_engine.strategy.strategy_registry import strategy_registry
 from common.search_engine.strategy.segmentation_strategy import FixedLengthStrategy
 from common.search_engine.preprocessor import Preprocessor
+from typing import Optional
 import logging
 import common.config as config
 
@@ -15,26 +21,31 @@ logger = logging.getLogger(config.DEFAULT_LOGGER)
 
 
 class SearchEngineFactory:
+    @staticmethod
+    def create_preprocessor() -> Preprocessor:
+        return Preprocessor(
+            TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+        )
+
     @staticmethod
     def create_search_engine(
-        repository: SongRepository, strategy_repr: str, use_n_gram_prep: bool
+        repository: SongRepository,
+        strategy_repr: str,
+        use_n_gram_prep: bool,
+        segment_index: Optional[SegmentIndex] = None,
     ) -> SearchEngine:
-        for i in SimilarityStrategy.__subclasses__():
-            # NOTE: MyPy throws error, which can be safely ignored,
-            # because the abstract class is never accessed
-            # (__subclasses__() does not return the parent class)
-            if i().shortcut == strategy_repr:  # type: ignore
-                prep = Preprocessor(
-                    TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
-                )
-                if use_n_gram_prep:
-                    logger.debug("Using SearchEngineNGramPrep")
-                    return SearchEngineNGramPrep(repository, prep, i())  # type: ignore
-                logger.debug("Using SearchEngine")
-                return SearchEngine(
-                    repository,
-                    prep,
-                    i(),  # type: ignore
-                )
-
-        raise ValueError("Unknown similarity strategy")
+        strategy = strategy_registry.get(strategy_repr)
+        prep = SearchEngineFactory.create_preprocessor()
+        if not strategy.capabilities.index_backed:
+            segment_index = None
+        if use_n_gram_prep and segment_index is not None:
+            logger.debug("Using SearchEngineNGramIndex")
+            return SearchEngineNGramIndex(repository, prep, strategy, segment_index)
+        if use_n_gram_prep:
+            logger.debug("Using SearchEngineNGramPrep")
+            return SearchEngineNGramPrep(repository, prep, strategy)
+        if segment_index is not None:
+            logger.debug("Using SearchEngineSegmentIndex")
+            return SearchEngineSegmentIndex(repository, prep, strategy, segment_index)
+        logger.debug("Using SearchEngine")
+        return SearchEngine(repository, prep, strategy)
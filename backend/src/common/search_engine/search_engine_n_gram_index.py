@@ -0,0 +1,20 @@
+from common.entity.song import Track
+from common.search_engine.n_gram import generate_n_gram_classes, min_common_classes
+from common.search_engine.search_engine_n_gram_prep import SearchEngineNGramPrep
+from common.search_engine.search_engine_segment_index import (
+    Rows,
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.segment_index import SegmentTable
+
+
+class SearchEngineNGramIndex(SearchEngineSegmentIndex, SearchEngineNGramPrep):
+    """SearchEngineNGramPrep, that looks candidates up in the n-gram postings of
+    a SegmentIndex.
+
+    Queries, whose grid length is not indexed, fall back to SearchEngineNGramPrep.
+    """
+
+    def candidate_rows(self, table: SegmentTable, query_track: Track) -> Rows:
+        query_classes = generate_n_gram_classes(query_track)
+        return table.n_gram_candidates(query_classes, min_common_classes(query_classes))
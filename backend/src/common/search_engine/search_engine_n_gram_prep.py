@@ -1,15 +1,26 @@
+import functools
 from common.entity.search_result import SearchResult
-from common.search_engine.search_engine import SearchEngine
+from common.entity.search_stats import SearchStats
+from common.search_engine.search_engine import Candidate, SearchEngine
+from common.search_engine.top_k import TopK
+from common.search_engine.n_gram import (
+    N_GRAM_LENGTH,
+    generate_n_gram_classes,
+    generate_segment_n_gram_classes,
+    min_common_classes,
+)
 from common.repository.song_repository import SongRepository
 from common.search_engine.preprocessor import Preprocessor
 from common.search_engine.strategy.similarity_strategy import SimilarityStrategy
-from common.entity.song import Note, Track
+from common.entity.song import Track
+from typing import Optional
+import time
 import numpy.typing as npt
 import numpy as np
 
 
 class SearchEngineNGramPrep(SearchEngine):
-    N_GRAM_LENGTH = 5
+    N_GRAM_LENGTH = N_GRAM_LENGTH
 
     def __init__(
         self,
@@ -19,63 +30,32 @@ class SearchEngineNGramPrep(SearchEngine):
     ) -> None:
         super().__init__(repository, preprocessor, similarity_strategy)
 
-    def __extract_melody(self, track: Track) -> list[Note]:
-        last_pitch = -1
-        last_time = -1
-        res: list[Note] = []
-        for i in track.notes:
-            if i.time == last_time and i.pitch > last_pitch:
-                res[-1] = i
-            elif i.time > last_time:
-                res.append(i)
-                last_time = i.time
-                last_pitch = i.pitch
-        return res
-
-    def __extract_melodic_contour(self, notes: list[Note]) -> list[int]:
-        last_pitch = notes[0].pitch
-        res = []
-        for i in notes:
-            if i.pitch == last_pitch:
-                res.append(0)
-                last_pitch = i.pitch
-            elif i.pitch < last_pitch:
-                res.append(-1)
-                last_pitch = i.pitch
-            if i.pitch > last_pitch:
-                res.append(1)
-                last_pitch = i.pitch
-        return res
-
-    def __classify_segment(self, melodic_contour: list[int]) -> int:
-        melodic_rep = {1: 0b01, 0: 0b10, -1: 0b11}
-        segment_class = 0b10
-        for p in melodic_contour[1:]:
-            segment_class = segment_class << 2 | melodic_rep[p]
-        return segment_class
-
-    def __generate_n_gram_classes(self, track: Track) -> set[int]:
-        melody = self.__extract_melody(track)
-        melodic_contour = self.__extract_melodic_contour(melody)
-        classes = set()
-        for i in range(len(melodic_contour) - self.N_GRAM_LENGTH + 1):
-            segment_class = self.__classify_segment(
-                melodic_contour[i : i + self.N_GRAM_LENGTH]
-            )
-            classes.add(segment_class)
-        return classes
-
     def process_songs(
-        self, keys: list[str], query_track: Track, query_prep: npt.NDArray[np.int64], n
-    ) -> list[SearchResult]:
-        query_classes = self.__generate_n_gram_classes(query_track)
+        self,
+        keys: list[str],
+        query_track: Track,
+        query_prep: npt.NDArray[np.int64],
+        n,
+        deadline: Optional[float] = None,
+    ) -> tuple[list[SearchResult], SearchStats]:
+        query_classes = generate_n_gram_classes(query_track)
 
-        results: list[SearchResult] = []
-        for key in keys:
-            results.extend(
+        stats = SearchStats()
+        top = TopK(n, self.similarity_strategy.highest_first)
+        known_scores: dict[bytes, Optional[float]] = dict()
+        batch: list[Candidate] = []
+        for i, key in enumerate(keys):
+            if deadline is not None and time.time() >= deadline:
+                stats.skipped = len(keys) - i
+                break
+            batch.extend(
                 self.__process_song(key, query_track, query_prep, query_classes)
             )
-        return self.postprocess_result_list(results, n)
+            if len(batch) >= self.batch_size:
+                self.update_results(top, query_prep, batch, stats, known_scores)
+                batch = []
+        self.update_results(top, query_prep, batch, stats, known_scores)
+        return top.results(), stats
 
     def __process_song(
         self,
@@ -83,20 +63,25 @@ class SearchEngineNGramPrep(SearchEngine):
         query_track: Track,
         query_prep: npt.NDArray[np.int64],
         query_classes: set[int],
-    ) -> list[SearchResult]:
-        results: list[SearchResult] = []
+    ) -> list[Candidate]:
+        candidates: list[Candidate] = []
         song = self.repository.load_song(key)
 
         for track in song.tracks:
-            segments = self.preprocessor.segmentation_strategy.segment(
+            segments = self.preprocessor.segmentation_strategy.segment_views(
                 track, query_track.grid_length
             )
-            for segment in segments:
-                n_gram_classes = self.__generate_n_gram_classes(segment)
-                common_classes = len(query_classes.intersection(n_gram_classes))
-                if common_classes > (len(query_classes) // 3):
-                    val = self.similarity_strategy.compare(
-                        query_prep, self.preprocessor.prep_track(segment)
-                    )
-                    results.append(SearchResult(song.metadata, val, segment))
-        return results
+            kept = [
+                i
+                for i, classes in enumerate(generate_segment_n_gram_classes(segments))
+                if len(query_classes.intersection(classes))
+                > min_common_classes(query_classes)
+            ]
+            if not kept:
+                continue
+            preps = self.preprocessor.prep_segments(segments)
+            for i in kept:
+                candidates.append(
+                    (song.metadata, functools.partial(segments.track, i), preps[i])
+                )
+        return candidates
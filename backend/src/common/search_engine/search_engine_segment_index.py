@@ -0,0 +1,252 @@
+import functools
+import logging
+import time
+from typing import Optional, Union
+import numpy as np
+import numpy.typing as npt
+from common.entity.search_result import SearchResult
+from common.entity.search_stats import SearchStats
+from common.entity.song import Track
+from common.repository.song_repository import SongRepository
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.search_context import SearchContext
+from common.search_engine.search_engine import SearchEngine
+from common.search_engine.segment_index import SegmentIndex, SegmentTable
+from common.search_engine.strategy.similarity_strategy import SimilarityStrategy
+from common.util.helpers import split_list
+import common.config as config
+
+
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+
+# Table rows, range is used for full scans to keep worker arguments small
+Rows = Union[range, npt.NDArray[np.int64]]
+
+
+class SearchEngineSegmentIndex(SearchEngine):
+    """Search engine, that scans a prebuilt SegmentIndex instead of the repository.
+
+    Queries, whose grid length is not indexed, and queries made after the
+    repository changed fall back to SearchEngine.
+    """
+
+    def __init__(
+        self,
+        repository: SongRepository,
+        preprocessor: Preprocessor,
+        similarity_strategy: SimilarityStrategy,
+        segment_index: SegmentIndex,
+    ) -> None:
+        super().__init__(repository, preprocessor, similarity_strategy)
+        self.segment_index = segment_index
+        self.__key_ids = {k: i for i, k in enumerate(segment_index.keys)}
+
+        # Songs with the same artist and name are deduplicated in the results
+        groups: dict[tuple[str, str], int] = dict()
+        self.__song_groups = np.array(
+            [
+                groups.setdefault((i.artist, i.name), len(groups))
+                for i in segment_index.metadata
+            ],
+            dtype=np.int32,
+        )
+
+    async def find_similar_async(
+        self,
+        n: int,
+        query_track: Track,
+        keys: Optional[list[str]] = None,
+        context: Optional[SearchContext] = None,
+    ) -> list[SearchResult]:
+        table = self.segment_index.tables.get(query_track.grid_length)
+        if table is None:
+            logger.debug(
+                f"Grid length {query_track.grid_length} is not indexed, "
+                "falling back to the repository scan"
+            )
+            return await super().find_similar_async(n, query_track, keys, context)
+        if not self.segment_index.is_current(self.repository):
+            logger.warning(
+                "Segment index is older than the repository, "
+                "falling back to the repository scan"
+            )
+            return await super().find_similar_async(n, query_track, keys, context)
+
+        query_prep = self.preprocessor.prep_track(query_track)
+        deadline = context.deadline if context is not None else None
+        rows = self.candidate_rows(table, query_track)
+        song_count = len(self.segment_index.keys)
+        if keys is not None:
+            # Songs missing in the index are skipped
+            song_ids = [self.__key_ids[i] for i in keys if i in self.__key_ids]
+            rows = np.asarray(rows, dtype=np.int64)
+            rows = rows[np.isin(table.song_ids[rows], song_ids)]
+            song_count = len(song_ids)
+        chunks = [
+            i
+            for i in split_list(rows, self.get_chunk_count(song_count, context))
+            if len(i)
+        ]
+        finished: list[tuple[Rows, npt.NDArray[np.float64]]] = []
+        scanned = 0
+
+        def on_result(i: int, result: tuple[npt.NDArray[np.float64], SearchStats]):
+            nonlocal scanned
+            finished.append((chunks[i], result[0]))
+            scanned += len(chunks[i]) - result[1].skipped
+            if context is not None and context.progress is not None:
+                context.progress.update(
+                    scanned,
+                    len(rows),
+                    functools.partial(self.__chunk_results, n, table, finished),
+                )
+
+        results = self.run_tasks(
+            "score_rows",
+            [(table.segment_len, i, query_prep, n, deadline) for i in chunks],
+            song_count,
+            on_result,
+            context.should_stop if context is not None else None,
+        )
+        stats = sum(
+            (
+                SearchStats(skipped=len(c)) if r is None else r[1]
+                for c, r in zip(chunks, results)
+            ),
+            SearchStats(),
+        )
+        logger.info(f"Search stats: {stats}")
+        if context is not None and stats.skipped:
+            context.partial = True
+
+        res = self.__chunk_results(
+            n,
+            table,
+            [(c, r[0]) for c, r in zip(chunks, results) if r is not None],
+        )
+        logger.debug(f"Found {len(res)} similar songs")
+        return res
+
+    def candidate_rows(self, table: SegmentTable, query_track: Track) -> Rows:
+        """Rows of table, that are compared with the query."""
+        return range(len(table))
+
+    def score_rows(
+        self,
+        segment_len: int,
+        rows: Rows,
+        query_prep: npt.NDArray[np.int64],
+        n: int,
+        deadline: Optional[float] = None,
+    ) -> tuple[npt.NDArray[np.float64], SearchStats]:
+        """Score the given table rows.
+
+        Identical segments are scored once. Segments, that cannot beat the n-th
+        best song found so far, are pruned and get the worst possible score.
+        Rows left after the deadline (time.time()) are skipped and get NaN.
+        """
+        table = self.segment_index.tables[segment_len]
+        stats = SearchStats(candidates=len(rows))
+        # Scores are negated for strategies with highest_first, lower is better
+        sign = -1 if self.similarity_strategy.highest_first else 1
+        prepared = self.prepare_query(query_prep)
+        groups = self.__song_groups[table.song_ids[rows]]
+        best = np.full(len(self.segment_index.metadata), np.inf)
+
+        # Unique segments are numbered in the order of their first occurrence
+        _, first, inverse = np.unique(
+            table.unique_ids[rows], return_index=True, return_inverse=True
+        )
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        row_ranks = rank[inverse]
+        by_rank = np.argsort(row_ranks, kind="stable")
+        sorted_ranks = row_ranks[by_rank]
+        unique_rows = np.asarray(rows, dtype=np.int64)[first[order]]
+        stats.unique_candidates = len(unique_rows)
+
+        unique_scores = np.full(len(unique_rows), sign * np.inf)
+        bounded = self.similarity_strategy.capabilities.bounded
+        for i in range(0, len(unique_rows), self.batch_size):
+            j = i + self.batch_size
+            if deadline is not None and time.time() >= deadline:
+                unique_scores[i:] = np.nan
+                stats.skipped = len(rows) - int(np.searchsorted(sorted_ranks, i))
+                break
+            threshold = None
+            if bounded:
+                seen = best[best < np.inf]
+                if 0 < n <= len(seen):
+                    threshold = sign * np.partition(seen, n - 1)[n - 1]
+
+            segments, lengths = table.pad(unique_rows[i:j])
+            keep = self.similarity_strategy.prune(
+                prepared, segments, lengths, threshold, stats
+            )
+            unique_scores[i + np.flatnonzero(keep)] = self.similarity_strategy.score(
+                prepared, segments[keep], lengths[keep], threshold
+            )
+            # Fan the scores out to every occurrence of the batch segments
+            start, stop = np.searchsorted(sorted_ranks, [i, j])
+            batch = by_rank[start:stop]
+            np.minimum.at(best, groups[batch], sign * unique_scores[row_ranks[batch]])
+        return unique_scores[row_ranks], stats
+
+    def __chunk_results(
+        self,
+        n: int,
+        table: SegmentTable,
+        chunks: list[tuple[Rows, npt.NDArray[np.float64]]],
+    ) -> list[SearchResult]:
+        """Best n results of scored chunks of rows, skipped rows are ignored."""
+        if not chunks:
+            return []
+        rows = np.concatenate([np.asarray(i[0], dtype=np.int64) for i in chunks])
+        scores = np.concatenate([i[1] for i in chunks])
+        scored = ~np.isnan(scores)
+        return self.__results(n, table, rows[scored], scores[scored])
+
+    def __results(
+        self,
+        n: int,
+        table: SegmentTable,
+        rows: Rows,
+        scores: npt.NDArray[np.float64],
+    ) -> list[SearchResult]:
+        return [
+            SearchResult(
+                self.segment_index.metadata[table.song_ids[rows[i]]],
+                float(scores[i]),
+                self.segment_index.segment_track(
+                    self.repository, self.preprocessor, table, rows[i]
+                ),
+            )
+            for i in self.__best_rows(n, table, rows, scores)
+        ]
+
+    def __best_rows(
+        self,
+        n: int,
+        table: SegmentTable,
+        rows: Rows,
+        scores: npt.NDArray[np.float64],
+    ) -> list[int]:
+        """Positions in rows of the best scoring row of the n best songs."""
+        sign = -1 if self.similarity_strategy.highest_first else 1
+        order = np.argsort(sign * scores, kind="stable")
+        song_ids = table.song_ids[np.asarray(rows, dtype=np.int64)]
+        _, first = np.unique(self.__song_groups[song_ids[order]], return_index=True)
+        best_rows = order[first]
+
+        metadata = self.segment_index.metadata
+        best = sorted(
+            best_rows.tolist(),
+            reverse=self.similarity_strategy.highest_first,
+            key=lambda a: (
+                scores[a],
+                metadata[song_ids[a]].name,
+                metadata[song_ids[a]].artist,
+            ),
+        )
+        return best[0:n]
@@ -0,0 +1,107 @@
+import logging
+import math
+import multiprocessing as mp
+from multiprocessing.pool import AsyncResult
+import os
+import queue
+from typing import Any, Callable, Hashable, Iterator, Optional
+import common.config as config
+
+
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+
+# Search engines of the current pool worker by key, set by the pool initializer
+__worker_engines: dict[Hashable, Any] = dict()
+
+
+def initialize_worker(engines: dict[Hashable, Any]) -> None:
+    global __worker_engines
+    __worker_engines = engines
+
+
+def call_worker_engine(key: Hashable, method: str, args: tuple) -> Any:
+    return getattr(__worker_engines[key], method)(*args)
+
+
+def available_cpu_count() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class SearchPool:
+    """Long-lived process pool, whose workers keep their own copies of engines.
+
+    The engines are pickled once per worker by the pool initializer, so queries
+    only send the engine key and their arguments to the workers. Several
+    engines can share one pool.
+    """
+
+    def __init__(self, engines: dict[Hashable, Any], processes: int) -> None:
+        self.processes = processes
+        ctx = mp.get_context("forkserver")
+        # Import heavy dependencies once in the forkserver, not in every worker
+        ctx.set_forkserver_preload(config.SEARCH_POOL_PRELOAD)
+        logger.info(f"Starting search pool with {processes} processes")
+        self.__pool = ctx.Pool(
+            processes, initializer=initialize_worker, initargs=(engines,)
+        )
+
+    @staticmethod
+    def get_process_count(song_count: int) -> int:
+        """Number of processes worth starting for a corpus of song_count songs."""
+        by_corpus = math.ceil(song_count / config.MIN_SONGS_PER_PROCESS)
+        return max(1, min(SearchPool.get_max_process_count(), by_corpus))
+
+    @staticmethod
+    def get_max_process_count() -> int:
+        return max(1, min(config.PROCESS_COUNT, available_cpu_count()))
+
+    def apply_async(self, key: Hashable, method: str, args: tuple) -> AsyncResult:
+        return self.__pool.apply_async(call_worker_engine, (key, method, args))
+
+    def imap_unordered(
+        self,
+        key: Hashable,
+        method: str,
+        args: list[tuple],
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> Iterator[tuple[int, Any]]:
+        """Call method of the engine with the given key for every item of args,
+        yield (index, result) in the order, in which the calls finish.
+
+        At most one call per process is scheduled at a time, no more calls are
+        scheduled once should_stop returns True.
+        """
+        finished: queue.Queue = queue.Queue()
+        pending = enumerate(args)
+        running = 0
+
+        def schedule() -> int:
+            task = next(pending, None)
+            if task is None:
+                return 0
+            i, task_args = task
+            self.__pool.apply_async(
+                call_worker_engine,
+                (key, method, task_args),
+                callback=lambda res: finished.put((i, res, None)),
+                error_callback=lambda e: finished.put((i, None, e)),
+            )
+            return 1
+
+        for _ in range(self.processes):
+            running += schedule()
+        while running:
+            i, res, error = finished.get()
+            running -= 1
+            if error is not None:
+                raise error
+            yield i, res
+            if should_stop is None or not should_stop():
+                running += schedule()
+
+    def close(self) -> None:
+        logger.info("Shutting down search pool")
+        self.__pool.close()
+        self.__pool.join()
@@ -0,0 +1,246 @@
+import logging
+import os
+import pickle
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+import numpy as np
+import numpy.typing as npt
+from common.entity.song import SongMetadata, Track
+from common.repository.song_repository import SongRepository
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.n_gram import generate_segment_n_gram_classes
+from common.search_engine.shared_arrays import SharedArrays
+from common.util.vbyte import decode_postings, encode_postings
+import common.config as config
+
+
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+
+# Array fields of SegmentTable, that are moved to shared memory
+SHARED_FIELDS = (
+    "values",
+    "offsets",
+    "song_ids",
+    "track_ids",
+    "segment_ids",
+    "unique_ids",
+)
+
+
+@dataclass
+class SegmentTable:
+    """Standardized segments of a single segment length.
+
+    Segment `i` is `values[offsets[i] : offsets[i + 1]]`. It was created from
+    segment `segment_ids[i]` of track `track_ids[i]` of song `song_ids[i]`.
+    Segments with equal values share the same `unique_ids[i]`.
+    `n_gram_postings` maps n-gram classes to the compressed, sorted list of
+    segments, that contain them.
+    """
+
+    segment_len: int
+    values: npt.NDArray[np.int64]
+    offsets: npt.NDArray[np.int64]
+    song_ids: npt.NDArray[np.int32]
+    track_ids: npt.NDArray[np.int32]
+    segment_ids: npt.NDArray[np.int32]
+    unique_ids: npt.NDArray[np.int32]
+    n_gram_postings: dict[int, bytes] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def unique_count(self) -> int:
+        return int(self.unique_ids.max(initial=-1)) + 1
+
+    def get(self, i: int) -> npt.NDArray[np.int64]:
+        return self.values[self.offsets[i] : self.offsets[i + 1]]
+
+    def pad(
+        self, rows: npt.ArrayLike
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Zero padded 2-D array of the segments of rows and their lengths."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        positions = starts[:, None] + np.arange(lengths.max(initial=0))
+        mask = positions < (starts + lengths)[:, None]
+        padded = np.zeros(positions.shape, dtype=np.int64)
+        padded[mask] = self.values[positions[mask]]
+        return padded, lengths
+
+    def n_gram_candidates(
+        self, query_classes: set[int], min_common: int
+    ) -> npt.NDArray[np.int64]:
+        """Rows sharing more than min_common n-gram classes with the query.
+
+        Only postings of the query classes are decoded, so rows without any
+        common class are never visited.
+        """
+        postings = [
+            decode_postings(self.n_gram_postings[i])
+            for i in query_classes
+            if i in self.n_gram_postings
+        ]
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        rows, counts = np.unique(np.concatenate(postings), return_counts=True)
+        return rows[counts > min_common]
+
+
+@dataclass
+class SegmentIndex:
+    """Preprocessed segments of the whole corpus for the common query lengths.
+
+    After share(), the table arrays live in shared memory and pickled copies of
+    the index, e.g. for pool workers, attach to it instead of copying them.
+    """
+
+    keys: list[str]
+    metadata: list[SongMetadata]
+    tables: dict[int, SegmentTable]
+    # Corpus version of the repository, the index was built from
+    corpus_version: str = ""
+    shared: Optional[SharedArrays] = field(default=None, repr=False, compare=False)
+
+    @staticmethod
+    async def build(
+        repository: SongRepository,
+        preprocessor: Preprocessor,
+        segment_lengths: Iterable[int] = config.INDEXED_SEGMENT_LENGTHS,
+    ) -> "SegmentIndex":
+        lengths = list(segment_lengths)
+        # Read before the keys, so songs written during the build make it stale
+        corpus_version = repository.get_corpus_version()
+        keys = await repository.list_keys()
+        metadata: list[SongMetadata] = []
+        values: dict[int, list[npt.NDArray[np.int64]]] = {i: [] for i in lengths}
+        provenance: dict[int, list[tuple[int, int, int]]] = {i: [] for i in lengths}
+        n_grams: dict[int, list[set[int]]] = {i: [] for i in lengths}
+
+        for song_id, key in enumerate(keys):
+            song = repository.load_song(key)
+            metadata.append(song.metadata)
+            for track_id, track in enumerate(song.tracks):
+                for length in lengths:
+                    segments = preprocessor.segmentation_strategy.segment_views(
+                        track, length
+                    )
+                    values[length].extend(preprocessor.prep_segments(segments))
+                    n_grams[length].extend(generate_segment_n_gram_classes(segments))
+                    provenance[length].extend(
+                        (song_id, track_id, i) for i in range(len(segments))
+                    )
+            logger.debug(f"Indexed song {key} ({song_id + 1}/{len(keys)})")
+
+        tables = {
+            i: SegmentIndex.__build_table(i, values[i], provenance[i], n_grams[i])
+            for i in lengths
+        }
+        return SegmentIndex(keys, metadata, tables, corpus_version)
+
+    @staticmethod
+    def __build_table(
+        segment_len: int,
+        values: list[npt.NDArray[np.int64]],
+        provenance: list[tuple[int, int, int]],
+        n_grams: list[set[int]],
+    ) -> SegmentTable:
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(i) for i in values])
+        concatenated = np.zeros(offsets[-1], dtype=np.int64)
+        for i, v in enumerate(values):
+            concatenated[offsets[i] : offsets[i + 1]] = v
+        prov = np.array(provenance, dtype=np.int32).reshape(-1, 3)
+        unique: dict[bytes, int] = dict()
+        unique_ids = np.array(
+            [unique.setdefault(i.tobytes(), len(unique)) for i in values],
+            dtype=np.int32,
+        )
+        postings: dict[int, list[int]] = dict()
+        for row, classes in enumerate(n_grams):
+            for i in classes:
+                postings.setdefault(i, []).append(row)
+        return SegmentTable(
+            segment_len,
+            concatenated,
+            offsets,
+            prov[:, 0].copy(),
+            prov[:, 1].copy(),
+            prov[:, 2].copy(),
+            unique_ids,
+            {k: encode_postings(np.array(v)) for k, v in postings.items()},
+        )
+
+    def segment_track(
+        self,
+        repository: SongRepository,
+        preprocessor: Preprocessor,
+        table: SegmentTable,
+        row: int,
+    ) -> Track:
+        """Recreate the segment track of a table row from the repository."""
+        song = repository.load_song(self.keys[table.song_ids[row]])
+        track = song.tracks[table.track_ids[row]]
+        segments = preprocessor.segmentation_strategy.segment_views(
+            track, table.segment_len
+        )
+        return segments.track(int(table.segment_ids[row]))
+
+    def share(self) -> None:
+        """Move the table arrays to a block of shared memory."""
+        if self.shared is not None:
+            return
+        self.shared = SharedArrays(
+            {
+                f"{length}.{name}": getattr(table, name)
+                for length, table in self.tables.items()
+                for name in SHARED_FIELDS
+            }
+        )
+        self.__attach_tables()
+        logger.info(f"Shared segment index arrays, {self.shared.size} bytes")
+
+    def unshare(self) -> None:
+        """Unlink the shared memory, existing views stay valid until exit."""
+        if self.shared is not None:
+            self.shared.unlink()
+
+    def __attach_tables(self) -> None:
+        assert self.shared is not None
+        for key, array in self.shared.arrays.items():
+            length, name = key.split(".")
+            setattr(self.tables[int(length)], name, array)
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        if self.shared is None or not self.shared.linked:
+            state["shared"] = None
+            return state
+        state["tables"] = {
+            length: dataclasses.replace(table, **{i: None for i in SHARED_FIELDS})
+            for length, table in self.tables.items()
+        }
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if self.shared is not None:
+            self.__attach_tables()
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            # Saved indexes always contain the arrays
+            pickle.dump(dataclasses.replace(self, shared=None), f)
+
+    def is_current(self, repository: SongRepository) -> bool:
+        """Whether the index still matches the songs of repository."""
+        return self.corpus_version == repository.get_corpus_version()
+
+    @staticmethod
+    def load(path: str) -> "SegmentIndex":
+        with open(path, "rb") as f:
+            return pickle.load(f)
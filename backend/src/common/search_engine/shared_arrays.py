@@ -0,0 +1,66 @@
+from multiprocessing import shared_memory
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+# Arrays start at multiples of a cache line
+ALIGNMENT = 64
+
+
+class SharedArrays:
+    """NumPy arrays stored in a single block of shared memory.
+
+    Pickled copies only carry the name of the block and the layout of the
+    arrays, unpickling attaches to the block and creates read-only views of
+    it without copying the data. The process, that created the block, owns it
+    and unlinks it.
+    """
+
+    def __init__(self, arrays: dict[str, npt.NDArray[Any]]) -> None:
+        self.layout: list[tuple[str, str, tuple[int, ...], int]] = []
+        size = 0
+        for key, array in arrays.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            self.layout.append((key, array.dtype.str, array.shape, size))
+            size += array.nbytes
+        self.__memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.owner = True
+        self.linked = True
+        self.arrays = self.__views()
+        for key, array in arrays.items():
+            self.arrays[key][...] = array
+
+    def __views(self) -> dict[str, npt.NDArray[Any]]:
+        return {
+            key: np.ndarray(shape, dtype, buffer=self.__memory.buf, offset=offset)
+            for key, dtype, shape, offset in self.layout
+        }
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"name": self.__memory.name, "layout": self.layout}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.layout = state["layout"]
+        self.__memory = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self.linked = True
+        self.arrays = self.__views()
+        for i in self.arrays.values():
+            i.flags.writeable = False
+
+    @property
+    def name(self) -> str:
+        return self.__memory.name
+
+    @property
+    def size(self) -> int:
+        return self.__memory.size
+
+    def unlink(self) -> None:
+        """Free the block once all processes detach, owner only.
+
+        Existing views stay valid, new processes cannot attach anymore.
+        """
+        if self.owner and self.linked:
+            self.__memory.unlink()
+            self.linked = False
@@ -0,0 +1,178 @@
+"""Dynamic programming kernels of the similarity strategies.
+
+The kernels are plain loops, that Numba compiles to machine code. The compiled
+versions are cached on disk, so workers do not compile them again. When Numba
+is not installed or config.USE_JIT is off, the compiled kernels are None and
+the strategies use their NumPy implementations.
+
+All kernels compare line with every padded row of segments, row k is
+lengths[k] long. Comparisons stop early as described in
+SimilarityStrategy.score_line, if use_cutoff is set.
+"""
+from typing import Any, Callable, Optional
+import numpy as np
+import numpy.typing as npt
+import common.config as config
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+Kernel = Callable[..., npt.NDArray[np.float64]]
+
+
+def compile_kernel(kernel: Any) -> Optional[Kernel]:
+    if numba is None or not config.USE_JIT:
+        return None
+    return numba.njit(cache=True, nogil=True)(kernel)
+
+
+def run_kernel(
+    kernel: Kernel,
+    line: npt.NDArray[np.int64],
+    segments: npt.NDArray[np.int64],
+    lengths: npt.NDArray[np.int64],
+    cutoff: Optional[float],
+    *params: Any,
+) -> npt.NDArray[np.float64]:
+    """Call kernel with contiguous int64 arrays, params follow lengths."""
+    return kernel(
+        np.asarray(line, dtype=np.int64),
+        np.ascontiguousarray(segments, dtype=np.int64),
+        np.asarray(lengths, dtype=np.int64),
+        *params,
+        cutoff is not None,
+        0.0 if cutoff is None else float(cutoff),
+    )
+
+
+def lcs_kernel(
+    line: npt.NDArray[np.int64],
+    segments: npt.NDArray[np.int64],
+    lengths: npt.NDArray[np.int64],
+    use_cutoff: bool,
+    cutoff: float,
+) -> npt.NDArray[np.float64]:
+    """Longest common subsequence, the DP runs over the symbols of segments."""
+    n = len(line)
+    res = np.zeros(len(lengths), dtype=np.float64)
+    prev = np.zeros(n + 1, dtype=np.int64)
+    cur = np.zeros(n + 1, dtype=np.int64)
+    for k in range(len(lengths)):
+        m = lengths[k]
+        if use_cutoff and min(n, m) < cutoff:
+            res[k] = min(n, m)
+            continue
+        prev[:] = 0
+        abandoned = False
+        for j in range(m):
+            symbol = segments[k, j]
+            for i in range(1, n + 1):
+                if line[i - 1] == symbol:
+                    cur[i] = prev[i - 1] + 1
+                else:
+                    cur[i] = max(cur[i - 1], prev[i])
+            prev, cur = cur, prev
+            # Every remaining symbol can extend the subsequence by one at most
+            bound = prev[n] + m - j - 1
+            if use_cutoff and bound < cutoff:
+                res[k] = bound
+                abandoned = True
+                break
+        if not abandoned:
+            res[k] = prev[n]
+    return res
+
+
+def dtw_kernel(
+    line: npt.NDArray[np.int64],
+    segments: npt.NDArray[np.int64],
+    lengths: npt.NDArray[np.int64],
+    windows: npt.NDArray[np.int64],
+    use_cutoff: bool,
+    cutoff: float,
+) -> npt.NDArray[np.float64]:
+    """Dynamic time warping, cells further than windows[k] from the diagonal
+    are excluded from the warping paths of segment k."""
+    n = len(line)
+    width = segments.shape[1]
+    res = np.zeros(len(lengths), dtype=np.float64)
+    prev = np.empty(width + 1, dtype=np.float64)
+    cur = np.empty(width + 1, dtype=np.float64)
+    for k in range(len(lengths)):
+        m = lengths[k]
+        w = windows[k]
+        prev[:] = np.inf
+        prev[0] = 0
+        abandoned = False
+        for i in range(1, n + 1):
+            cur[0] = np.inf
+            row_min = np.inf
+            for j in range(1, m + 1):
+                if abs(i - j) > w:
+                    cur[j] = np.inf
+                else:
+                    cost = abs(line[i - 1] - segments[k, j - 1])
+                    cur[j] = cost + min(prev[j], prev[j - 1], cur[j - 1])
+                row_min = min(row_min, cur[j])
+            prev, cur = cur, prev
+            # Every warping path passes through the current row
+            if use_cutoff and row_min > cutoff:
+                res[k] = row_min
+                abandoned = True
+                break
+        if not abandoned:
+            res[k] = prev[m]
+    return res
+
+
+def local_alignment_kernel(
+    line: npt.NDArray[np.int64],
+    segments: npt.NDArray[np.int64],
+    lengths: npt.NDArray[np.int64],
+    match: int,
+    mismatch: int,
+    gap: int,
+    use_cutoff: bool,
+    cutoff: float,
+) -> npt.NDArray[np.float64]:
+    """Smith-Waterman local alignment score."""
+    n = len(line)
+    width = segments.shape[1]
+    res = np.zeros(len(lengths), dtype=np.float64)
+    prev = np.zeros(width + 1, dtype=np.int64)
+    cur = np.zeros(width + 1, dtype=np.int64)
+    for k in range(len(lengths)):
+        m = lengths[k]
+        prev[:] = 0
+        best = 0
+        abandoned = False
+        for i in range(n):
+            cur[0] = 0
+            row_max = 0
+            for j in range(1, m + 1):
+                if line[i] == segments[k, j - 1]:
+                    diagonal = prev[j - 1] + match
+                else:
+                    diagonal = prev[j - 1] + mismatch
+                value = max(0, diagonal, prev[j] + gap, cur[j - 1] + gap)
+                cur[j] = value
+                row_max = max(row_max, value)
+            prev, cur = cur, prev
+            best = max(best, row_max)
+            # Alignments can gain one match per each of the remaining rows
+            bound = max(best, row_max + (n - i - 1) * match)
+            if use_cutoff and bound < cutoff:
+                res[k] = bound
+                abandoned = True
+                break
+        if not abandoned:
+            res[k] = best
+    return res
+
+
+lcs = compile_kernel(lcs_kernel)
+dtw = compile_kernel(dtw_kernel)
+local_alignment = compile_kernel(local_alignment_kernel)
@@ -1,4 +1,7 @@
+from typing import Sequence
 from common.entity.song import Track
+from common.search_engine.n_gram import extract_melody
+from common.search_engine.strategy.segmentation_strategy import TrackSegments
 from abc import ABC, abstractmethod
 import numpy as np
 import numpy.typing as npt
@@ -9,17 +12,48 @@ class MelodyExtractionStrategy(ABC):
     def extract(self, track: Track) -> npt.NDArray[np.int64]:
         pass
 
+    def extract_batch(self, tracks: Sequence[Track]) -> list[npt.NDArray[np.int64]]:
+        """Melodies of all tracks, strategies may extract them in one pass."""
+        return [self.extract(i) for i in tracks]
+
+    def extract_segments(self, segments: TrackSegments) -> list[npt.NDArray[np.int64]]:
+        """Melodies of all segments, strategies may avoid creating their Tracks."""
+        return self.extract_batch(segments.tracks())
+
 
 class TopNoteStrategy(MelodyExtractionStrategy):
+    """Pitches of notes starting later than all previous notes. A following note
+    with the same onset and a higher pitch, than the starting note, replaces it.
+    """
+
     def extract(self, track: Track) -> npt.NDArray[np.int64]:
-        last_pitch = -1
-        last_time = -1
-        res: list[int] = []
-        for i in track.notes:
-            if i.time == last_time and i.pitch > last_pitch:
-                res[-1] = i.pitch
-            elif i.time > last_time:
-                res.append(i.pitch)
-                last_time = i.time
-                last_pitch = i.pitch
-        return np.array(res)
+        pitches = track.pitches.astype(np.int64)
+        return pitches[extract_melody(track.times.astype(np.int64), pitches)]
+
+    def extract_batch(self, tracks: Sequence[Track]) -> list[npt.NDArray[np.int64]]:
+        return self.extract_segments(TrackSegments.from_tracks(list(tracks)))
+
+    def extract_segments(self, segments: TrackSegments) -> list[npt.NDArray[np.int64]]:
+        if len(segments) == 0:
+            return []
+        bounds = segments.bounds
+        counts = segments.counts()
+        times = segments.times()
+        pitches = segments.pitches()
+
+        # Shift the times of every segment above all times of the previous ones,
+        # so a single pass never groups notes of different segments
+        non_empty = counts > 0
+        starts = bounds[:-1][non_empty]
+        if len(starts):
+            low = np.minimum.reduceat(times, starts)
+            span = np.maximum.reduceat(times, starts) - low + 1
+            base = np.cumsum(span) - span
+            times += np.repeat(base - low, counts[non_empty])
+
+        melody = extract_melody(times, pitches)
+        melody_bounds = np.searchsorted(melody, bounds)
+        return [
+            pitches[melody[melody_bounds[i] : melody_bounds[i + 1]]]
+            for i in range(len(segments))
+        ]
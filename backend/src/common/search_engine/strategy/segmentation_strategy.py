@@ -1,5 +1,65 @@
 from abc import abstractmethod, ABC
-from common.entity.song import Track, Note
+from dataclasses import dataclass
+from typing import Any, Optional
+import numpy as np
+import numpy.typing as npt
+from common.entity.song import NOTE_DTYPE, Track
+
+
+@dataclass
+class TrackSegments:
+    """Segments of a track as ranges of a note array.
+
+    Segment `i` consists of `notes[bounds[i] : bounds[i + 1]]` moved back in
+    time by `time_offsets[i]`. No Tracks are created, until track() is called,
+    which also clips note lengths to clip_len, if it is set.
+    """
+
+    notes: npt.NDArray[Any]
+    bounds: npt.NDArray[np.int64]
+    time_offsets: npt.NDArray[np.int64]
+    grid_lengths: npt.NDArray[np.int64]
+    clip_len: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.bounds) - 1
+
+    def counts(self) -> npt.NDArray[np.int64]:
+        return np.diff(self.bounds)
+
+    def times(self) -> npt.NDArray[np.int64]:
+        """Times of all notes relative to the start of their segment."""
+        shift = np.repeat(self.time_offsets, self.counts())
+        return self.notes["time"].astype(np.int64) - shift
+
+    def pitches(self) -> npt.NDArray[np.int64]:
+        return self.notes["pitch"].astype(np.int64)
+
+    def track(self, i: int) -> Track:
+        notes = self.notes[self.bounds[i] : self.bounds[i + 1]]
+        if self.time_offsets[i] == 0 and self.clip_len is None:
+            return Track(notes, int(self.grid_lengths[i]))
+        times = notes["time"].astype(np.int64) - self.time_offsets[i]
+        lengths = notes["length"]
+        if self.clip_len is not None:
+            lengths = np.minimum(lengths, self.clip_len - times)
+        return Track.from_columns(
+            times, lengths, notes["pitch"], int(self.grid_lengths[i])
+        )
+
+    def tracks(self) -> list[Track]:
+        return [self.track(i) for i in range(len(self))]
+
+    @staticmethod
+    def from_tracks(tracks: list[Track]) -> "TrackSegments":
+        bounds = np.zeros(len(tracks) + 1, dtype=np.int64)
+        bounds[1:] = np.cumsum([len(i) for i in tracks])
+        return TrackSegments(
+            np.concatenate([np.zeros(0, dtype=NOTE_DTYPE)] + [i.array for i in tracks]),
+            bounds,
+            np.zeros(len(tracks), dtype=np.int64),
+            np.array([i.grid_length for i in tracks], dtype=np.int64),
+        )
 
 
 class SegmentationStrategy(ABC):
@@ -7,6 +67,10 @@ class SegmentationStrategy(ABC):
     def segment(self, track: Track, segment_len: int) -> list[Track]:
         pass
 
+    def segment_views(self, track: Track, segment_len: int) -> TrackSegments:
+        """Segments of track, that are only materialized as Tracks on demand."""
+        return TrackSegments.from_tracks(self.segment(track, segment_len))
+
 
 class OneSegmentStrategy(SegmentationStrategy):
     def segment(self, track: Track, segment_len: int) -> list[Track]:
@@ -14,21 +78,40 @@ class OneSegmentStrategy(SegmentationStrategy):
 
 
 class FixedLengthStrategy(SegmentationStrategy):
+    """Segments of segment_len ticks, notes are assigned by their onset and
+    clipped at the end of the segment. Segments are ordered by their first
+    note, notes keep their order within segments."""
+
     def segment(self, track: Track, segment_len: int) -> list[Track]:
         if track.grid_length <= segment_len:
             return [track]
-        segments: dict[int, Track] = dict()
-
-        for n in track.notes:
-            segment_num = n.time // segment_len
-            new_time = n.time % segment_len
-            new_len = n.length
-            if new_time + new_len > segment_len:
-                new_len = segment_len - new_time
-
-            new_note = Note(new_time, new_len, n.pitch)
-            if segment_num in segments:
-                segments[segment_num].notes.append(new_note)
-            else:
-                segments[segment_num] = Track([new_note], segment_len)
-        return list(segments.values())
+        return self.segment_views(track, segment_len).tracks()
+
+    def segment_views(self, track: Track, segment_len: int) -> TrackSegments:
+        if track.grid_length <= segment_len:
+            return TrackSegments.from_tracks([track])
+        notes = track.array
+        segment_nums = notes["time"].astype(np.int64) // segment_len
+        if np.any(segment_nums[1:] < segment_nums[:-1]):
+            # Notes are not ordered by time, group them stably in the order of
+            # the first note of every segment
+            _, first, inverse = np.unique(
+                segment_nums, return_index=True, return_inverse=True
+            )
+            rank = np.empty(len(first), dtype=np.int64)
+            rank[np.argsort(first)] = np.arange(len(first))
+            order = np.argsort(rank[inverse], kind="stable")
+            notes = notes[order]
+            segment_nums = segment_nums[order]
+
+        new_segment = np.ones(len(notes), dtype=np.bool_)
+        new_segment[1:] = segment_nums[1:] != segment_nums[:-1]
+        starts = np.flatnonzero(new_segment)
+        bounds = np.append(starts, len(notes)).astype(np.int64)
+        return TrackSegments(
+            notes,
+            bounds,
+            segment_nums[starts] * segment_len,
+            np.full(len(starts), segment_len, dtype=np.int64),
+            segment_len,
+        )
@@ -1,14 +1,89 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Generic, Optional, TypeVar, cast
 import numpy as np
 import numpy.typing as npt
-from scipy.stats import wasserstein_distance
 from fastdtw import fastdtw
 from Bio import Align
 import wasserstein
+from common.entity.search_stats import SearchStats
+from common.search_engine.strategy import kernels
 
 
-class SimilarityStrategy(ABC):
+@dataclass
+class PreparedQuery:
+    """Query line with the data a strategy precomputes to score segments
+    against it. Strategies subclass it, callers treat it as opaque."""
+
+    line: npt.NDArray[np.int64]
+
+
+@dataclass
+class LCSQuery(PreparedQuery):
+    # Bitmask of the positions of every symbol in the query
+    masks: dict[int, int]
+
+
+@dataclass
+class DTWWinQuery(PreparedQuery):
+    # Lower and upper envelopes of the query by window, filled on demand
+    envelopes: dict[int, tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]] = field(
+        default_factory=dict
+    )
+
+
+@dataclass
+class LocalAlignmentQuery(PreparedQuery):
+    symbols: npt.NDArray[np.int64]
+    profile: npt.NDArray[np.int32]
+
+
+@dataclass
+class TextQuery(PreparedQuery):
+    text: str
+
+
+@dataclass
+class PointsQuery(PreparedQuery):
+    points: npt.NDArray[np.float64]
+
+
+@dataclass(frozen=True)
+class StrategyCapabilities:
+    """What a similarity strategy supports, search engines pick their execution
+    path from it.
+
+    batchable: score() is vectorized over a whole batch of segments.
+    metric: scores are distances satisfying the triangle inequality.
+    bounded: comparisons abandon early on a cutoff or prune with lower bounds.
+    index_backed: scores depend only on the standardized segments, so they can
+    be computed from a SegmentIndex.
+    """
+
+    batchable: bool = False
+    metric: bool = False
+    bounded: bool = False
+    index_backed: bool = True
+
+
+Q = TypeVar("Q", bound=PreparedQuery)
+
+
+class SimilarityStrategy(ABC, Generic[Q]):
+    """Strategies score the prepared query Q against segments one at a time in
+    score_line or a whole batch at once in score, and have to override at least
+    one of them."""
+
     highest_first = True
+    capabilities = StrategyCapabilities()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if (
+            cls.score is SimilarityStrategy.score
+            and cls.score_line is SimilarityStrategy.score_line
+        ):
+            raise TypeError(f"{cls.__name__} must override score or score_line")
 
     @property
     @abstractmethod
@@ -20,15 +95,107 @@ class SimilarityStrategy(ABC):
     def shortcut(self) -> str:
         pass
 
-    @abstractmethod
+    def prepare(self, line: npt.NDArray[np.int64]) -> Q:
+        """Precompute the query side of comparisons with line. Strategies with
+        their own query type override it."""
+        return cast(Q, PreparedQuery(np.asarray(line, dtype=np.int64)))
+
+    def score_line(
+        self,
+        prepared: Q,
+        line: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> float:
+        """Similarity of the prepared query and line.
+
+        If the score cannot be better than cutoff, the comparison may stop early
+        and return any score worse than cutoff.
+        """
+        line = np.asarray(line, dtype=np.int64)
+        return float(
+            self.score(prepared, line[None, :], np.array([len(line)]), cutoff)[0]
+        )
+
+    def score(
+        self,
+        prepared: Q,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        """Compare the prepared query with every row of segments.
+
+        Row i of segments holds a segment of length lengths[i], padded to the
+        length of the longest segment. Cutoff has the same meaning as in
+        score_line.
+        """
+        return np.array(
+            [
+                self.score_line(prepared, s[:n], cutoff)
+                for s, n in zip(segments, lengths)
+            ],
+            dtype=np.float64,
+        )
+
+    def prune(
+        self,
+        prepared: Q,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        threshold: Optional[float],
+        stats: SearchStats,
+    ) -> npt.NDArray[np.bool_]:
+        """Mask of segments, that can still score better than threshold.
+
+        Segments, that would score equal to threshold, have to be kept.
+        """
+        return np.ones(len(lengths), dtype=np.bool_)
+
     def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
+        self,
+        line1: npt.NDArray[np.int64],
+        line2: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
     ) -> float:
-        pass
+        """Similarity of line1 and line2, see score_line."""
+        line2 = np.asarray(line2, dtype=np.int64)
+        return float(
+            self.score(
+                self.prepare(line1), line2[None, :], np.array([len(line2)]), cutoff
+            )[0]
+        )
 
+    def compare_batch(
+        self,
+        line: npt.NDArray[np.int64],
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        return self.score(self.prepare(line), segments, lengths, cutoff)
+
+    def prune_batch(
+        self,
+        line: npt.NDArray[np.int64],
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        threshold: Optional[float],
+        stats: SearchStats,
+    ) -> npt.NDArray[np.bool_]:
+        return self.prune(self.prepare(line), segments, lengths, threshold, stats)
+
+
+class LCSStrategy(SimilarityStrategy[LCSQuery]):
+    """Longest common subsequence computed with bit-parallel algorithm.
+
+    Every symbol of the query gets a bitmask of its positions in the query.
+    Each symbol of the compared line is then processed with a few operations on
+    the bit vector of the whole DP row (Allison-Dix, Hyyro). Python integers
+    have arbitrary precision, so queries of any length fit into one vector.
+    """
 
-class LCSStrategy(SimilarityStrategy):
     highest_first = True
+    capabilities = StrategyCapabilities(bounded=True)
 
     @property
     def name(self) -> str:
@@ -38,23 +205,59 @@ class LCSStrategy(SimilarityStrategy):
     def shortcut(self) -> str:
         return "lcs"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
+    @staticmethod
+    def match_masks(line: npt.NDArray[np.int64]) -> dict[int, int]:
+        masks: dict[int, int] = dict()
+        for i, symbol in enumerate(line.tolist()):
+            masks[symbol] = masks.get(symbol, 0) | (1 << i)
+        return masks
+
+    def prepare(self, line: npt.NDArray[np.int64]) -> LCSQuery:
+        line = np.asarray(line, dtype=np.int64)
+        return LCSQuery(line, LCSStrategy.match_masks(line))
+
+    def score(
+        self,
+        prepared: LCSQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        if kernels.lcs is None:
+            return super().score(prepared, segments, lengths, cutoff)
+        return kernels.run_kernel(kernels.lcs, prepared.line, segments, lengths, cutoff)
+
+    def score_line(
+        self,
+        prepared: LCSQuery,
+        line: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
     ) -> float:
-        dp_table = np.zeros((len(line1) + 1, len(line2) + 1))
-        for i in range(1, len(line1) + 1):
-            for j in range(1, len(line2) + 1):
-                if line1[i - 1] == line2[j - 1]:
-                    dp_table[i - 1][j - 1] = 1 + dp_table[i - 2][j - 2]
-                else:
-                    dp_table[i - 1][j - 1] = max(
-                        dp_table[i - 1][j - 2], dp_table[i - 2][j - 1]
-                    )
-        return dp_table[len(line1) - 1][len(line2) - 1]
-
-
-class DTWStrategy(SimilarityStrategy):
+        line1 = prepared.line
+        line2 = line
+        if cutoff is not None and min(len(line1), len(line2)) < cutoff:
+            return float(min(len(line1), len(line2)))
+
+        masks = prepared.masks
+        mask = (1 << len(line1)) - 1
+        symbols = line2.tolist()
+        row = -1
+        for i, symbol in enumerate(symbols):
+            matches = row & masks.get(symbol, 0)
+            row = (row + matches) | (row - matches)
+            # Every remaining symbol can extend the subsequence by one at most
+            remaining = len(symbols) - i - 1
+            if cutoff is not None and remaining < cutoff:
+                bound = bin(~row & mask).count("1") + remaining
+                if bound < cutoff:
+                    return float(bound)
+        # Zero bits of the row mark the matched symbols of line1
+        return float(bin(~row & mask).count("1"))
+
+
+class DTWStrategy(SimilarityStrategy[PreparedQuery]):
     highest_first = False
+    capabilities = StrategyCapabilities(batchable=True, bounded=True)
 
     @property
     def name(self) -> str:
@@ -64,26 +267,81 @@ class DTWStrategy(SimilarityStrategy):
     def shortcut(self) -> str:
         return "dtw"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
-    ) -> float:
-        len1 = len(line1)
-        len2 = len(line2)
-        dtw = np.zeros((len1 + 1, len2 + 1))
-        for i in range(len1 + 1):
-            for j in range(len2 + 1):
-                dtw[i][j] = np.inf
-        dtw[0, 0] = 0
-        for i in range(1, len1 + 1):
-            for j in range(1, len2 + 1):
-                cost = abs(line1[i - 1] - line2[j - 1])
-                last_min = min(dtw[i - 1][j], dtw[i][j - 1], dtw[i - 1][j - 1])
-                dtw[i][j] = cost + last_min
-        return dtw[-1][-1]
-
-
-class DTWWinStrategy(SimilarityStrategy):
+    @staticmethod
+    def dtw_batch(
+        line: npt.NDArray[np.int64],
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        windows: Optional[npt.NDArray[np.int64]] = None,
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        """DTW distances between line and every padded row of segments.
+
+        The DP runs over rows of the DTW matrix, every cell is computed for all
+        segments at once. Cells further than windows[k] from the diagonal are
+        excluded from the warping paths of segment k. Segments, whose every
+        warping path costs more than cutoff, are abandoned and get the lowest
+        cost reached.
+        """
+        if kernels.dtw is not None:
+            if windows is None:
+                windows = np.full(len(lengths), max(len(line), segments.shape[1]))
+            return kernels.run_kernel(
+                kernels.dtw, line, segments, lengths, cutoff, windows
+            )
+        res = np.zeros(len(lengths), dtype=np.float64)
+        active = np.arange(len(lengths))
+        # Segments are stored column-wise, so that one DP cell is contiguous
+        segments_t = np.ascontiguousarray(segments.T, dtype=np.float64)
+        width = segments_t.shape[0]
+        columns = np.arange(1, width + 1)
+        valid = columns[:, None] <= lengths
+
+        prev = np.full((width + 1, len(lengths)), np.inf)
+        prev[0] = 0
+        cur = np.empty_like(prev)
+        for i in range(1, len(line) + 1):
+            cur[0] = np.inf
+            cost = np.abs(segments_t - line[i - 1])
+            if windows is not None:
+                cost[np.abs(i - columns)[:, None] > windows] = np.inf
+            diag_up = np.minimum(prev[1:], prev[:-1])
+            for j in range(1, width + 1):
+                np.minimum(diag_up[j - 1], cur[j - 1], out=cur[j])
+                cur[j] += cost[j - 1]
+            prev, cur = cur, prev
+
+            if cutoff is None:
+                continue
+            # Every warping path passes through the current row
+            row_min = np.where(valid, prev[1:], np.inf).min(axis=0, initial=np.inf)
+            abandoned = row_min > cutoff
+            if abandoned.any():
+                res[active[abandoned]] = row_min[abandoned]
+                alive = ~abandoned
+                active = active[alive]
+                segments_t = segments_t[:, alive]
+                valid = valid[:, alive]
+                prev = prev[:, alive]
+                cur = np.empty_like(prev)
+                if windows is not None:
+                    windows = windows[alive]
+        res[active] = prev[lengths[active], np.arange(len(active))]
+        return res
+
+    def score(
+        self,
+        prepared: PreparedQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        return DTWStrategy.dtw_batch(prepared.line, segments, lengths, cutoff=cutoff)
+
+
+class DTWWinStrategy(SimilarityStrategy[DTWWinQuery]):
     highest_first = False
+    capabilities = StrategyCapabilities(batchable=True, bounded=True)
     window = 3
 
     @property
@@ -94,31 +352,77 @@ class DTWWinStrategy(SimilarityStrategy):
     def shortcut(self) -> str:
         return "dtwwin"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
-    ) -> float:
-        n, m = len(line1), len(line2)
-        w = np.max([self.window, abs(n - m)])
-        dtw = np.zeros((n + 1, m + 1))
-
-        for i in range(n + 1):
-            for j in range(m + 1):
-                dtw[i][j] = np.inf
-        dtw[0][0] = 0
-
-        for i in range(1, n + 1):
-            for j in range(max(1, i - w), min(m, i + w) + 1):
-                dtw[i][j] = 0
-
-        for i in range(1, n + 1):
-            for j in range(max(1, i - w), min(m, i + w) + 1):
-                cost = abs(line1[i - 1] - line2[j - 1])
-                last_min = min(dtw[i - 1][j], dtw[i][j - 1], dtw[i - 1][j - 1])
-                dtw[i][j] = cost + last_min
-        return dtw[-1][-1]
-
-
-class FDTWStrategyLib(SimilarityStrategy):
+    def prepare(self, line: npt.NDArray[np.int64]) -> DTWWinQuery:
+        return DTWWinQuery(np.asarray(line, dtype=np.int64))
+
+    @staticmethod
+    def get_envelope(
+        prepared: DTWWinQuery, w: int
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Lowest and highest value of the query, that column j of the DTW matrix
+        can be matched with under window w. Segments matched with the query under
+        window w are at most len(query) + w long."""
+        if w not in prepared.envelopes:
+            line = prepared.line
+            n = len(line)
+            bands = [line[max(0, j - w) : min(n, j + w + 1)] for j in range(n + w)]
+            prepared.envelopes[w] = (
+                np.array([i.min() for i in bands], dtype=np.int64),
+                np.array([i.max() for i in bands], dtype=np.int64),
+            )
+        return prepared.envelopes[w]
+
+    def prune(
+        self,
+        prepared: DTWWinQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        threshold: Optional[float],
+        stats: SearchStats,
+    ) -> npt.NDArray[np.bool_]:
+        """Prune segments with LB_Kim followed by LB_Keogh."""
+        line = prepared.line
+        keep = np.ones(len(lengths), dtype=np.bool_)
+        if threshold is None or len(line) == 0 or segments.shape[1] == 0:
+            return keep
+
+        # LB_Kim: every warping path contains the first and the last cell
+        last = segments[np.arange(len(lengths)), np.maximum(lengths - 1, 0)]
+        lb_kim = np.abs(segments[:, 0] - line[0])
+        lb_kim += np.where((len(line) > 1) | (lengths > 1), np.abs(last - line[-1]), 0)
+        pruned = (lengths > 0) & (lb_kim > threshold)
+        stats.pruned_lb_kim += int(pruned.sum())
+        keep &= ~pruned
+
+        # LB_Keogh: every warping path visits each column of the DTW matrix
+        windows = np.maximum(self.window, np.abs(len(line) - lengths))
+        for w in np.unique(windows[keep]).tolist():
+            rows = np.flatnonzero(keep & (windows == w))
+            lower, upper = DTWWinStrategy.get_envelope(prepared, w)
+            width = min(segments.shape[1], len(lower))
+            values = segments[rows, :width]
+            dist = np.maximum(
+                np.maximum(values - upper[:width], lower[:width] - values), 0
+            )
+            dist[np.arange(width) >= lengths[rows, None]] = 0
+            pruned_rows = rows[dist.sum(axis=1) > threshold]
+            stats.pruned_lb_keogh += len(pruned_rows)
+            keep[pruned_rows] = False
+        return keep
+
+    def score(
+        self,
+        prepared: DTWWinQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        line = prepared.line
+        windows = np.maximum(self.window, np.abs(len(line) - lengths))
+        return DTWStrategy.dtw_batch(line, segments, lengths, windows, cutoff)
+
+
+class FDTWStrategyLib(SimilarityStrategy[PreparedQuery]):
     highest_first = False
 
     @property
@@ -129,15 +433,30 @@ class FDTWStrategyLib(SimilarityStrategy):
     def shortcut(self) -> str:
         return "fdtwl"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
+    def score_line(
+        self,
+        prepared: PreparedQuery,
+        line: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
     ) -> float:
-        dist, _ = fastdtw(line1, line2, min(len(line1), len(line2)))
+        dist, _ = fastdtw(prepared.line, line, min(len(prepared.line), len(line)))
         return dist
 
 
-class LocalAlignmentStrategy(SimilarityStrategy):
+class LocalAlignmentStrategy(SimilarityStrategy[LocalAlignmentQuery]):
+    """Smith-Waterman local alignment score.
+
+    The DP runs over rows of the score matrix, every row is computed for a whole
+    batch of segments at once. The horizontal gap dependency within a row is
+    resolved with a running maximum: H[j] = max over k <= j of E[k] - gap * (j - k),
+    where E is the best of the diagonal and vertical moves.
+    """
+
     highest_first = True
+    capabilities = StrategyCapabilities(batchable=True, bounded=True)
+    match = 1
+    mismatch = -1
+    gap = -2
 
     @property
     def name(self) -> str:
@@ -147,32 +466,96 @@ class LocalAlignmentStrategy(SimilarityStrategy):
     def shortcut(self) -> str:
         return "lca"
 
-    def __clamp_num(self, a: int) -> int:
-        if a < 0:
-            return 0
-        return a
-
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
-    ) -> float:
-        match = 1
-        mismatch = -1
-        gap = -2
-        score_mat = np.zeros((len(line1) + 1, len(line2) + 1), dtype=np.float64)
-        for i in range(1, len(line1) + 1):
-            for j in range(1, len(line2) + 1):
-                ln = self.__clamp_num(score_mat[i][j - 1] + gap)
-                un = self.__clamp_num(score_mat[i - 1][j] + gap)
-                if line1[i - 1] == line2[j - 1]:
-                    dn = self.__clamp_num(score_mat[i - 1][j - 1] + match)
-                else:
-                    dn = self.__clamp_num(score_mat[i - 1][j - 1] + mismatch)
-                score_mat[i][j] = max(ln, un, dn)
-        return float(np.max(score_mat))
-
-
-class LocalAlignmentStrategyLib(SimilarityStrategy):
+    def prepare(self, line: npt.NDArray[np.int64]) -> LocalAlignmentQuery:
+        """Query with its sorted distinct symbols and profile. Row i of the
+        profile holds the score of matching line[i] with each of the symbols,
+        the last column is used for symbols missing in line."""
+        line = np.asarray(line, dtype=np.int64)
+        symbols = np.unique(line)
+        profile = np.full((len(line), len(symbols) + 1), self.mismatch, dtype=np.int32)
+        profile[:, :-1][line[:, None] == symbols[None, :]] = self.match
+        return LocalAlignmentQuery(line, symbols, profile)
+
+    def score(
+        self,
+        prepared: LocalAlignmentQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        """Segments, whose alignments cannot reach cutoff, are abandoned and get
+        an upper bound of their score, that is lower than cutoff."""
+        line = prepared.line
+        if kernels.local_alignment is not None:
+            return kernels.run_kernel(
+                kernels.local_alignment,
+                line,
+                segments,
+                lengths,
+                cutoff,
+                self.match,
+                self.mismatch,
+                self.gap,
+            )
+        symbols = prepared.symbols
+        profile = prepared.profile
+        res = np.zeros(len(lengths), dtype=np.float64)
+        width = segments.shape[1]
+        if len(line) == 0 or width == 0 or len(lengths) == 0:
+            return res
+
+        # Segments are stored column-wise, symbols are replaced by profile columns
+        segments_t = np.ascontiguousarray(segments.T)
+        codes = np.searchsorted(symbols, segments_t)
+        found = codes < len(symbols)
+        found[found] = symbols[codes[found]] == segments_t[found]
+        codes[~found] = len(symbols)
+        valid = np.arange(width)[:, None] < lengths
+        # Moving right along a row costs gap per column
+        slope = (-self.gap * np.arange(width, dtype=np.int32))[:, None]
+
+        active = np.arange(len(lengths))
+        best = np.zeros(len(lengths), dtype=np.int32)
+        prev = np.zeros((width + 1, len(lengths)), dtype=np.int32)
+        for i in range(len(line)):
+            cur = np.maximum(prev[:-1] + profile[i][codes], prev[1:] + self.gap)
+            np.maximum(cur, 0, out=cur)
+            cur += slope
+            np.maximum.accumulate(cur, axis=0, out=cur)
+            cur -= slope
+            row_max = np.where(valid, cur, 0).max(axis=0)
+            np.maximum(best, row_max, out=best)
+            prev[1:] = cur
+
+            if cutoff is None:
+                continue
+            # Alignments can gain one match per each of the remaining rows
+            bound = np.maximum(best, row_max + (len(line) - i - 1) * self.match)
+            abandoned = bound < cutoff
+            if abandoned.any():
+                res[active[abandoned]] = bound[abandoned]
+                alive = ~abandoned
+                active = active[alive]
+                codes = codes[:, alive]
+                valid = valid[:, alive]
+                best = best[alive]
+                prev = np.ascontiguousarray(prev[:, alive])
+        res[active] = best
+        return res
+
+
+class LocalAlignmentStrategyLib(SimilarityStrategy[TextQuery]):
     highest_first = True
+    capabilities = StrategyCapabilities(bounded=True)
+
+    def __init__(self) -> None:
+        self.__aligner = Align.PairwiseAligner(
+            mode="local",
+            match_score=1,
+            mismatch_score=-1,
+            extend_gap_score=-2,
+            open_gap_score=-2,
+        )
 
     @property
     def name(self) -> str:
@@ -182,23 +565,38 @@ class LocalAlignmentStrategyLib(SimilarityStrategy):
     def shortcut(self) -> str:
         return "lcabp"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
+    @staticmethod
+    def to_text(line: npt.NDArray[np.int64]) -> str:
+        return "".join(map(chr, (np.asarray(line, dtype=np.int64) + 128).tolist()))
+
+    def prepare(self, line: npt.NDArray[np.int64]) -> TextQuery:
+        line = np.asarray(line, dtype=np.int64)
+        return TextQuery(line, LocalAlignmentStrategyLib.to_text(line))
+
+    def score_line(
+        self,
+        prepared: TextQuery,
+        line: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
     ) -> float:
-        tl1 = "".join(chr(int(i) + 128) for i in line1)
-        tl2 = "".join(chr(int(i) + 128) for i in line2)
-        pa = Align.PairwiseAligner(
-            mode="local",
-            match_score=1,
-            mismatch_score=-1,
-            extend_gap_score=-2,
-            open_gap_score=-2,
+        if cutoff is not None and min(len(prepared.line), len(line)) < cutoff:
+            return float(min(len(prepared.line), len(line)))
+        return self.__aligner.score(
+            prepared.text, LocalAlignmentStrategyLib.to_text(line)
         )
-        return pa.score(tl1, tl2)
 
 
-class EMDStrategySP(SimilarityStrategy):
+class EMDStrategySP(SimilarityStrategy[PreparedQuery]):
+    """1-D earth mover's distance between the value distributions of lines.
+
+    Values are small integers, so the distance is the L1 distance between
+    the cumulative histograms of the lines, which is computed for a whole
+    batch of segments at once. It equals scipy.stats.wasserstein_distance.
+    Empty lines have no distribution and get an infinite distance.
+    """
+
     highest_first = False
+    capabilities = StrategyCapabilities(batchable=True, metric=True)
 
     @property
     def name(self) -> str:
@@ -208,38 +606,93 @@ class EMDStrategySP(SimilarityStrategy):
     def shortcut(self) -> str:
         return "emdsp"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
-    ) -> float:
-        return wasserstein_distance(line1, line2)
+    @staticmethod
+    def cumulative_histograms(
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        low: int,
+        bins: int,
+    ) -> npt.NDArray[np.float64]:
+        """Normalized cumulative histograms of the padded rows of segments over
+        the values low, ..., low + bins - 1."""
+        valid = np.arange(segments.shape[1]) < lengths[:, None]
+        rows = np.broadcast_to(np.arange(len(lengths))[:, None], segments.shape)
+        counts = np.bincount(
+            rows[valid] * bins + segments[valid] - low, minlength=len(lengths) * bins
+        ).reshape(len(lengths), bins)
+        return np.cumsum(counts, axis=1) / np.maximum(lengths, 1)[:, None]
+
+    def score(
+        self,
+        prepared: PreparedQuery,
+        segments: npt.NDArray[np.int64],
+        lengths: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        line = prepared.line
+        res = np.full(len(lengths), np.inf)
+        non_empty = np.flatnonzero(lengths > 0)
+        if len(line) == 0 or len(non_empty) == 0:
+            return res
+        segments = np.asarray(segments[non_empty], dtype=np.int64)
+        lengths = lengths[non_empty]
+        valid = np.arange(segments.shape[1]) < lengths[:, None]
+        low = min(int(line.min()), int(segments[valid].min()))
+        bins = max(int(line.max()), int(segments[valid].max())) - low + 1
+
+        query = EMDStrategySP.cumulative_histograms(
+            line[None, :], np.array([len(line)]), low, bins
+        )
+        histograms = EMDStrategySP.cumulative_histograms(segments, lengths, low, bins)
+        res[non_empty] = np.abs(histograms - query).sum(axis=1)
+        return res
+
 
+class EMDStrategyCV(SimilarityStrategy[PointsQuery]):
+    """Earth mover's distance between lines as 2-D point sets of (position, value)."""
 
-class EMDStrategyCV(SimilarityStrategy):
     highest_first = False
+    capabilities = StrategyCapabilities(metric=True)
+
+    def __init__(self) -> None:
+        self.__emd: Optional[wasserstein.EMD] = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The EMD object cannot be pickled, workers create their own
+        state = self.__dict__.copy()
+        state[f"_{EMDStrategyCV.__name__}__emd"] = None
+        return state
 
     @property
     def name(self) -> str:
-        return "Earth mover's distance (SciPy library)"
+        return "Earth mover's distance (Wasserstein library)"
 
     @property
     def shortcut(self) -> str:
-        return "emdsp"
+        return "emdcv"
 
-    def compare(
-        self, line1: npt.NDArray[np.int64], line2: npt.NDArray[np.int64]
+    @staticmethod
+    def points(line: npt.NDArray[np.int64]) -> npt.NDArray[np.float64]:
+        return np.column_stack((np.arange(1, len(line) + 1), line)).astype(np.float64)
+
+    def prepare(self, line: npt.NDArray[np.int64]) -> PointsQuery:
+        line = np.asarray(line, dtype=np.int64)
+        return PointsQuery(line, EMDStrategyCV.points(line))
+
+    def score_line(
+        self,
+        prepared: PointsQuery,
+        line: npt.NDArray[np.int64],
+        cutoff: Optional[float] = None,
     ) -> float:
-        emd = wasserstein.EMD(norm=True)
-        l1 = np.zeros((len(line1), 2))
-        l2 = np.zeros((len(line2), 2))
-        w1 = np.ones(len(line1))
-        w2 = np.ones(len(line2))
-        for i in range(len(line1)):
-            l1[i][0] = i + 1
-            l1[i][1] = line1[i]
-        for i in range(len(line2)):
-            l2[i][0] = i + 1
-            l2[i][1] = line2[i]
+        if self.__emd is None:
+            self.__emd = wasserstein.EMD(norm=True)
         try:
-            return emd(w1, l1, w2, l2)
+            return self.__emd(
+                np.ones(len(prepared.line)),
+                prepared.points,
+                np.ones(len(line)),
+                EMDStrategyCV.points(line),
+            )
         except Exception:
             return float("inf")
@@ -8,37 +8,69 @@ class StandardizationStrategy(ABC):
     def standardize(self, top_line: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
         pass
 
+    def standardize_batch(
+        self, values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        """Standardize concatenated top lines, top line `i` is
+        `values[offsets[i] : offsets[i + 1]]`. Standardized lines keep their
+        lengths, so the result shares offsets with values."""
+        if len(offsets) < 2:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(
+            [
+                self.standardize(values[offsets[i] : offsets[i + 1]])
+                for i in range(len(offsets) - 1)
+            ]
+        ).astype(np.int64)
+
 
 class DefaultStrategy(StandardizationStrategy):
     def standardize(self, top_line: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
         return top_line
 
+    def standardize_batch(
+        self, values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        return values
+
+
+def line_starts(offsets: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """Offsets of the first values of the non-empty lines."""
+    starts = offsets[:-1]
+    return starts[starts < offsets[1:]]
+
 
 class RelativeIntervalStrategy(StandardizationStrategy):
     def standardize(self, top_line: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
-        res = np.zeros(len(top_line), dtype=np.int64)
-        for i in range(1, len(top_line)):
-            res[i] = top_line[i] - top_line[i - 1]
+        return self.standardize_batch(top_line, np.array([0, len(top_line)]))
+
+    def standardize_batch(
+        self, values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        res = np.zeros(len(values), dtype=np.int64)
+        res[1:] = np.diff(np.asarray(values, dtype=np.int64))
+        res[line_starts(offsets)] = 0
         return res
 
 
 class BaselineIntervalStrategy(StandardizationStrategy):
     def standardize(self, top_line: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
-        res = np.zeros(len(top_line), dtype=np.int64)
-        baseline = top_line[0]
-        for i in range(1, len(top_line)):
-            res[i] = top_line[i] - baseline
-        return res
+        return self.standardize_batch(top_line, np.array([0, len(top_line)]))
+
+    def standardize_batch(
+        self, values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        values = np.asarray(values, dtype=np.int64)
+        starts = line_starts(offsets)
+        counts = np.diff(np.append(starts, offsets[-1]))
+        return values - np.repeat(values[starts], counts)
 
 
 class ParsonsCodeStrategy(StandardizationStrategy):
     def standardize(self, top_line: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
-        res = np.zeros(len(top_line), dtype=np.int64)
-        for i in range(1, len(top_line)):
-            if top_line[i] > top_line[i - 1]:
-                res[i] = 1
-            elif top_line[i] < top_line[i - 1]:
-                res[i] = -1
-            else:
-                res[i] = 0
-        return res
+        return self.standardize_batch(top_line, np.array([0, len(top_line)]))
+
+    def standardize_batch(
+        self, values: npt.NDArray[np.int64], offsets: npt.NDArray[np.int64]
+    ) -> npt.NDArray[np.int64]:
+        return np.sign(RelativeIntervalStrategy().standardize_batch(values, offsets))
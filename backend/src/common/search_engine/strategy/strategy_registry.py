@@ -0,0 +1,51 @@
+from common.search_engine.strategy.similarity_strategy import (
+    DTWStrategy,
+    DTWWinStrategy,
+    EMDStrategyCV,
+    EMDStrategySP,
+    FDTWStrategyLib,
+    LCSStrategy,
+    LocalAlignmentStrategy,
+    LocalAlignmentStrategyLib,
+    SimilarityStrategy,
+)
+
+
+class StrategyRegistry:
+    """Single shared instance of every similarity strategy by its shortcut."""
+
+    def __init__(self) -> None:
+        self.__strategies: dict[str, SimilarityStrategy] = dict()
+
+    def register(self, strategy: SimilarityStrategy) -> None:
+        if strategy.shortcut in self.__strategies:
+            raise ValueError(f"Duplicate similarity strategy {strategy.shortcut}")
+        self.__strategies[strategy.shortcut] = strategy
+
+    def get(self, shortcut: str) -> SimilarityStrategy:
+        strategy = self.__strategies.get(shortcut)
+        if strategy is None:
+            raise ValueError("Unknown similarity strategy")
+        return strategy
+
+    def __contains__(self, shortcut: object) -> bool:
+        return shortcut in self.__strategies
+
+    def strategies(self) -> list[SimilarityStrategy]:
+        """Registered strategies in the order of registration."""
+        return list(self.__strategies.values())
+
+
+strategy_registry = StrategyRegistry()
+strategies: list[SimilarityStrategy] = [
+    LCSStrategy(),
+    DTWStrategy(),
+    DTWWinStrategy(),
+    FDTWStrategyLib(),
+    LocalAlignmentStrategy(),
+    LocalAlignmentStrategyLib(),
+    EMDStrategySP(),
+    EMDStrategyCV(),
+]
+for strategy in strategies:
+    strategy_registry.register(strategy)
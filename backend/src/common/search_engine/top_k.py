@@ -0,0 +1,122 @@
+import heapq
+from typing import Callable, Iterable, Optional, Union
+from common.entity.search_result import SearchResult
+from common.entity.song import SongMetadata, Track
+
+# Track or a function creating it, called only for the results, that are kept
+LazyTrack = Union[Track, Callable[[], Track]]
+
+
+class _Entry:
+    __slots__ = ("key", "seq", "highest_first", "metadata", "track", "stale")
+
+    def __init__(
+        self,
+        similarity: float,
+        seq: int,
+        highest_first: bool,
+        metadata: SongMetadata,
+        track: LazyTrack,
+    ) -> None:
+        self.key = (similarity, metadata.name, metadata.artist)
+        self.seq = seq
+        self.highest_first = highest_first
+        self.metadata = metadata
+        self.track = track
+        self.stale = False
+
+    def __lt__(self, other: "_Entry") -> bool:
+        """Whether self ranks worse than other. Earlier entries win ties."""
+        if self.key != other.key:
+            return (self.key < other.key) == self.highest_first
+        return self.seq > other.seq
+
+
+class TopK:
+    """Best n results, that have distinct artist and name.
+
+    Results are ordered by (similarity, name, artist), ties are won by the
+    result pushed first. The root of the heap is the worst of the kept results.
+    """
+
+    def __init__(self, n: int, highest_first: bool) -> None:
+        self.n = n
+        self.highest_first = highest_first
+        self.__seq = 0
+        self.__heap: list[_Entry] = []
+        self.__best: dict[tuple[str, str], _Entry] = dict()
+
+    def __len__(self) -> int:
+        return len(self.__best)
+
+    def __worst(self) -> _Entry:
+        # Replaced entries are removed from the heap lazily
+        while self.__heap[0].stale:
+            heapq.heappop(self.__heap)
+        return self.__heap[0]
+
+    @property
+    def threshold(self) -> Optional[float]:
+        """Similarity a result has to beat or match to be kept."""
+        if self.n <= 0 or len(self.__best) < self.n:
+            return None
+        return self.__worst().key[0]
+
+    def push(self, metadata: SongMetadata, similarity: float, track: LazyTrack) -> None:
+        if self.n <= 0:
+            return
+        entry = _Entry(similarity, self.__seq, self.highest_first, metadata, track)
+        self.__seq += 1
+        group = (metadata.artist, metadata.name)
+
+        current = self.__best.get(group)
+        if current is not None:
+            if not current < entry:
+                return
+            current.stale = True
+        elif len(self.__best) >= self.n:
+            worst = self.__worst()
+            if not worst < entry:
+                return
+            heapq.heappop(self.__heap)
+            del self.__best[(worst.metadata.artist, worst.metadata.name)]
+
+        self.__best[group] = entry
+        heapq.heappush(self.__heap, entry)
+        if len(self.__heap) > 2 * self.n:
+            self.__heap = [i for i in self.__heap if not i.stale]
+            heapq.heapify(self.__heap)
+
+    def results(self) -> list[SearchResult]:
+        """Kept results, best first."""
+        entries = sorted(self.__best.values(), reverse=True)
+        return [
+            SearchResult(
+                i.metadata,
+                i.key[0],
+                i.track if isinstance(i.track, Track) else i.track(),
+            )
+            for i in entries
+        ]
+
+    @staticmethod
+    def merge(
+        result_lists: Iterable[list[SearchResult]], n: int, highest_first: bool
+    ) -> list[SearchResult]:
+        """Merge result lists, ordered best first, into the best n results with
+        distinct artist and name. Ties are won by the earlier list."""
+        merged = heapq.merge(
+            *result_lists,
+            key=lambda a: (a.similarity, a.metadata.name, a.metadata.artist),
+            reverse=highest_first,
+        )
+        metadata: set[tuple[str, str]] = set()
+        unique_results: list[SearchResult] = []
+        for i in merged:
+            if len(unique_results) >= n:
+                break
+            meta_tuple = (i.metadata.artist, i.metadata.name)
+            if meta_tuple not in metadata:
+                metadata.add(meta_tuple)
+                unique_results.append(i)
+        return unique_results
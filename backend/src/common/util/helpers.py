@@ -1,4 +1,7 @@
+from typing import Sequence, Union
 from common.entity.song import SongMetadata
+import numpy as np
+import numpy.typing as npt
 import re
 
 
@@ -19,9 +22,30 @@ def get_filename_from_metadata(metadata: SongMetadata, extension="pkl"):
     return f"{metadata.artist} - {metadata.name}.{extension}"
 
 
-def split_list(target_list: list, n: int):
+def split_list(target_list: Union[Sequence, npt.NDArray], n: int):
     """split list into n similarly sized chunks"""
     k, m = divmod(len(target_list), n)
     return (
         target_list[i * k + min(i, m) : (i + 1) * k + min(i + 1, m)] for i in range(n)
     )
+
+
+def pad_lines(
+    lines: Sequence[npt.NDArray[np.int64]],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """stack lines into a zero padded 2-D array, return it with the line lengths"""
+    lengths = np.array([len(i) for i in lines], dtype=np.int64)
+    padded = np.zeros((len(lines), lengths.max(initial=0)), dtype=np.int64)
+    for row, line in zip(padded, lines):
+        row[: len(line)] = line
+    return padded, lengths
+
+
+def concat_lines(
+    lines: Sequence[npt.NDArray[np.int64]],
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """concatenate lines, return the values with the offsets of the lines"""
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(i) for i in lines])
+    values = np.concatenate([np.zeros(0, dtype=np.int64)] + list(lines))
+    return values.astype(np.int64, copy=False), offsets
@@ -1,25 +1,40 @@
 from common.entity.job import Job, JobStatus
 from common.entity.search_result import SearchResult
-from common.entity.song import Song, SongMetadata, Note, SpotifyMetadata, Track
+from common.entity.song import Song, SongMetadata, SpotifyMetadata, Track
 from dataclasses import asdict
 
 
 class MongoSerializer:
     @staticmethod
     def serialize_song(song: Song):
-        return asdict(song)
+        return {
+            "tracks": [MongoSerializer.__serialize_track(i) for i in song.tracks],
+            "metadata": asdict(song.metadata),
+        }
 
     @staticmethod
-    def __deserialize_note(note_dict: dict) -> Note:
-        return Note(note_dict["time"], note_dict["length"], note_dict["pitch"])
+    def __serialize_track(track: Track) -> dict:
+        return {
+            "notes": [asdict(i) for i in track.notes],
+            "grid_length": track.grid_length,
+        }
 
     @staticmethod
     def __deserialize_track(track_dict: dict) -> Track:
-        notes = [MongoSerializer.__deserialize_note(i) for i in track_dict["notes"]]
-        return Track(notes, track_dict["grid_length"])
+        notes = track_dict["notes"]
+        return Track.from_columns(
+            [i["time"] for i in notes],
+            [i["length"] for i in notes],
+            [i["pitch"] for i in notes],
+            track_dict["grid_length"],
+        )
 
     @staticmethod
-    def __deserialize_song_metadata(metadata_dict: dict) -> SongMetadata:
+    def serialize_song_metadata(metadata: SongMetadata):
+        return asdict(metadata)
+
+    @staticmethod
+    def deserialize_song_metadata(metadata_dict: dict) -> SongMetadata:
         spotify_metadata = None
         if metadata_dict["spotify"] is not None:
             spot_dict = metadata_dict["spotify"]
@@ -35,17 +50,21 @@ class MongoSerializer:
 
     @staticmethod
     def deserialize_song(song_dict: dict) -> Song:
-        metadata = MongoSerializer.__deserialize_song_metadata(song_dict["metadata"])
+        metadata = MongoSerializer.deserialize_song_metadata(song_dict["metadata"])
         tracks = [MongoSerializer.__deserialize_track(i) for i in song_dict["tracks"]]
         return Song(tracks, metadata)
 
     @staticmethod
     def serialize_search_result(search_result: SearchResult):
-        return asdict(search_result)
+        return {
+            "metadata": asdict(search_result.metadata),
+            "similarity": search_result.similarity,
+            "track": MongoSerializer.__serialize_track(search_result.track),
+        }
 
     @staticmethod
     def deserialize_search_result(search_dict: dict) -> SearchResult:
-        metadata = MongoSerializer.__deserialize_song_metadata(search_dict["metadata"])
+        metadata = MongoSerializer.deserialize_song_metadata(search_dict["metadata"])
         track = MongoSerializer.__deserialize_track(search_dict["track"])
         return SearchResult(metadata, search_dict["similarity"], track)
 
@@ -58,6 +77,8 @@ class MongoSerializer:
             "_id": job.id,
             "status": job.status.value,
             "results": results,
+            "progress": job.progress,
+            "partial": job.partial,
         }
 
     @staticmethod
@@ -66,4 +87,10 @@ class MongoSerializer:
         res = None
         if job["results"] is not None:
             res = [MongoSerializer.deserialize_search_result(i) for i in job["results"]]
-        return Job(str(job["_id"]), status, res)
+        return Job(
+            str(job["_id"]),
+            status,
+            res,
+            job.get("progress", 0),
+            job.get("partial", False),
+        )
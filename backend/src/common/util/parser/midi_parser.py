@@ -1,5 +1,5 @@
 from miditoolkit.midi import MidiFile
-from common.entity.song import Song, SongMetadata, Track, Note
+from common.entity.song import Song, SongMetadata, Track
 from common.util.parser.helpers import scale_ticks
 import common.config as config
 
@@ -20,15 +20,10 @@ class MidiParser:
 
         return Song(
             [
-                Track(
-                    list(
-                        map(
-                            lambda n: Note(
-                                st(n.start), st(n.end) - st(n.start), n.pitch
-                            ),
-                            inst.notes,
-                        )
-                    ),
+                Track.from_columns(
+                    [st(n.start) for n in inst.notes],
+                    [st(n.end) - st(n.start) for n in inst.notes],
+                    [n.pitch for n in inst.notes],
                     st(midi_file.max_tick),
                 )
                 for inst in melodic_inst
@@ -0,0 +1,30 @@
+import numpy as np
+import numpy.typing as npt
+
+
+def encode_postings(ids: npt.NDArray[np.int64]) -> bytes:
+    """Compress sorted ids as VByte encoded gaps.
+
+    Every gap is stored in 7-bit groups, least significant first. The highest
+    bit marks the last byte of a gap.
+    """
+    gaps = np.diff(np.asarray(ids, dtype=np.int64), prepend=0).astype(np.uint64)
+    shifts = np.arange(0, 64, 7, dtype=np.uint64)
+    groups = (gaps[:, None] >> shifts) & np.uint64(0x7F)
+    byte_counts = np.maximum(1, np.count_nonzero(gaps[:, None] >> shifts, axis=1))
+    used = np.arange(len(shifts)) < byte_counts[:, None]
+    groups[np.arange(len(gaps)), byte_counts - 1] |= np.uint64(0x80)
+    return groups[used].astype(np.uint8).tobytes()
+
+
+def decode_postings(data: bytes) -> npt.NDArray[np.int64]:
+    """Decompress ids encoded by encode_postings."""
+    encoded = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(encoded & 0x80)
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.zeros(len(ends), dtype=np.int64)
+    starts[1:] = ends[:-1] + 1
+    position = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    groups = (encoded & 0x7F).astype(np.int64) << (7 * position)
+    return np.cumsum(np.add.reduceat(groups, starts))
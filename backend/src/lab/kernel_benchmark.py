@@ -0,0 +1,59 @@
+import time
+import numpy as np
+from common.search_engine.strategy import kernels
+from common.search_engine.strategy.similarity_strategy import (
+    DTWStrategy,
+    DTWWinStrategy,
+    LCSStrategy,
+    LocalAlignmentStrategy,
+    SimilarityStrategy,
+)
+from common.util.helpers import pad_lines
+
+QUERY_LENGTH = 16
+SEGMENT_LENGTHS = [8, 16, 32, 64]
+SEGMENT_COUNT = 2000
+CSV_HEADER = "strategy,segment_length,numpy,jit,speedup"
+
+
+def time_scoring(
+    strategy: SimilarityStrategy,
+    query: np.ndarray,
+    segments: np.ndarray,
+    lengths: np.ndarray,
+) -> float:
+    start_time = time.time()
+    strategy.compare_batch(query, segments, lengths)
+    return time.time() - start_time
+
+
+def benchmark_kernels():
+    if kernels.lcs is None:
+        print("Numba is not installed or USE_JIT is off, kernels are not compiled")
+        return
+    compiled = (kernels.lcs, kernels.dtw, kernels.local_alignment)
+    rng = np.random.default_rng(123)
+    query = rng.integers(-12, 13, size=QUERY_LENGTH)
+    print(CSV_HEADER)
+    strategies: list[SimilarityStrategy] = [
+        LCSStrategy(),
+        DTWStrategy(),
+        DTWWinStrategy(),
+        LocalAlignmentStrategy(),
+    ]
+    for strategy in strategies:
+        for length in SEGMENT_LENGTHS:
+            segments, lengths = pad_lines(
+                [rng.integers(-12, 13, size=length) for _ in range(SEGMENT_COUNT)]
+            )
+            # The first call compiles the kernel or loads it from the disk cache
+            strategy.compare_batch(query, segments[:1], lengths[:1])
+            jit = time_scoring(strategy, query, segments, lengths)
+            kernels.lcs = kernels.dtw = kernels.local_alignment = None
+            numpy = time_scoring(strategy, query, segments, lengths)
+            kernels.lcs, kernels.dtw, kernels.local_alignment = compiled
+            print(f"{strategy.__class__.__name__},{length},{numpy},{jit},{numpy / jit}")
+
+
+if __name__ == "__main__":
+    benchmark_kernels()
@@ -22,9 +22,9 @@ from common.search_engine.strategy.similarity_strategy import (
     FDTWStrategyLib,
     LCSStrategy,
     LocalAlignmentStrategyLib,
-    SimilarityStrategy,
     EMDStrategyCV,
 )
+from common.search_engine.strategy.strategy_registry import strategy_registry
 from common.search_engine.strategy.standardization_strategy import (
     BaselineIntervalStrategy,
     DefaultStrategy,
@@ -35,6 +35,7 @@ from common.search_engine.strategy.standardization_strategy import (
 from common.util.filestorage.local_file_storage import LocalFileStorage
 from common.config import MEASURE_LENGTH
 from common.entity.example_query import ExampleQuery
+from common.entity.song import Note, Track
 
 CSV_HEADER = (
     "duration,search_engine_name,extraction,standardization,"
@@ -109,6 +110,7 @@ async def test_all_combinations(
                             similarity(),  # type: ignore
                         )
                         r = await evaluate_search_engine(query, se)
+                        se.close()
                         results.append(r)
     return results
 
@@ -169,6 +171,7 @@ async def benchmark_search_engine():
                     for r in res:
                         f.write(result_to_csv_row(r) + "\n")
 
+    # await benchmark_pool_latency(repo)
     # await benchmark_similarities()
     # await benchmark_standardization()
     # await benchmark_segmentation(repo)
@@ -176,6 +179,35 @@ async def benchmark_search_engine():
     # await benchmark_repository(mongo_repo)
 
 
+async def benchmark_pool_latency(repo: SongRepository, queries: int = 10):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    query = Track(
+        [
+            Note(i * config.DEFAULT_PPQ, config.DEFAULT_PPQ, 60 + i % 5)
+            for i in range(8)
+        ],
+        MEASURE_LENGTH * 2,
+    )
+    for similarity in [LCSStrategy, DTWStrategy]:
+        search_engine = SearchEngine(repo, prep, similarity())  # type: ignore
+        try:
+            # The first query starts the process pool
+            start_time = time.time()
+            await search_engine.find_similar_async(10, query)
+            cold = time.time() - start_time
+
+            start_time = time.time()
+            for _ in range(queries):
+                await search_engine.find_similar_async(10, query)
+            warm = (time.time() - start_time) / queries
+        finally:
+            search_engine.close()
+        print(f"{similarity.__name__},cold,{cold}")
+        print(f"{similarity.__name__},warm,{warm}")
+
+
 async def benchmark_similarities():
     arrays = []
     comparisons = 100000
@@ -184,12 +216,12 @@ async def benchmark_similarities():
     shuffle(arrays)
     a1 = arrays[: len(arrays) // 2]
     a2 = arrays[len(arrays) // 2 :]
-    for similarity in SimilarityStrategy.__subclasses__():
+    for similarity in strategy_registry.strategies():
         start_time = time.time()
         for i1, i2 in zip(a1, a2):
-            similarity().compare(i1, i2)  # type: ignore
+            similarity.compare(i1, i2)
         duration = time.time() - start_time
-        print(f"{similarity.__name__},{duration}")
+        print(f"{similarity.__class__.__name__},{duration}")
 
 
 async def benchmark_standardization():
@@ -1,6 +1,9 @@
 from common.repository.mongo_song_repository import MongoSongRepository
 from common.repository.file_song_repository import FileSongRepository
+from common.repository.packed_song_repository import PackedSongRepository
 from common.repository.song_repository import SongRepository
+from common.search_engine.search_engine_factory import SearchEngineFactory
+from common.search_engine.segment_index import SegmentIndex
 import common.config as config
 import asyncio
 import os
@@ -119,6 +122,50 @@ def download(ctx, robs, freemidi, parse, spotify):
         click.echo(ctx.get_help())
 
 
+@cli.command(help="Build segment index used by the search engine")
+@click.option(
+    "--output",
+    default=config.SEGMENT_INDEX_PATH,
+    show_default=True,
+    help="Path, where the segment index is saved.",
+)
+@click.pass_context
+def index(ctx, output):
+    logger = ctx.obj["logger"]
+    repository = ctx.obj["repository"]
+    prep = SearchEngineFactory.create_preprocessor()
+    loop = asyncio.get_event_loop()
+    logger.info("Building segment index")
+    segment_index = loop.run_until_complete(SegmentIndex.build(repository, prep))
+    segment_index.save(output)
+    for length, table in segment_index.tables.items():
+        logger.info(
+            f"Indexed {len(table)} segments of length {length}, "
+            f"{table.unique_count} unique"
+        )
+    logger.info(f"Segment index saved to {os.path.realpath(output)}")
+
+
+@cli.command(help="Convert the song repository into the packed corpus format")
+@click.option(
+    "--output",
+    default=config.PACKED_CORPUS_PATH,
+    show_default=True,
+    help="Directory, where the packed corpus is saved.",
+)
+@click.pass_context
+def pack(ctx, output):
+    logger = ctx.obj["logger"]
+    repository = ctx.obj["repository"]
+    loop = asyncio.get_event_loop()
+    logger.info("Packing song repository")
+    packed = loop.run_until_complete(PackedSongRepository.pack(repository, output))
+    logger.info(
+        f"Packed {len(packed.keys)} songs with {len(packed.notes)} notes "
+        f"to {os.path.realpath(output)}"
+    )
+
+
 @cli.command(help="Delete downloaded midi files")
 @click.pass_context
 def clean(ctx):
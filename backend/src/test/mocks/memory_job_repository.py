@@ -0,0 +1,60 @@
+from typing import Optional
+from common.entity.job import Job, JobStatus
+from common.entity.search_result import SearchResult
+from common.repository.job_repository import JobRepository
+
+
+class MemoryJobRepository(JobRepository):
+    def __init__(self) -> None:
+        self.jobs: dict[str, Job] = {}
+        self.cancelled: set[str] = set()
+        self.shard_results: dict[str, dict[int, tuple[list[SearchResult], bool]]] = {}
+
+    def get_job(self, id: str) -> Job:
+        return self.jobs[id]
+
+    def create_job(self) -> Job:
+        job = Job(str(len(self.jobs)), JobStatus.PENDING, None)
+        self.jobs[job.id] = job
+        return job
+
+    def update_job(
+        self,
+        id: str,
+        status: JobStatus,
+        results: Optional[list[SearchResult]],
+        partial: bool = False,
+    ) -> None:
+        progress = self.jobs[id].progress
+        if status == JobStatus.COMPLETED and not partial:
+            progress = 100
+        self.jobs[id] = Job(id, status, results, progress, partial)
+
+    def update_progress(
+        self, id: str, progress: int, results: list[SearchResult]
+    ) -> None:
+        if self.jobs[id].status != JobStatus.COMPLETED:
+            self.jobs[id] = Job(id, JobStatus.RUNNING, results, progress)
+
+    def cancel_job(self, id: str) -> None:
+        if self.jobs[id].status != JobStatus.COMPLETED:
+            self.cancelled.add(id)
+
+    def is_cancelled(self, id: str) -> bool:
+        return id in self.cancelled
+
+    def add_shard_results(
+        self,
+        id: str,
+        shard: int,
+        shard_count: int,
+        results: list[SearchResult],
+        partial: bool = False,
+    ) -> Optional[tuple[list[list[SearchResult]], bool]]:
+        shards = self.shard_results.setdefault(id, {})
+        shards[shard] = (results, partial)
+        if len(shards) < shard_count:
+            return None
+        return [shards[i][0] for i in sorted(shards)], any(
+            i[1] for i in shards.values()
+        )
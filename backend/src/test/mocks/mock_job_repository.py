@@ -15,12 +15,38 @@ class MockJobRepository(JobRepository):
                     SongMetadata("artist", "name", 99), 1.5, Track([Note(1, 2, 3)], 10)
                 )
             ],
+            100,
         )
 
     def create_job(self) -> Job:
         return Job("1", JobStatus.PENDING, None)
 
     def update_job(
-        self, id: str, status: JobStatus, results: Optional[list[SearchResult]]
+        self,
+        id: str,
+        status: JobStatus,
+        results: Optional[list[SearchResult]],
+        partial: bool = False,
     ) -> None:
         pass
+
+    def cancel_job(self, id: str) -> None:
+        pass
+
+    def is_cancelled(self, id: str) -> bool:
+        return False
+
+    def update_progress(
+        self, id: str, progress: int, results: list[SearchResult]
+    ) -> None:
+        pass
+
+    def add_shard_results(
+        self,
+        id: str,
+        shard: int,
+        shard_count: int,
+        results: list[SearchResult],
+        partial: bool = False,
+    ) -> Optional[tuple[list[list[SearchResult]], bool]]:
+        return None
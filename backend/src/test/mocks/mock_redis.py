@@ -0,0 +1,12 @@
+from typing import Optional
+
+
+class MockRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        self.data[key] = value.encode()
@@ -34,3 +34,6 @@ class MockRepository(SongRepository):
 
     def upsert(self):
         pass
+
+    def get_corpus_version(self) -> str:
+        return "0"
@@ -80,3 +80,20 @@ async def test_upsert():
     assert repo.load_song("artist3 - name3.pkl") == Song(
         [Track([], 10)], SongMetadata("newartist2", "newname2", 1)
     )
+
+
+@pytest.mark.asyncio
+async def test_corpus_version():
+    fs = MockFileStorage()
+    repo = FileSongRepository(fs)
+    test_song = Song([Track([Note(1, 1, 1)], 1)], SongMetadata("artist1", "name1", 1))
+
+    versions = [repo.get_corpus_version()]
+    await repo.insert(test_song)
+    versions.append(repo.get_corpus_version())
+    await repo.insert_many([test_song])
+    versions.append(repo.get_corpus_version())
+    await repo.upsert("artist1 - name1.pkl", test_song)
+    versions.append(repo.get_corpus_version())
+    assert len(set(versions)) == 4
+    assert repo.get_corpus_version() == versions[-1]
@@ -0,0 +1,87 @@
+from typing import Callable
+from common.search_engine.strategy import kernels
+from common.search_engine.strategy.similarity_strategy import (
+    DTWStrategy,
+    DTWWinStrategy,
+    LCSStrategy,
+    LocalAlignmentStrategy,
+    SimilarityStrategy,
+)
+from common.util.helpers import pad_lines
+from test.test_similarity_strategy import (
+    reference_dtw,
+    reference_lcs,
+    reference_local_alignment,
+)
+import numpy as np
+import pytest
+import common.config as config
+
+
+def reference_dtw_win(line1: np.ndarray, line2: np.ndarray) -> float:
+    return reference_dtw(line1, line2, DTWWinStrategy.window)
+
+
+def use_python_kernels(monkeypatch):
+    # The uncompiled kernels run the same code as the compiled ones
+    monkeypatch.setattr(kernels, "lcs", kernels.lcs_kernel)
+    monkeypatch.setattr(kernels, "dtw", kernels.dtw_kernel)
+    monkeypatch.setattr(kernels, "local_alignment", kernels.local_alignment_kernel)
+
+
+def check_kernel_parity():
+    rng = np.random.default_rng(123)
+    cases: list[
+        tuple[SimilarityStrategy, Callable[[np.ndarray, np.ndarray], float]]
+    ] = [
+        (LCSStrategy(), reference_lcs),
+        (DTWStrategy(), reference_dtw),
+        (DTWWinStrategy(), reference_dtw_win),
+        (LocalAlignmentStrategy(), reference_local_alignment),
+    ]
+    for strategy, reference in cases:
+        for _ in range(5):
+            query = rng.integers(-4, 5, size=rng.integers(0, 15))
+            lines = [rng.integers(-4, 5, size=rng.integers(0, 20)) for _ in range(20)]
+            segments, lengths = pad_lines(lines)
+            expected = [reference(query, i) for i in lines]
+            assert strategy.compare_batch(query, segments, lengths).tolist() == expected
+
+
+def test_kernel_parity(monkeypatch):
+    use_python_kernels(monkeypatch)
+    check_kernel_parity()
+
+
+def test_compiled_kernel_parity():
+    # CI installs requirements-jit.txt to run it
+    pytest.importorskip("numba")
+    if not config.USE_JIT:
+        pytest.skip("Compilation is disabled")
+    assert kernels.lcs is not None
+    assert kernels.dtw is not None
+    assert kernels.local_alignment is not None
+    check_kernel_parity()
+
+
+def test_kernel_cutoff(monkeypatch):
+    rng = np.random.default_rng(123)
+    strategies: list[SimilarityStrategy] = [
+        LCSStrategy(),
+        DTWStrategy(),
+        DTWWinStrategy(),
+        LocalAlignmentStrategy(),
+    ]
+    query = rng.integers(-3, 4, size=12)
+    lines = [rng.integers(-3, 4, size=rng.integers(1, 16)) for _ in range(30)]
+    segments, lengths = pad_lines(lines)
+    scores = [i.compare_batch(query, segments, lengths) for i in strategies]
+
+    use_python_kernels(monkeypatch)
+    for strategy, expected in zip(strategies, scores):
+        sign = 1 if strategy.highest_first else -1
+        for cutoff in np.unique(expected):
+            res = strategy.compare_batch(query, segments, lengths, cutoff)
+            better = sign * expected >= sign * cutoff
+            assert (res[better] == expected[better]).all()
+            assert (sign * res[~better] < sign * cutoff).all()
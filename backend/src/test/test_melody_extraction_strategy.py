@@ -0,0 +1,56 @@
+import numpy as np
+from common.entity.song import Note, Track
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+
+
+def reference_top_note(track: Track) -> list[int]:
+    last_pitch = -1
+    last_time = -1
+    res: list[int] = []
+    for i in track.notes:
+        if i.time == last_time and i.pitch > last_pitch:
+            res[-1] = i.pitch
+        elif i.time > last_time:
+            res.append(i.pitch)
+            last_time = i.time
+            last_pitch = i.pitch
+    return res
+
+
+def random_tracks(count: int) -> list[Track]:
+    rng = np.random.default_rng(0)
+    tracks = []
+    for _ in range(count):
+        n = int(rng.integers(0, 30))
+        tracks.append(
+            Track.from_columns(
+                rng.integers(0, 20, n),
+                rng.integers(1, 5, n),
+                rng.integers(0, 12, n),
+                20,
+            )
+        )
+    return tracks
+
+
+def test_extract():
+    strategy = TopNoteStrategy()
+    track = Track(
+        [Note(0, 1, 5), Note(0, 1, 7), Note(0, 1, 6), Note(2, 1, 1), Note(1, 1, 9)],
+        10,
+    )
+    # 6 is higher, than the first note of its onset, so it replaces 7 as well
+    np.testing.assert_array_equal(strategy.extract(track), [6, 1])
+    assert strategy.extract(Track([], 10)).tolist() == []
+
+    for i in random_tracks(200):
+        assert strategy.extract(i).tolist() == reference_top_note(i)
+
+
+def test_extract_batch():
+    strategy = TopNoteStrategy()
+    tracks = random_tracks(200)
+    assert strategy.extract_batch([]) == []
+    assert [i.tolist() for i in strategy.extract_batch(tracks)] == [
+        reference_top_note(i) for i in tracks
+    ]
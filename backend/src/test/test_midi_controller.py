@@ -1,7 +1,9 @@
 from quart import Quart
 import common.config as config
 import pytest
+from bson.errors import InvalidId
 from common.entity.song import Song, SongMetadata, Track, Note
+from test.mocks.mock_job_repository import MockJobRepository
 from test.mocks.mock_repository_factory import MockRepositoryFactory
 
 
@@ -34,14 +36,14 @@ class MockRes:
 
 @pytest.fixture()
 def mock_search(monkeypatch):
-    monkeypatch.setattr("dramatiq.actor", lambda **kw: MockAct)
+    # Patched where it is used, the worker tests need the real actor
+    monkeypatch.setattr("app.midi.controller.search", MockAct())
 
 
 @pytest.fixture()
 def mock_repository_factory(monkeypatch):
     monkeypatch.setattr(
-        "common.repository.mongo_repository_factory.MongoRepositoryFactory",
-        MockRepositoryFactory,
+        "app.midi.controller.MongoRepositoryFactory", MockRepositoryFactory
     )
 
 
@@ -88,7 +90,13 @@ async def test_midi_controller_success(app):
 
     res_json = await response.get_json()
 
-    expected_result = {"id": "1", "status": "pending", "results": None}
+    expected_result = {
+        "id": "1",
+        "status": "pending",
+        "results": None,
+        "progress": 0,
+        "partial": False,
+    }
 
     assert res_json == expected_result
     assert response.status_code == 200
@@ -112,6 +120,8 @@ async def test_midi_controller_get(app):
                 "preview_url": None,
             }
         ],
+        "progress": 100,
+        "partial": False,
     }
     assert await response.get_json() == expected_result
     assert response.status_code == 200
@@ -124,3 +134,67 @@ async def test_midi_controller_bad_request(app):
     data1 = await response1.get_data()
     assert response1.status_code == 400
     assert data1 == b"Invalid data format"
+
+
+@pytest.mark.asyncio
+async def test_midi_controller_bad_max_latency(app):
+    client = app.test_client()
+    response = await client.post(
+        "/api/midi",
+        json={
+            "notes": [{"pitch": 100, "length": "0:0:1", "time": "0:0:0"}],
+            "gridLength": 100,
+            "maxLatencyMs": "fast",
+        },
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_midi_controller_bool_max_latency(app):
+    client = app.test_client()
+    response = await client.post(
+        "/api/midi",
+        json={
+            "notes": [{"pitch": 100, "length": "0:0:1", "time": "0:0:0"}],
+            "gridLength": 100,
+            "maxLatencyMs": True,
+        },
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_midi_controller_cancel(app):
+    client = app.test_client()
+    response = await client.post("/api/midi/1/cancel")
+    res_json = await response.get_json()
+    assert response.status_code == 200
+    assert res_json["id"] == "1"
+    assert res_json["status"] == "completed"
+
+
+def raise_invalid_id(self, id: str):
+    raise InvalidId(f"{id} is not a valid ObjectId")
+
+
+def raise_unknown_id(self, id: str):
+    raise ValueError("Unknown id")
+
+
+@pytest.mark.asyncio
+async def test_midi_controller_cancel_bad_id(monkeypatch, app):
+    cancelled = []
+    monkeypatch.setattr(
+        MockJobRepository, "cancel_job", lambda s, i: cancelled.append(i)
+    )
+    client = app.test_client()
+
+    monkeypatch.setattr(MockJobRepository, "get_job", raise_invalid_id)
+    response = await client.post("/api/midi/abc/cancel")
+    assert response.status_code == 400
+
+    monkeypatch.setattr(MockJobRepository, "get_job", raise_unknown_id)
+    response = await client.post("/api/midi/0123456789abcdef01234567/cancel")
+    assert response.status_code == 404
+    assert cancelled == []
@@ -231,7 +231,7 @@ def test_serialize_job():
         1.5,
         Track([Note(1, 1, 1), Note(2, 2, 2)], 10),
     )
-    job = Job("123", JobStatus.COMPLETED, [res])
+    job = Job("123", JobStatus.COMPLETED, [res], 100)
     out = {
         "_id": "123",
         "status": "completed",
@@ -261,14 +261,18 @@ def test_serialize_job():
                 },
             }
         ],
+        "progress": 100,
+        "partial": False,
     }
     assert MongoSerializer.serialize_job(job) == out
 
-    job2 = Job("123", JobStatus.COMPLETED, None)
+    job2 = Job("123", JobStatus.COMPLETED, None, 40, True)
     out2 = {
         "_id": "123",
         "status": "completed",
         "results": None,
+        "progress": 40,
+        "partial": True,
     }
     assert MongoSerializer.serialize_job(job2) == out2
 
@@ -320,3 +324,13 @@ def test_deserialize_job():
 
     job2 = Job("123", JobStatus.PENDING, None)
     assert MongoSerializer.deserialize_job(inp2) == job2
+
+    inp3 = {
+        "_id": "123",
+        "status": "running",
+        "results": None,
+        "progress": 40,
+    }
+
+    job3 = Job("123", JobStatus.RUNNING, None, 40)
+    assert MongoSerializer.deserialize_job(inp3) == job3
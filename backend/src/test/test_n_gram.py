@@ -0,0 +1,71 @@
+from common.entity.song import Note, Track
+from common.search_engine.n_gram import (
+    classify_n_grams,
+    extract_melodic_contour,
+    extract_melody,
+    generate_n_gram_classes,
+    note_arrays,
+)
+import numpy as np
+
+
+def reference_n_gram_classes(track: Track) -> set[int]:
+    last_pitch = -1
+    last_time = -1
+    melody: list[Note] = []
+    for i in track.notes:
+        if i.time == last_time and i.pitch > last_pitch:
+            melody[-1] = i
+        elif i.time > last_time:
+            melody.append(i)
+            last_time = i.time
+            last_pitch = i.pitch
+
+    contour = [0] + [
+        int(np.sign(b.pitch - a.pitch)) for a, b in zip(melody, melody[1:])
+    ]
+    melodic_rep = {1: 0b01, 0: 0b10, -1: 0b11}
+    classes = set()
+    for j in range(len(contour) - 4):
+        segment_class = 0b10
+        for p in contour[j + 1 : j + 5]:
+            segment_class = segment_class << 2 | melodic_rep[p]
+        classes.add(segment_class)
+    return classes
+
+
+def test_extract_melody():
+    track = Track(
+        [
+            Note(0, 10, 5),
+            Note(0, 10, 7),
+            Note(0, 10, 6),
+            Note(10, 10, 1),
+            Note(5, 5, 9),
+        ],
+        20,
+    )
+    times, pitches = note_arrays(track)
+    np.testing.assert_array_equal(extract_melody(times, pitches), [2, 3])
+
+
+def test_classes():
+    contour = extract_melodic_contour(np.array([60, 62, 62, 60, 61, 61]))
+    np.testing.assert_array_equal(contour, [0, 1, 0, -1, 1, 0])
+    np.testing.assert_array_equal(
+        classify_n_grams(contour), [0b1001101101, 0b1010110110]
+    )
+    assert len(classify_n_grams(contour[:4])) == 0
+
+
+def test_reference_parity():
+    rng = np.random.default_rng(123)
+    for _ in range(300):
+        notes = [
+            Note(int(rng.integers(0, 12)) * 10, 10, int(rng.integers(0, 6)))
+            for _ in range(rng.integers(0, 30))
+        ]
+        if rng.random() < 0.5:
+            notes.sort(key=lambda a: a.time)
+        track = Track(notes, 120)
+        assert generate_n_gram_classes(track) == reference_n_gram_classes(track)
@@ -0,0 +1,95 @@
+import json
+import os
+import pickle
+import pytest
+from common.entity.song import Note, Song, SongMetadata, SpotifyMetadata, Track
+from common.repository.packed_song_repository import HEADER_FILE, PackedSongRepository
+from common.repository.song_repository import ReadOnlyRepositoryError
+from test.mocks.mock_file_storage import MockFileStorage
+from common.repository.file_song_repository import FileSongRepository
+
+
+@pytest.fixture
+def songs():
+    return [
+        Song(
+            [Track([Note(0, 10, 60), Note(10, 5, 62)], 96), Track([], 48)],
+            SongMetadata("artist1", "name1", 120, SpotifyMetadata("preview", "url")),
+        ),
+        Song(
+            [Track([Note(2**40, 1, 127)], 96)], SongMetadata("artist2", "name2", 90)
+        ),
+        Song([], SongMetadata("artist3", "name3", 100)),
+    ]
+
+
+async def create_source(songs: list[Song]) -> FileSongRepository:
+    repository = FileSongRepository(MockFileStorage())
+    await repository.insert_many(songs)
+    return repository
+
+
+@pytest.mark.asyncio
+async def test_pack(tmpdir, songs):
+    source = await create_source(songs)
+    path = str(tmpdir.join("packed"))
+    await PackedSongRepository.pack(source, path)
+    repository = PackedSongRepository(path)
+
+    keys = await source.list_keys()
+    assert await repository.list_keys() == keys
+    assert [repository.load_song(i) for i in keys] == songs
+    assert [await repository.load_song_async(i) for i in keys] == songs
+    assert [i async for i in repository.get_all_songs()] == songs
+    assert await repository.get_song_slugs() == [i.metadata.slug for i in songs]
+    with pytest.raises(ValueError):
+        repository.load_song("missing")
+
+    # Pickled copies map the files again
+    copy = pickle.loads(pickle.dumps(repository))
+    assert copy.load_song(keys[0]) == songs[0]
+
+
+@pytest.mark.asyncio
+async def test_corpus_version(tmpdir, songs):
+    source = await create_source(songs)
+    path = str(tmpdir.join("packed"))
+    assert not PackedSongRepository.exists(path)
+    first = await PackedSongRepository.pack(source, path)
+    assert PackedSongRepository.exists(path)
+    assert first.get_corpus_version() == source.get_corpus_version()
+    assert first.is_current(source)
+    await source.insert(Song([], SongMetadata("artist4", "name4", 60)))
+    assert not first.is_current(source)
+    second = await PackedSongRepository.pack(source, path)
+    assert second.is_current(source)
+    assert first.get_corpus_version() != second.get_corpus_version()
+
+
+@pytest.mark.asyncio
+async def test_read_only(tmpdir, songs):
+    source = await create_source(songs)
+    packed = await PackedSongRepository.pack(source, str(tmpdir.join("packed")))
+    song = Song([], SongMetadata("artist4", "name4", 60))
+    with pytest.raises(ReadOnlyRepositoryError):
+        await packed.insert(song)
+    with pytest.raises(ReadOnlyRepositoryError):
+        await packed.insert_many([song])
+    with pytest.raises(ReadOnlyRepositoryError):
+        await packed.upsert(packed.keys[0], song)
+    assert await packed.list_keys() == await source.list_keys()
+
+
+@pytest.mark.asyncio
+async def test_format_version(tmpdir, songs):
+    source = await create_source(songs)
+    path = str(tmpdir.join("packed"))
+    await PackedSongRepository.pack(source, path)
+    with open(os.path.join(path, HEADER_FILE)) as f:
+        header = json.load(f)
+    header["format"] += 1
+    with open(os.path.join(path, HEADER_FILE), "w") as f:
+        json.dump(header, f)
+
+    with pytest.raises(ValueError):
+        PackedSongRepository(path)
@@ -0,0 +1,54 @@
+from common.entity.search_result import SearchResult
+from common.entity.song import Note, SongMetadata, Track
+from common.search_engine.result_cache import ResultCache
+from test.mocks.mock_redis import MockRedis
+import numpy as np
+import pytest
+
+
+def make_results() -> list[SearchResult]:
+    return [
+        SearchResult(
+            SongMetadata(f"artist{i}", f"song{i}", 120, None),
+            float(i),
+            Track([Note(0, 10, i)], 100),
+        )
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def mock_redis(monkeypatch):
+    redis = MockRedis()
+    monkeypatch.setattr("redis.from_url", lambda url: redis)
+    return redis
+
+
+def test_make_key():
+    args = (np.array([0, 2, -1]), 100, "lcs", False, "1", 10)
+    key = ResultCache.make_key(*args)
+    assert key == ResultCache.make_key(np.array([0, 2, -1]), 100, "lcs", False, "1", 10)
+    for i, value in enumerate([np.array([0, 2]), 50, "dtw", True, "2", 5]):
+        changed = list(args)
+        changed[i] = value
+        assert ResultCache.make_key(*changed) != key  # type: ignore
+    assert ResultCache.make_key(*args, {1, 2}) != ResultCache.make_key(*args, {1})
+
+
+def test_local():
+    cache = ResultCache("", max_size=1)
+    results = make_results()
+    assert cache.get("a") is None
+    cache.set("a", results)
+    assert cache.get("a") == results
+    cache.set("b", results[:1])
+    assert cache.get("a") is None
+    assert cache.get("b") == results[:1]
+
+
+def test_redis(mock_redis):
+    results = make_results()
+    ResultCache("redis://cache").set("a", results)
+    assert "a" in mock_redis.data
+    assert ResultCache("redis://cache").get("a") == results
+    assert ResultCache("redis://cache").get("b") is None
@@ -6,9 +6,15 @@ from common.search_engine.strategy.standardization_strategy import (
     RelativeIntervalStrategy,
 )
 from common.search_engine.strategy.similarity_strategy import LCSStrategy
-from common.search_engine.strategy.segmentation_strategy import OneSegmentStrategy
+from common.search_engine.strategy.segmentation_strategy import (
+    FixedLengthStrategy,
+    OneSegmentStrategy,
+)
+import time
 import pytest
 from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.progress import ProgressReporter
+from common.search_engine.search_context import SearchContext
 from test.mocks.mock_repository import MockRepository
 
 
@@ -42,3 +48,97 @@ async def test_find_similar_async():
     assert_result(result2, 3)
     assert_result(result3, 5)
     assert_result(result4, 5)
+
+
+def test_process_songs_deduplicates_segments():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    search_engine = SearchEngine(repository, prep, LCSStrategy())
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    keys = ["0", "1", "2", "3", "4"]
+    results, stats = search_engine.process_songs(keys, query, prep.prep_track(query), 5)
+
+    # Every song has segments [0, 0, 0], [0, 0, 0] and [0, 0]
+    assert stats.candidates == 15
+    assert stats.unique_candidates == 2
+    assert [i.similarity for i in results] == [1.0] * 5
+
+
+def test_process_songs_prepares_query_once(monkeypatch):
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    strategy = LCSStrategy()
+    prepared = []
+    prepare = strategy.prepare
+
+    def counting_prepare(line):
+        prepared.append(line)
+        return prepare(line)
+
+    monkeypatch.setattr(strategy, "prepare", counting_prepare)
+    search_engine = SearchEngine(repository, prep, strategy)
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    query_prep = prep.prep_track(query)
+    for keys in [["0", "1"], ["2", "3", "4"]]:
+        search_engine.process_songs(keys, query, query_prep, 5)
+    assert len(prepared) == 1
+
+
+@pytest.mark.asyncio
+async def test_find_similar_async_reports_progress():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), OneSegmentStrategy()
+    )
+    search_engine = SearchEngine(repository, prep, LCSStrategy())
+    query = Track([Note(0, 10, 32), Note(30, 10, 32)], 150)
+    updates: list[tuple[int, list[SearchResult]]] = []
+    progress = ProgressReporter(lambda p, r: updates.append((p, r)), 0)
+    result = await search_engine.find_similar_async(
+        3, query, context=SearchContext(progress=progress)
+    )
+
+    assert_result(result, 3)
+    # The last chunk is not reported, final results are stored by the caller
+    assert [i[0] for i in updates] == [40, 60, 80]
+    for _, partial in updates:
+        assert 0 < len(partial) <= 3
+
+
+def test_progress_reporter_rate_limit():
+    updates: list[int] = []
+    progress = ProgressReporter(lambda p, r: updates.append(p), 3600)
+    progress.update(1, 4, lambda: [])
+    assert updates == []
+
+    progress = ProgressReporter(lambda p, r: updates.append(p), 0)
+    progress.update(1, 4, lambda: [])
+    progress.update(4, 4, lambda: [])
+    assert updates == [25]
+
+
+@pytest.mark.asyncio
+async def test_find_similar_async_stops():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), OneSegmentStrategy()
+    )
+    search_engine = SearchEngine(repository, prep, LCSStrategy())
+    query = Track([Note(0, 10, 32), Note(30, 10, 32)], 150)
+
+    context = SearchContext()
+    assert_result(await search_engine.find_similar_async(5, query, context=context), 5)
+    assert not context.partial
+
+    context = SearchContext(deadline=time.time() - 1)
+    assert_result(await search_engine.find_similar_async(5, query, context=context), 0)
+    assert context.partial
+
+    # Cancelled after the first of four chunks, that has two songs
+    context = SearchContext(is_cancelled=lambda: True)
+    assert_result(await search_engine.find_similar_async(5, query, context=context), 2)
+    assert context.partial
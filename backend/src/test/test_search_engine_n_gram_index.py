@@ -0,0 +1,42 @@
+from common.entity.song import Note, Track
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.search_engine_n_gram_index import SearchEngineNGramIndex
+from common.search_engine.search_engine_n_gram_prep import SearchEngineNGramPrep
+from common.search_engine.segment_index import SegmentIndex
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+from common.search_engine.strategy.segmentation_strategy import FixedLengthStrategy
+from common.search_engine.strategy.similarity_strategy import (
+    DTWStrategy,
+    LCSStrategy,
+    SimilarityStrategy,
+)
+from common.search_engine.strategy.standardization_strategy import (
+    RelativeIntervalStrategy,
+)
+import pytest
+from test.mocks.mock_repository import MockRepository
+
+
+@pytest.mark.asyncio
+async def test_same_results_as_n_gram_prep():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [60, 100])
+    queries = [
+        Track([Note(i * 10, 10, 0) for i in range(6)], 60),
+        Track([Note(i * 10, 10, i % 3) for i in range(10)], 100),
+        Track([Note(i * 10, 10, 0) for i in range(8)], 80),
+    ]
+    strategies: list[SimilarityStrategy] = [LCSStrategy(), DTWStrategy()]
+    for strategy in strategies:
+        indexed = SearchEngineNGramIndex(repository, prep, strategy, segment_index)
+        engine = SearchEngineNGramPrep(repository, prep, strategy)
+        for query in queries:
+            expected = await engine.find_similar_async(3, query)
+            assert await indexed.find_similar_async(3, query) == expected
+
+    # Only the first query shares n-grams with the corpus
+    assert len(await indexed.find_similar_async(3, queries[0])) == 3
+    assert len(await indexed.find_similar_async(3, queries[1])) == 0
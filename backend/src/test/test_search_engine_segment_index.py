@@ -0,0 +1,168 @@
+from common.entity.search_result import SearchResult
+from common.entity.song import Note, SongMetadata, Track
+from common.search_engine.search_engine import SearchEngine
+from common.search_engine.search_engine_segment_index import (
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.segment_index import SegmentIndex
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+from common.search_engine.strategy.standardization_strategy import (
+    RelativeIntervalStrategy,
+)
+from common.search_engine.strategy.similarity_strategy import (
+    DTWStrategy,
+    DTWWinStrategy,
+    LCSStrategy,
+    SimilarityStrategy,
+)
+from common.search_engine.strategy.segmentation_strategy import FixedLengthStrategy
+import common.config as config
+import time
+import pytest
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.progress import ProgressReporter
+from common.search_engine.search_context import SearchContext
+from test.mocks.mock_repository import MockRepository
+
+
+def assert_result(result: list[SearchResult], expected_len: int):
+    assert len(result) == expected_len
+    for i in result:
+        assert isinstance(i, SearchResult)
+        assert isinstance(i.similarity, float)
+        assert isinstance(i.metadata, SongMetadata)
+        assert isinstance(i.track, Track)
+
+
+@pytest.mark.asyncio
+async def test_find_similar_async():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    search_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    result1 = await search_engine.find_similar_async(2, query)
+    result2 = await search_engine.find_similar_async(6, query)
+
+    assert_result(result1, 2)
+    assert_result(result2, 5)
+
+
+@pytest.mark.asyncio
+async def test_stale_index_falls_back(monkeypatch):
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    search_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    assert segment_index.is_current(repository)
+
+    monkeypatch.setattr(repository, "get_corpus_version", lambda: "changed")
+    monkeypatch.setattr(
+        search_engine,
+        "score_rows",
+        lambda *args: pytest.fail("stale index must not be scanned"),
+    )
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    assert not segment_index.is_current(repository)
+    assert_result(await search_engine.find_similar_async(2, query), 2)
+
+
+@pytest.mark.asyncio
+async def test_same_results_as_search_engine():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    strategies: list[SimilarityStrategy] = [
+        LCSStrategy(),
+        DTWStrategy(),
+        DTWWinStrategy(),
+    ]
+    for strategy in strategies:
+        indexed = SearchEngineSegmentIndex(repository, prep, strategy, segment_index)
+        engine = SearchEngine(repository, prep, strategy)
+
+        # Not indexed grid length falls back to the repository scan
+        fallback_query = Track(query.notes, 50)
+        assert await indexed.find_similar_async(
+            5, fallback_query
+        ) == await engine.find_similar_async(5, fallback_query)
+        assert await indexed.find_similar_async(
+            5, query
+        ) == await engine.find_similar_async(5, query)
+
+
+@pytest.mark.asyncio
+async def test_pruning_keeps_results(monkeypatch):
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    strategy = DTWWinStrategy()
+    indexed = SearchEngineSegmentIndex(repository, prep, strategy, segment_index)
+    engine = SearchEngine(repository, prep, strategy)
+    expected = await engine.find_similar_async(3, query)
+
+    # Small batches let later batches be pruned by the results of earlier ones
+    monkeypatch.setattr(config, "BATCH_SIZE", 1)
+    assert await engine.find_similar_async(3, query) == expected
+    assert await indexed.find_similar_async(3, query) == expected
+
+
+@pytest.mark.asyncio
+async def test_find_similar_async_reports_progress():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    search_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    updates: list[tuple[int, list[SearchResult]]] = []
+    progress = ProgressReporter(lambda p, r: updates.append((p, r)), 0)
+    result = await search_engine.find_similar_async(
+        3, query, context=SearchContext(progress=progress)
+    )
+
+    assert_result(result, 3)
+    assert len(updates) == 3
+    assert [i[0] for i in updates] == sorted(i[0] for i in updates)
+    for p, partial in updates:
+        assert 0 < p < 100
+        assert 0 < len(partial) <= 3
+
+
+@pytest.mark.asyncio
+async def test_find_similar_async_stops():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    search_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+
+    context = SearchContext(deadline=time.time() - 1)
+    assert_result(await search_engine.find_similar_async(5, query, context=context), 0)
+    assert context.partial
+
+    context = SearchContext(is_cancelled=lambda: True)
+    result = await search_engine.find_similar_async(5, query, context=context)
+    assert 0 < len(result) < 5
+    assert context.partial
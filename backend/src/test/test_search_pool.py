@@ -0,0 +1,142 @@
+from typing import Any, Hashable
+import pytest
+import common.config as config
+from common.entity.song import Note, Track
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.search_engine import SearchEngine
+from common.search_engine.search_context import SearchContext
+from common.search_engine.search_engine_segment_index import (
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.search_pool import SearchPool
+from common.search_engine.segment_index import SegmentIndex
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+from common.search_engine.strategy.segmentation_strategy import (
+    FixedLengthStrategy,
+    OneSegmentStrategy,
+)
+from common.search_engine.strategy.similarity_strategy import DTWStrategy, LCSStrategy
+from common.search_engine.strategy.standardization_strategy import (
+    RelativeIntervalStrategy,
+)
+from test.mocks.mock_repository import MockRepository
+
+
+def test_get_process_count(monkeypatch):
+    monkeypatch.setattr(config, "PROCESS_COUNT", 8)
+    monkeypatch.setattr(config, "MIN_SONGS_PER_PROCESS", 10)
+    monkeypatch.setattr(
+        "common.search_engine.search_pool.available_cpu_count", lambda: 4
+    )
+    assert SearchPool.get_process_count(0) == 1
+    assert SearchPool.get_process_count(5) == 1
+    assert SearchPool.get_process_count(11) == 2
+    assert SearchPool.get_process_count(30) == 3
+    assert SearchPool.get_process_count(1000) == 4
+    monkeypatch.setattr(config, "PROCESS_COUNT", 2)
+    assert SearchPool.get_process_count(1000) == 2
+
+
+@pytest.mark.asyncio
+async def test_warm_pool(monkeypatch):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), OneSegmentStrategy()
+    )
+    query = Track([Note(0, 10, 32), Note(30, 10, 32)], 150)
+    serial_engine = SearchEngine(MockRepository(), prep, LCSStrategy())
+    expected = await serial_engine.find_similar_async(3, query)
+
+    monkeypatch.setattr(config, "PROCESS_COUNT", 2)
+    monkeypatch.setattr(config, "MIN_SONGS_PER_PROCESS", 1)
+    monkeypatch.setattr(
+        "common.search_engine.search_pool.available_cpu_count", lambda: 2
+    )
+    search_engine = SearchEngine(MockRepository(), prep, LCSStrategy())
+    try:
+        assert await search_engine.find_similar_async(3, query) == expected
+        # Second query reuses the running pool
+        assert await search_engine.find_similar_async(3, query) == expected
+    finally:
+        search_engine.close()
+    search_engine.close()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_pool_stops_scheduling(monkeypatch):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), OneSegmentStrategy()
+    )
+    query = Track([Note(0, 10, 32), Note(30, 10, 32)], 150)
+    monkeypatch.setattr(config, "PROCESS_COUNT", 2)
+    monkeypatch.setattr(config, "MIN_SONGS_PER_PROCESS", 1)
+    monkeypatch.setattr(
+        "common.search_engine.search_pool.available_cpu_count", lambda: 2
+    )
+    search_engine = SearchEngine(MockRepository(), prep, LCSStrategy())
+    context = SearchContext(is_cancelled=lambda: True)
+    try:
+        # Every song is a chunk, only the first chunk of each process runs
+        result = await search_engine.find_similar_async(5, query, context=context)
+    finally:
+        search_engine.close()
+    assert len(result) == 2
+    assert context.partial
+
+
+@pytest.mark.asyncio
+async def test_pool_with_shared_segment_index(monkeypatch):
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    query = Track([Note(0, 10, 32), Note(10, 10, 35), Note(20, 10, 32)], 30)
+    serial_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    expected = await serial_engine.find_similar_async(3, query)
+
+    monkeypatch.setattr(config, "PROCESS_COUNT", 2)
+    monkeypatch.setattr(config, "MIN_SONGS_PER_PROCESS", 1)
+    monkeypatch.setattr(
+        "common.search_engine.search_pool.available_cpu_count", lambda: 2
+    )
+    segment_index.share()
+    search_engine = SearchEngineSegmentIndex(
+        repository, prep, LCSStrategy(), segment_index
+    )
+    try:
+        assert await search_engine.find_similar_async(3, query) == expected
+    finally:
+        search_engine.close()
+        segment_index.unshare()
+
+
+@pytest.mark.asyncio
+async def test_shared_pool(monkeypatch):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), OneSegmentStrategy()
+    )
+    query = Track([Note(0, 10, 32), Note(30, 10, 32)], 150)
+    engines: dict[Hashable, Any] = {
+        "lcs": SearchEngine(MockRepository(), prep, LCSStrategy()),
+        "dtw": SearchEngine(MockRepository(), prep, DTWStrategy()),
+    }
+    expected = {k: await i.find_similar_async(3, query) for k, i in engines.items()}
+
+    monkeypatch.setattr(config, "PROCESS_COUNT", 2)
+    monkeypatch.setattr(config, "MIN_SONGS_PER_PROCESS", 1)
+    monkeypatch.setattr(
+        "common.search_engine.search_pool.available_cpu_count", lambda: 2
+    )
+    pool = SearchPool(engines, 2)
+    try:
+        for key, engine in engines.items():
+            engine.use_shared_pool(lambda: pool, key)
+        for key, engine in engines.items():
+            assert await engine.find_similar_async(3, query) == expected[key]
+            # Engines do not stop a pool they do not own
+            engine.close()
+        assert await engines["lcs"].find_similar_async(3, query) == expected["lcs"]
+    finally:
+        pool.close()
@@ -0,0 +1,110 @@
+import pickle
+import numpy as np
+import pytest
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.segment_index import SHARED_FIELDS, SegmentIndex
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+from common.search_engine.strategy.segmentation_strategy import FixedLengthStrategy
+from common.search_engine.strategy.standardization_strategy import (
+    RelativeIntervalStrategy,
+)
+from test.mocks.mock_repository import MockRepository
+
+
+@pytest.mark.asyncio
+async def test_build():
+    repository = MockRepository()
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(repository, prep, [30, 100])
+
+    assert segment_index.keys == ["0", "1", "2", "3", "4"]
+    assert [i.artist for i in segment_index.metadata] == [
+        f"artist{i}" for i in range(5)
+    ]
+
+    # Every mock track has 8 notes spaced 10 ticks apart and grid length 100
+    t30 = segment_index.tables[30]
+    assert len(t30) == 5 * 3
+    np.testing.assert_array_equal(t30.song_ids, np.repeat(np.arange(5), 3))
+    np.testing.assert_array_equal(t30.track_ids, np.zeros(15))
+    np.testing.assert_array_equal(t30.segment_ids, np.tile(np.arange(3), 5))
+    np.testing.assert_array_equal(t30.get(0), [0, 0, 0])
+    np.testing.assert_array_equal(t30.get(2), [0, 0])
+    np.testing.assert_array_equal(t30.unique_ids, np.tile([0, 0, 1], 5))
+    assert t30.unique_count == 2
+
+    t100 = segment_index.tables[100]
+    assert len(t100) == 5
+    np.testing.assert_array_equal(t100.get(4), np.zeros(8))
+
+    # Contour of 8 notes with the same pitch has 4 identical 5-grams
+    assert list(t100.n_gram_postings) == [0b1010101010]
+    np.testing.assert_array_equal(
+        t100.n_gram_candidates({0b1010101010, 0b1010101011}, 0), np.arange(5)
+    )
+    assert len(t100.n_gram_candidates({0b1010101010, 0b1010101011}, 1)) == 0
+    assert len(t30.n_gram_candidates({0b1010101010}, 0)) == 0
+
+    segments, lengths = t30.pad([2, 0])
+    np.testing.assert_array_equal(segments, [[0, 0, 0], [0, 0, 0]])
+    np.testing.assert_array_equal(lengths, [2, 3])
+
+    track = segment_index.segment_track(repository, prep, t30, 2)
+    assert (
+        track
+        == FixedLengthStrategy().segment(repository.load_song("0").tracks[0], 30)[2]
+    )
+
+
+@pytest.mark.asyncio
+async def test_save_load(tmpdir):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(MockRepository(), prep, [30])
+    path = str(tmpdir.join("index", "segment_index.pkl"))
+    segment_index.save(path)
+    loaded = SegmentIndex.load(path)
+
+    assert loaded.keys == segment_index.keys
+    assert loaded.metadata == segment_index.metadata
+    np.testing.assert_array_equal(
+        loaded.tables[30].values, segment_index.tables[30].values
+    )
+    np.testing.assert_array_equal(
+        loaded.tables[30].offsets, segment_index.tables[30].offsets
+    )
+
+
+@pytest.mark.asyncio
+async def test_share(tmpdir):
+    prep = Preprocessor(
+        TopNoteStrategy(), RelativeIntervalStrategy(), FixedLengthStrategy()
+    )
+    segment_index = await SegmentIndex.build(MockRepository(), prep, [30, 100])
+    expected = pickle.loads(pickle.dumps(segment_index))
+    segment_index.share()
+    try:
+        data = pickle.dumps(segment_index)
+        attached = pickle.loads(data)
+        # Only the layout of the shared memory is pickled
+        assert len(data) < len(pickle.dumps(expected))
+        for length, table in expected.tables.items():
+            for name in SHARED_FIELDS:
+                array = getattr(attached.tables[length], name)
+                np.testing.assert_array_equal(array, getattr(table, name))
+                assert not array.flags.writeable
+
+        path = str(tmpdir.join("segment_index.pkl"))
+        segment_index.save(path)
+        loaded = SegmentIndex.load(path)
+        assert loaded.shared is None
+        np.testing.assert_array_equal(
+            loaded.tables[30].values, expected.tables[30].values
+        )
+    finally:
+        segment_index.unshare()
+    # Unlinked indexes are pickled with their arrays again
+    assert pickle.loads(pickle.dumps(segment_index)).shared is None
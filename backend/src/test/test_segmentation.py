@@ -2,10 +2,28 @@ from common.search_engine.strategy.segmentation_strategy import (
     OneSegmentStrategy,
     FixedLengthStrategy,
 )
+from common.search_engine.preprocessor import Preprocessor
+from common.search_engine.strategy.melody_extraction_strategy import TopNoteStrategy
+from common.search_engine.strategy.standardization_strategy import (
+    RelativeIntervalStrategy,
+)
 from common.entity.song import Track, Note
+import numpy as np
 import unittest
 
 
+def reference_segment(track: Track, segment_len: int) -> list[Track]:
+    if track.grid_length <= segment_len:
+        return [track]
+    segments: dict[int, list[Note]] = dict()
+    for note in track.notes:
+        segment_num = note.time // segment_len
+        new_time = note.time - segment_num * segment_len
+        length = min(note.length, segment_len - new_time)
+        segments.setdefault(segment_num, []).append(Note(new_time, length, note.pitch))
+    return [Track(i, segment_len) for i in segments.values()]
+
+
 def test_fixed_length_segmentation():
     fls = FixedLengthStrategy()
     case = unittest.TestCase()
@@ -62,3 +80,27 @@ def test_one_segment():
     t1 = Track([Note(1, 2, 3), Note(3, 4, 5)], 10)
     r1 = [Track([Note(1, 2, 3), Note(3, 4, 5)], 10)]
     case.assertCountEqual(r1, oss.segment(t1, 10))
+
+
+def test_fixed_length_views():
+    fls = FixedLengthStrategy()
+    preprocessor = Preprocessor(TopNoteStrategy(), RelativeIntervalStrategy(), fls)
+    rng = np.random.default_rng(42)
+    for segment_len in [4, 16, 200]:
+        for _ in range(20):
+            count = int(rng.integers(0, 40))
+            notes = [
+                Note(
+                    int(rng.integers(0, 100)),
+                    int(rng.integers(1, 10)),
+                    int(rng.integers(40, 80)),
+                )
+                for _ in range(count)
+            ]
+            track = Track(notes, 100)
+            expected = reference_segment(track, segment_len)
+            views = fls.segment_views(track, segment_len)
+            assert views.tracks() == expected
+            assert fls.segment(track, segment_len) == expected
+            for prep, segment in zip(preprocessor.prep_segments(views), expected):
+                assert np.array_equal(prep, preprocessor.prep_track(segment))
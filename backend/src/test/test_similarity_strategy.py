@@ -1,9 +1,59 @@
+from typing import Optional
 from common.search_engine.strategy.similarity_strategy import (
+    PreparedQuery,
+    SimilarityStrategy,
     LCSStrategy,
     DTWStrategy,
+    DTWWinStrategy,
     LocalAlignmentStrategy,
+    LocalAlignmentStrategyLib,
+    EMDStrategySP,
+    EMDStrategyCV,
+    FDTWStrategyLib,
 )
+from common.entity.search_stats import SearchStats
+from common.util.helpers import pad_lines
 import numpy as np
+import pickle
+import pytest
+from scipy.stats import wasserstein_distance
+
+
+def reference_lcs(line1: np.ndarray, line2: np.ndarray) -> float:
+    dp_table = np.zeros((len(line1) + 1, len(line2) + 1))
+    for i in range(1, len(line1) + 1):
+        for j in range(1, len(line2) + 1):
+            if line1[i - 1] == line2[j - 1]:
+                dp_table[i][j] = 1 + dp_table[i - 1][j - 1]
+            else:
+                dp_table[i][j] = max(dp_table[i][j - 1], dp_table[i - 1][j])
+    return dp_table[-1][-1]
+
+
+def reference_dtw(line1: np.ndarray, line2: np.ndarray, window=None) -> float:
+    n, m = len(line1), len(line2)
+    w = max(n, m) if window is None else max(window, abs(n - m))
+    dtw = np.full((n + 1, m + 1), np.inf)
+    dtw[0][0] = 0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - w), min(m, i + w) + 1):
+            cost = abs(line1[i - 1] - line2[j - 1])
+            dtw[i][j] = cost + min(dtw[i - 1][j], dtw[i][j - 1], dtw[i - 1][j - 1])
+    return dtw[-1][-1]
+
+
+def reference_local_alignment(line1: np.ndarray, line2: np.ndarray) -> float:
+    score_mat = np.zeros((len(line1) + 1, len(line2) + 1))
+    for i in range(1, len(line1) + 1):
+        for j in range(1, len(line2) + 1):
+            diagonal = 1 if line1[i - 1] == line2[j - 1] else -1
+            score_mat[i][j] = max(
+                0,
+                score_mat[i][j - 1] - 2,
+                score_mat[i - 1][j] - 2,
+                score_mat[i - 1][j - 1] + diagonal,
+            )
+    return float(np.max(score_mat))
 
 
 def test_lcs():
@@ -18,6 +68,17 @@ def test_lcs():
     assert lcs.compare(np.array([5, 2, 2, 2, 2, 2, 3]), np.array([5, 8, 3])) == 2
 
 
+def test_lcs_reference_parity():
+    lcs = LCSStrategy()
+    rng = np.random.default_rng(123)
+    query = rng.integers(-5, 6, size=70)
+    for _ in range(200):
+        segment = rng.integers(-5, 6, size=rng.integers(0, 100))
+        assert lcs.compare(query, segment) == reference_lcs(query, segment)
+        line = rng.integers(-5, 6, size=rng.integers(0, 100))
+        assert lcs.compare(line, segment) == reference_lcs(line, segment)
+
+
 def test_dtw():
     dtw = DTWStrategy()
     assert dtw.compare(np.array([1, 2, 3]), np.array([1, 2, 3])) == 0
@@ -30,6 +91,65 @@ def test_dtw():
     assert dtw.compare(np.array([5, 2, 2, 2, 2, 2, 3]), np.array([5, 8, 3])) == 8
 
 
+def test_dtw_batch_parity():
+    rng = np.random.default_rng(123)
+    cases: list[tuple[SimilarityStrategy, Optional[int]]] = [
+        (DTWStrategy(), None),
+        (DTWWinStrategy(), 3),
+    ]
+    for strategy, window in cases:
+        for _ in range(20):
+            query = rng.integers(-12, 13, size=rng.integers(0, 20))
+            lines = [rng.integers(-12, 13, size=rng.integers(0, 25)) for _ in range(30)]
+            segments, lengths = pad_lines(lines)
+            expected = [reference_dtw(query, i, window) for i in lines]
+            assert strategy.compare_batch(query, segments, lengths).tolist() == expected
+            assert [strategy.compare(query, i) for i in lines] == expected
+
+
+def test_dtwwin_prune_batch():
+    dtw = DTWWinStrategy()
+    rng = np.random.default_rng(123)
+    for _ in range(20):
+        query = rng.integers(-12, 13, size=rng.integers(1, 20))
+        lines = [rng.integers(-12, 13, size=rng.integers(0, 25)) for _ in range(50)]
+        segments, lengths = pad_lines(lines)
+        scores = dtw.compare_batch(query, segments, lengths)
+        threshold = float(np.median(scores))
+        stats = SearchStats()
+        keep = dtw.prune_batch(query, segments, lengths, threshold, stats)
+
+        assert keep[scores <= threshold].all()
+        assert stats.pruned == np.count_nonzero(~keep)
+        assert dtw.prune_batch(query, segments, lengths, None, stats).all()
+
+
+def test_cutoff():
+    rng = np.random.default_rng(123)
+    strategies: list[SimilarityStrategy] = [
+        LCSStrategy(),
+        DTWStrategy(),
+        DTWWinStrategy(),
+        LocalAlignmentStrategy(),
+        LocalAlignmentStrategyLib(),
+    ]
+    for strategy in strategies:
+        sign = 1 if strategy.highest_first else -1
+        query = rng.integers(-3, 4, size=12)
+        lines = [rng.integers(-3, 4, size=rng.integers(1, 16)) for _ in range(30)]
+        segments, lengths = pad_lines(lines)
+        scores = strategy.compare_batch(query, segments, lengths)
+        for cutoff in np.unique(scores):
+            if np.isinf(cutoff):
+                continue
+            batch = strategy.compare_batch(query, segments, lengths, cutoff)
+            single = [strategy.compare(query, i, cutoff) for i in lines]
+            for res in [batch, np.array(single)]:
+                better = sign * scores >= sign * cutoff
+                assert (res[better] == scores[better]).all()
+                assert (sign * res[~better] < sign * cutoff).all()
+
+
 def test_las():
     las = LocalAlignmentStrategy()
     assert las.compare(np.array([1, 2, 3]), np.array([1, 2, 3])) == 3
@@ -40,3 +160,75 @@ def test_las():
     assert las.compare(np.array([1, 2, 3]), np.array([1, 2])) == 2
     assert las.compare(np.array([5, 2, 3]), np.array([1, 2, 3])) == 2
     assert las.compare(np.array([5, 2, 2, 2, 2, 2, 3]), np.array([5, 8, 3])) == 1
+
+
+def test_local_alignment_batch_parity():
+    las = LocalAlignmentStrategy()
+    lib = LocalAlignmentStrategyLib()
+    rng = np.random.default_rng(123)
+    for _ in range(20):
+        query = rng.integers(-4, 5, size=rng.integers(0, 20))
+        lines = [rng.integers(-4, 5, size=rng.integers(0, 25)) for _ in range(30)]
+        segments, lengths = pad_lines(lines)
+        expected = [reference_local_alignment(query, i) for i in lines]
+        assert las.compare_batch(query, segments, lengths).tolist() == expected
+        assert [las.compare(query, i) for i in lines] == expected
+        assert [
+            lib.compare(query, i) if len(query) and len(i) else 0.0 for i in lines
+        ] == expected
+
+
+def test_emd_batch_parity():
+    emd = EMDStrategySP()
+    rng = np.random.default_rng(123)
+    for _ in range(20):
+        query = rng.integers(-12, 13, size=rng.integers(1, 20))
+        lines = [rng.integers(-12, 13, size=rng.integers(1, 25)) for _ in range(30)]
+        segments, lengths = pad_lines(lines)
+        expected = [wasserstein_distance(query, i) for i in lines]
+        np.testing.assert_allclose(
+            emd.compare_batch(query, segments, lengths), expected
+        )
+    assert emd.compare(np.array([1, 2]), np.zeros(0, dtype=np.int64)) == np.inf
+
+
+def test_emd_shortcuts():
+    assert EMDStrategySP().shortcut != EMDStrategyCV().shortcut
+    cv = pickle.loads(pickle.dumps(EMDStrategyCV()))
+    assert cv.compare(np.array([1, 2, 3]), np.array([1, 2, 3])) == 0
+
+
+def test_prepare_score():
+    rng = np.random.default_rng(123)
+    strategies: list[SimilarityStrategy] = [
+        LCSStrategy(),
+        DTWStrategy(),
+        DTWWinStrategy(),
+        FDTWStrategyLib(),
+        LocalAlignmentStrategy(),
+        LocalAlignmentStrategyLib(),
+        EMDStrategySP(),
+        EMDStrategyCV(),
+    ]
+    query = rng.integers(-3, 4, size=12)
+    lines = [rng.integers(-3, 4, size=rng.integers(1, 16)) for _ in range(20)]
+    segments, lengths = pad_lines(lines)
+    for strategy in strategies:
+        prepared = strategy.prepare(query)
+        scores = strategy.score(prepared, segments, lengths)
+        assert scores.tolist() == [strategy.compare(query, i) for i in lines]
+        assert strategy.score(prepared, segments[:1], lengths[:1])[0] == scores[0]
+        assert strategy.score_line(prepared, lines[0]) == scores[0]
+
+
+def test_score_contract():
+    with pytest.raises(TypeError):
+
+        class NoScore(SimilarityStrategy[PreparedQuery]):
+            @property
+            def name(self) -> str:
+                return "No score"
+
+            @property
+            def shortcut(self) -> str:
+                return "none"
@@ -1,5 +1,7 @@
+from typing import Callable
 import numpy as np
 from common.search_engine.strategy.standardization_strategy import (
+    StandardizationStrategy,
     DefaultStrategy,
     RelativeIntervalStrategy,
     BaselineIntervalStrategy,
@@ -7,6 +9,34 @@ from common.search_engine.strategy.standardization_strategy import (
 )
 
 
+def reference_relative(top_line: np.ndarray) -> np.ndarray:
+    res = np.zeros(len(top_line), dtype=np.int64)
+    for i in range(1, len(top_line)):
+        res[i] = top_line[i] - top_line[i - 1]
+    return res
+
+
+def reference_baseline(top_line: np.ndarray) -> np.ndarray:
+    res = np.zeros(len(top_line), dtype=np.int64)
+    for i in range(1, len(top_line)):
+        res[i] = top_line[i] - top_line[0]
+    return res
+
+
+def reference_parsons(top_line: np.ndarray) -> np.ndarray:
+    res = np.zeros(len(top_line), dtype=np.int64)
+    for i in range(1, len(top_line)):
+        if top_line[i] > top_line[i - 1]:
+            res[i] = 1
+        elif top_line[i] < top_line[i - 1]:
+            res[i] = -1
+    return res
+
+
+def reference_default(top_line: np.ndarray) -> np.ndarray:
+    return top_line
+
+
 def test_default_strategy():
     ds = DefaultStrategy()
     np.testing.assert_array_equal(ds.standardize(np.array([1, 2, 3])), [1, 2, 3])
@@ -31,3 +61,24 @@ def test_parsons_code_strategy():
     np.testing.assert_array_equal(
         pc.standardize(np.array([10, 4, 9, 10, 10, 1])), [0, -1, 1, 1, 0, -1]
     )
+
+
+def test_standardize_batch():
+    rng = np.random.default_rng(7)
+    lines = [rng.integers(30, 90, int(rng.integers(0, 8))) for _ in range(50)]
+    offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(i) for i in lines])
+    values = np.concatenate(lines)
+    cases: list[tuple[StandardizationStrategy, Callable[[np.ndarray], np.ndarray]]] = [
+        (DefaultStrategy(), reference_default),
+        (RelativeIntervalStrategy(), reference_relative),
+        (BaselineIntervalStrategy(), reference_baseline),
+        (ParsonsCodeStrategy(), reference_parsons),
+    ]
+    for strategy, reference in cases:
+        expected = [reference(i) for i in lines]
+        for line, line_expected in zip(lines, expected):
+            np.testing.assert_array_equal(strategy.standardize(line), line_expected)
+        np.testing.assert_array_equal(
+            strategy.standardize_batch(values, offsets), np.concatenate(expected)
+        )
@@ -0,0 +1,66 @@
+import pytest
+from common.search_engine.search_engine import SearchEngine
+from common.search_engine.search_engine_factory import SearchEngineFactory
+from common.search_engine.search_engine_segment_index import (
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.segment_index import SegmentIndex
+from common.search_engine.strategy.similarity_strategy import (
+    LCSStrategy,
+    SimilarityStrategy,
+    StrategyCapabilities,
+)
+from common.search_engine.strategy.strategy_registry import (
+    StrategyRegistry,
+    strategy_registry,
+)
+from test.mocks.mock_repository import MockRepository
+
+
+class SerialStrategy(LCSStrategy):
+    capabilities = StrategyCapabilities(index_backed=False)
+
+    @property
+    def shortcut(self) -> str:
+        return "serial"
+
+
+def test_registry():
+    strategies = strategy_registry.strategies()
+    assert len({i.shortcut for i in strategies}) == len(strategies)
+    for i in strategies:
+        assert i.shortcut in strategy_registry
+        assert strategy_registry.get(i.shortcut) is i
+    assert isinstance(strategy_registry.get("lcs"), LCSStrategy)
+    assert "unknown" not in strategy_registry
+    with pytest.raises(ValueError):
+        strategy_registry.get("unknown")
+
+    registry = StrategyRegistry()
+    registry.register(LCSStrategy())
+    with pytest.raises(ValueError):
+        registry.register(LCSStrategy())
+
+
+@pytest.mark.asyncio
+async def test_factory_uses_capabilities(monkeypatch):
+    repository = MockRepository()
+    prep = SearchEngineFactory.create_preprocessor()
+    segment_index = await SegmentIndex.build(repository, prep, [30])
+    registry = StrategyRegistry()
+    registry.register(LCSStrategy())
+    registry.register(SerialStrategy())
+    monkeypatch.setattr(
+        "common.search_engine.search_engine_factory.strategy_registry", registry
+    )
+
+    engine = SearchEngineFactory.create_search_engine(
+        repository, "lcs", False, segment_index
+    )
+    assert isinstance(engine, SearchEngineSegmentIndex)
+    assert engine.similarity_strategy is registry.get("lcs")
+    engine = SearchEngineFactory.create_search_engine(
+        repository, "serial", False, segment_index
+    )
+    assert type(engine) is SearchEngine
+    assert isinstance(engine.similarity_strategy, SimilarityStrategy)
@@ -0,0 +1,76 @@
+import functools
+from common.entity.search_result import SearchResult
+from common.entity.song import SongMetadata, Track
+from common.search_engine.top_k import TopK
+import numpy as np
+
+
+def reference_top_k(
+    results: list[SearchResult], n: int, highest_first: bool
+) -> list[SearchResult]:
+    sorted_results = sorted(
+        results,
+        reverse=highest_first,
+        key=lambda a: (a.similarity, a.metadata.name, a.metadata.artist),
+    )
+    metadata: set[tuple[str, str]] = set()
+    unique_results: list[SearchResult] = []
+    for i in sorted_results:
+        meta_tuple = (i.metadata.artist, i.metadata.name)
+        if meta_tuple not in metadata:
+            metadata.add(meta_tuple)
+            unique_results.append(i)
+    return unique_results[0:n]
+
+
+def random_results(rng: np.random.Generator, count: int) -> list[SearchResult]:
+    return [
+        SearchResult(
+            SongMetadata(f"artist{rng.integers(3)}", f"song{rng.integers(5)}", 120),
+            float(rng.integers(10)),
+            Track([], int(rng.integers(1000))),
+        )
+        for _ in range(count)
+    ]
+
+
+def test_push():
+    rng = np.random.default_rng(123)
+    for highest_first in [True, False]:
+        for n in [0, 1, 3, 20]:
+            results = random_results(rng, 100)
+            top = TopK(n, highest_first)
+            for i in results:
+                top.push(i.metadata, i.similarity, i.track)
+            expected = reference_top_k(results, n, highest_first)
+            assert top.results() == expected
+            full = 0 < n <= len(expected)
+            assert top.threshold == (expected[-1].similarity if full else None)
+
+
+def test_merge():
+    rng = np.random.default_rng(123)
+    for highest_first in [True, False]:
+        chunks = [random_results(rng, 30) for _ in range(4)]
+        lists = [reference_top_k(i, 5, highest_first) for i in chunks]
+        assert TopK.merge(lists, 5, highest_first) == reference_top_k(
+            [j for i in chunks for j in i], 5, highest_first
+        )
+
+
+def test_push_lazy_track():
+    created: list[int] = []
+
+    def make_track(i: int) -> Track:
+        created.append(i)
+        return Track([], i)
+
+    top = TopK(2, True)
+    for i in range(5):
+        top.push(
+            SongMetadata("artist", f"song{i}", 120),
+            float(i),
+            functools.partial(make_track, i),
+        )
+    assert [i.track for i in top.results()] == [Track([], 4), Track([], 3)]
+    assert created == [4, 3]
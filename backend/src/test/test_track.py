@@ -0,0 +1,45 @@
+import pickle
+import numpy as np
+from common.entity.song import NOTE_DTYPE, Note, Track
+
+
+def test_columns():
+    track = Track([Note(0, 10, 60), Note(10, 5, 62)], 96)
+    assert track.array.dtype == NOTE_DTYPE
+    np.testing.assert_array_equal(track.times, [0, 10])
+    np.testing.assert_array_equal(track.lengths, [10, 5])
+    np.testing.assert_array_equal(track.pitches, [60, 62])
+    assert track.notes == [Note(0, 10, 60), Note(10, 5, 62)]
+    assert len(track) == 2
+    assert Track.from_columns([0, 10], [10, 5], [60, 62], 96) == track
+    assert Track(track.array, 96) == track
+    assert Track(track.array, 48) != track
+
+
+def test_large_times():
+    track = Track([Note(2**40, 2**33, 60)], 96)
+    assert track.notes == [Note(2**40, 2**33, 60)]
+    assert Track.from_columns([2**40], [2**33], [60], 96) == track
+
+
+def test_views():
+    track = Track([Note(0, 10, 60), Note(10, 5, 62)], 96)
+    track.pitches[0] = 70
+    assert track.notes[0] == Note(0, 10, 70)
+
+    # Notes are copies, the track changes only when they are assigned
+    notes = track.notes
+    notes.append(Note(20, 5, 64))
+    assert len(track) == 2
+    track.notes = notes
+    assert len(track) == 3
+
+
+def test_pickle():
+    track = Track([Note(0, 10, 60), Note(10, 5, 62)], 96)
+    assert pickle.loads(pickle.dumps(track)) == track
+
+    # Tracks pickled as dataclasses keep loading
+    old = Track.__new__(Track)
+    old.__setstate__({"notes": [Note(0, 10, 60), Note(10, 5, 62)], "grid_length": 96})
+    assert old == track
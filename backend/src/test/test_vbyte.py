@@ -0,0 +1,14 @@
+from common.util.vbyte import decode_postings, encode_postings
+import numpy as np
+
+
+def test_encode_decode():
+    rng = np.random.default_rng(123)
+    for _ in range(50):
+        ids = np.unique(rng.integers(0, 2 ** rng.integers(1, 40), size=100))
+        np.testing.assert_array_equal(decode_postings(encode_postings(ids)), ids)
+    assert len(decode_postings(encode_postings(np.zeros(0, dtype=np.int64)))) == 0
+
+
+def test_encoding():
+    assert encode_postings(np.array([1, 3, 131])) == bytes([0x81, 0x82, 0x00, 0x81])
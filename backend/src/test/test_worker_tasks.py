@@ -0,0 +1,188 @@
+import time
+import dramatiq
+from dramatiq import Worker
+from dramatiq.brokers.stub import StubBroker
+import pytest
+from common.entity.job import JobStatus
+from common.util.parser.json_parser import JsonParser
+from common.repository.job_repository import JobRepository
+from common.repository.packed_song_repository import PackedSongRepository
+from common.search_engine.search_engine import SearchEngine
+from common.search_engine.search_engine_factory import SearchEngineFactory
+from common.search_engine.search_engine_segment_index import (
+    SearchEngineSegmentIndex,
+)
+from common.search_engine.segment_index import SegmentIndex
+from common.repository.song_repository import SongRepository
+import common.config as config
+from test.mocks.memory_job_repository import MemoryJobRepository
+from test.mocks.mock_repository import MockRepository
+
+QUERY = {
+    "notes": [
+        {"pitch": 20, "length": "0:1:0", "time": "0:0:0"},
+        {"pitch": 22, "length": "0:1:0", "time": "0:1:0"},
+        {"pitch": 20, "length": "0:1:0", "time": "0:2:0"},
+    ],
+    "gridLength": 64,
+    "similarityStrategy": "lcs",
+}
+
+
+@pytest.fixture
+def job_repository():
+    return MemoryJobRepository()
+
+
+@pytest.fixture
+def tasks(monkeypatch, tmp_path, job_repository):
+    import worker.tasks as tasks
+
+    # Actors are bound to the broker, that was global when the module was imported
+    broker = StubBroker()
+    monkeypatch.setattr(dramatiq.broker, "global_broker", broker)
+    for actor in [tasks.search, tasks.search_shard]:
+        monkeypatch.setattr(actor, "broker", broker)
+        broker.declare_actor(actor)
+
+    class RepositoryFactory:
+        def create_job_repository(self) -> JobRepository:
+            return job_repository
+
+        def create_song_repository(self) -> SongRepository:
+            return MockRepository()
+
+    monkeypatch.setattr(tasks, "MongoRepositoryFactory", RepositoryFactory)
+    monkeypatch.setattr(config, "PACKED_CORPUS_PATH", str(tmp_path / "packed"))
+    monkeypatch.setattr(config, "SEGMENT_INDEX_PATH", str(tmp_path / "index.pkl"))
+    monkeypatch.setattr(tasks, "segment_index", None)
+    monkeypatch.setattr(tasks, "search_engines", dict())
+    monkeypatch.setattr(tasks, "search_pool", None)
+    monkeypatch.setattr(tasks, "result_cache", None)
+    stub_worker = Worker(broker, worker_timeout=100)
+    stub_worker.start()
+    yield tasks
+    stub_worker.stop()
+    tasks.close_search_engines()
+
+
+@pytest.mark.asyncio
+async def test_packed_corpus_version(monkeypatch, tasks, job_repository):
+    await PackedSongRepository.pack(MockRepository(), config.PACKED_CORPUS_PATH)
+    assert isinstance(tasks.get_song_repository(), PackedSongRepository)
+    assert run_search(tasks, job_repository).status == JobStatus.COMPLETED
+    engine = tasks.get_search_engine("lcs", False)
+    assert isinstance(engine.repository, PackedSongRepository)
+
+    monkeypatch.setattr(MockRepository, "get_corpus_version", lambda self: "1")
+    assert isinstance(tasks.get_song_repository(), MockRepository)
+    tasks.result_cache = None
+    job = run_search(tasks, job_repository)
+    assert job.status == JobStatus.COMPLETED
+    assert job.results is not None and len(job.results) == 5
+    assert isinstance(tasks.get_search_engine("lcs", False).repository, MockRepository)
+
+
+@pytest.mark.asyncio
+async def test_segment_index_version(monkeypatch, tasks, job_repository):
+    index = await SegmentIndex.build(
+        MockRepository(), SearchEngineFactory.create_preprocessor()
+    )
+    index.save(config.SEGMENT_INDEX_PATH)
+    assert run_search(tasks, job_repository).status == JobStatus.COMPLETED
+    assert tasks.segment_index is not None
+    engine = tasks.get_search_engine("lcs", False)
+    assert isinstance(engine, SearchEngineSegmentIndex)
+
+    monkeypatch.setattr(MockRepository, "get_corpus_version", lambda self: "1")
+    tasks.result_cache = None
+    job = run_search(tasks, job_repository)
+    assert job.status == JobStatus.COMPLETED
+    assert job.results is not None and len(job.results) == 5
+    assert tasks.segment_index is None
+    engine = tasks.get_search_engine("lcs", False)
+    assert not isinstance(engine, SearchEngineSegmentIndex)
+
+
+def run_search(tasks, job_repository: MemoryJobRepository):
+    job = job_repository.create_job()
+    tasks.search.send(QUERY, job.id)
+    broker = dramatiq.get_broker()
+    broker.join(tasks.search.queue_name, fail_fast=True)
+    return job_repository.get_job(job.id)
+
+
+def test_search(tasks, job_repository):
+    job = run_search(tasks, job_repository)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.progress == 100
+    assert job.results is not None and len(job.results) == 5
+
+
+def test_search_shards(monkeypatch, tasks, job_repository):
+    expected = run_search(tasks, job_repository)
+    tasks.result_cache = None
+
+    monkeypatch.setattr(config, "SEARCH_SHARD_COUNT", 3)
+    job = run_search(tasks, job_repository)
+
+    assert len(job_repository.shard_results[job.id]) == 3
+    assert job.status == JobStatus.COMPLETED
+    assert job.results == expected.results
+    assert expected.results is not None and len(expected.results) == 5
+
+
+def test_search_shard_failure(monkeypatch, tasks, job_repository):
+    expected = run_search(tasks, job_repository)
+    tasks.result_cache = None
+    find_similar_async = SearchEngine.find_similar_async
+
+    async def fail_first_shard(self, n, track, keys=None, context=None):
+        if keys is not None and "0" in keys:
+            raise RuntimeError("Shard failed")
+        return await find_similar_async(self, n, track, keys, context)
+
+    monkeypatch.setattr(SearchEngine, "find_similar_async", fail_first_shard)
+    monkeypatch.setattr(config, "SEARCH_SHARD_COUNT", 3)
+    job = run_search(tasks, job_repository)
+
+    assert len(job_repository.shard_results[job.id]) == 3
+    assert job.status == JobStatus.COMPLETED
+    assert job.partial
+    assert expected.results is not None and job.results is not None
+    assert 0 < len(job.results) < len(expected.results)
+    assert all(i in expected.results for i in job.results)
+
+
+def test_search_cancelled(tasks, job_repository):
+    job = job_repository.create_job()
+    job_repository.cancel_job(job.id)
+    tasks.search.send(QUERY, job.id)
+    dramatiq.get_broker().join(tasks.search.queue_name, fail_fast=True)
+    job = job_repository.get_job(job.id)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.partial
+    assert job.results == []
+
+
+def test_search_deadline(tasks, job_repository):
+    job = job_repository.create_job()
+    tasks.search.send(QUERY, job.id, time.time() - 1)
+    dramatiq.get_broker().join(tasks.search.queue_name, fail_fast=True)
+    job = job_repository.get_job(job.id)
+
+    assert job.status == JobStatus.COMPLETED
+    assert job.partial
+    assert (
+        tasks.get_result_cache().get(
+            tasks.get_cache_key(
+                tasks.get_search_engine("lcs", False),
+                JsonParser.parse(QUERY).tracks[0],
+                False,
+                10,
+            )
+        )
+        is None
+    )
@@ -6,10 +6,20 @@ from dramatiq.brokers.redis import RedisBroker
 from dramatiq.results.backends import RedisBackend
 
 
+class SearchEngineShutdown(dramatiq.Middleware):
+    """Stops process pools of the worker's search engines on worker shutdown."""
+
+    def before_worker_shutdown(self, broker, worker):
+        from worker.tasks import close_search_engines
+
+        close_search_engines()
+
+
 def setup_broker():
     worker_backend = RedisBackend(url=config.REDIS_QUEUE_URL)
     broker = RedisBroker(url=config.REDIS_QUEUE_URL)
     broker.add_middleware(Results(backend=worker_backend))
+    broker.add_middleware(SearchEngineShutdown())
     logger = setup_logging()
     logger.info("Logging initialized")
     dramatiq.set_broker(broker)
@@ -1,26 +1,272 @@
 import dramatiq
+import logging
+import os
+import threading
+from typing import Optional
 from common.entity.job import JobStatus
+from common.entity.song import Track
 from common.util.parser.json_parser import JsonParser
+from common.search_engine.search_engine import SearchEngine
 from common.search_engine.search_engine_factory import SearchEngineFactory
+from common.search_engine.n_gram import generate_n_gram_classes
+from common.search_engine.progress import ProgressReporter
+from common.search_engine.result_cache import ResultCache
+from common.search_engine.search_context import SearchContext
+from common.search_engine.search_pool import SearchPool
+from common.search_engine.segment_index import SegmentIndex
+from common.search_engine.strategy.strategy_registry import strategy_registry
+from common.search_engine.top_k import TopK
+from common.util.helpers import split_list
 from common.repository.mongo_repository_factory import MongoRepositoryFactory
+from common.repository.packed_song_repository import PackedSongRepository
+from common.repository.song_repository import SongRepository
 import common.config as config
 import asyncio
 
+logger = logging.getLogger(config.DEFAULT_LOGGER)
+segment_index: Optional[SegmentIndex] = None
+# Engines live as long as the worker and share one warm process pool
+search_engines: dict[tuple[str, bool], SearchEngine] = dict()
+search_pool: Optional[SearchPool] = None
+engines_lock = threading.RLock()
+result_cache: Optional[ResultCache] = None
+
+
+def get_segment_index(repository: SongRepository) -> Optional[SegmentIndex]:
+    """Segment index matching the songs of repository, checked on every engine
+    build, since the repository may have changed since it was loaded."""
+    global segment_index
+    if segment_index is not None and not segment_index.is_current(repository):
+        log_outdated_index(segment_index, repository)
+        drop_segment_index()
+    if segment_index is None and os.path.isfile(config.SEGMENT_INDEX_PATH):
+        logger.info(f"Loading segment index from {config.SEGMENT_INDEX_PATH}")
+        index = SegmentIndex.load(config.SEGMENT_INDEX_PATH)
+        if not index.is_current(repository):
+            log_outdated_index(index, repository)
+            return None
+        segment_index = index
+        # Pool workers of all search engines attach to the same arrays
+        segment_index.share()
+    return segment_index
+
+
+def log_outdated_index(index: SegmentIndex, repository: SongRepository):
+    logger.warning(
+        f"Segment index was built from corpus version "
+        f"{index.corpus_version!r}, the repository is at "
+        f"{repository.get_corpus_version()!r}, searching without it"
+    )
+
+
+def drop_segment_index() -> None:
+    global segment_index
+    if segment_index is not None:
+        segment_index.unshare()
+        segment_index = None
+
+
+def get_song_repository() -> SongRepository:
+    repository = MongoRepositoryFactory().create_song_repository()
+    if PackedSongRepository.exists(config.PACKED_CORPUS_PATH):
+        packed = PackedSongRepository(config.PACKED_CORPUS_PATH)
+        if packed.is_current(repository):
+            logger.info(f"Using packed corpus {config.PACKED_CORPUS_PATH}")
+            return packed
+        log_outdated_corpus(packed, repository)
+    return repository
+
+
+def log_outdated_corpus(packed: PackedSongRepository, repository: SongRepository):
+    logger.warning(
+        f"Packed corpus was built from corpus version "
+        f"{packed.get_corpus_version()!r}, the database is at "
+        f"{repository.get_corpus_version()!r}, searching the database"
+    )
+
+
+def are_search_engines_current() -> bool:
+    """Whether the database has not outgrown the packed corpus or the segment
+    index the engines were created with."""
+    repository = next(iter(search_engines.values())).repository
+    if isinstance(repository, PackedSongRepository):
+        mongo_repository = MongoRepositoryFactory().create_song_repository()
+        if not repository.is_current(mongo_repository):
+            log_outdated_corpus(repository, mongo_repository)
+            return False
+    if segment_index is not None and not segment_index.is_current(repository):
+        log_outdated_index(segment_index, repository)
+        return False
+    return True
+
+
+def get_search_engines() -> dict[tuple[str, bool], SearchEngine]:
+    """Engines of all strategies with and without n-gram prefiltering. They are
+    created together, so that the pool workers hold all of them."""
+    with engines_lock:
+        if search_engines and not are_search_engines_current():
+            close_search_engines()
+        if not search_engines:
+            repository = get_song_repository()
+            index = get_segment_index(repository)
+            for strategy in strategy_registry.strategies():
+                for use_n_gram_prep in [False, True]:
+                    key = (strategy.shortcut, use_n_gram_prep)
+                    engine = SearchEngineFactory.create_search_engine(
+                        repository, strategy.shortcut, use_n_gram_prep, index
+                    )
+                    engine.use_shared_pool(get_search_pool, key)
+                    search_engines[key] = engine
+        return search_engines
+
+
+def get_search_pool() -> SearchPool:
+    global search_pool
+    with engines_lock:
+        if search_pool is None:
+            search_pool = SearchPool(
+                dict(get_search_engines()), SearchPool.get_max_process_count()
+            )
+        return search_pool
+
+
+def get_search_engine(similarity_strategy: str, use_n_gram_prep: bool) -> SearchEngine:
+    engine = get_search_engines().get((similarity_strategy, bool(use_n_gram_prep)))
+    if engine is None:
+        raise ValueError("Unknown similarity strategy")
+    return engine
+
+
+def get_result_cache() -> ResultCache:
+    global result_cache
+    if result_cache is None:
+        result_cache = ResultCache()
+    return result_cache
+
+
+def get_cache_key(
+    engine: SearchEngine, query_track: Track, use_n_gram_prep: bool, n: int
+) -> str:
+    query_classes = None
+    if use_n_gram_prep:
+        query_classes = generate_n_gram_classes(query_track)
+    return ResultCache.make_key(
+        engine.preprocessor.prep_track(query_track),
+        query_track.grid_length,
+        engine.similarity_strategy.shortcut,
+        use_n_gram_prep,
+        engine.repository.get_corpus_version(),
+        n,
+        query_classes,
+    )
+
+
+def close_search_engines() -> None:
+    global search_pool
+    with engines_lock:
+        if search_pool is not None:
+            search_pool.close()
+            search_pool = None
+        search_engines.clear()
+        drop_segment_index()
+
+
+def get_strategy_shortcut(data: dict) -> str:
+    return data.get("similarityStrategy", config.DEFAULT_STRATEGY)
+
+
+def get_engine(data: dict) -> tuple[SearchEngine, bool]:
+    similarity_strategy = get_strategy_shortcut(data)
+    use_n_gram_prep = data.get("useFasterSearch", config.USE_N_GRAM_PREP)
+    return get_search_engine(similarity_strategy, use_n_gram_prep), use_n_gram_prep
+
 
 @dramatiq.actor(max_retries=0)
-def search(data: dict, job_id: str):
+def search(data: dict, job_id: str, deadline: Optional[float] = None):
     song = JsonParser.parse(data)
-    fact = MongoRepositoryFactory()
-    repository = fact.create_song_repository()
-    job_repository = fact.create_job_repository()
-    similarity_strategy = data.get("similarityStrategy", config.DEFAULT_STRATEGY)
-    use_n_gram_prep = data.get("useFasterSearch", config.USE_N_GRAM_PREP)
-    engine = SearchEngineFactory.create_search_engine(
-        repository, similarity_strategy, use_n_gram_prep
-    )
+    job_repository = MongoRepositoryFactory().create_job_repository()
+    engine, use_n_gram_prep = get_engine(data)
+    n = 10
+
+    cache = get_result_cache()
+    cache_key = get_cache_key(engine, song.tracks[0], use_n_gram_prep, n)
+    similar_songs = cache.get(cache_key)
+    if similar_songs is not None:
+        job_repository.update_job(job_id, JobStatus.COMPLETED, similar_songs)
+        return
+
+    if job_repository.is_cancelled(job_id):
+        logger.debug(f"Job {job_id} was cancelled before it started")
+        job_repository.update_job(job_id, JobStatus.COMPLETED, [], True)
+        return
 
+    job_repository.update_progress(job_id, 0, [])
     loop = asyncio.new_event_loop()
+    if config.SEARCH_SHARD_COUNT > 1:
+        keys = loop.run_until_complete(engine.repository.list_keys())
+        shards = [i for i in split_list(keys, config.SEARCH_SHARD_COUNT) if len(i)]
+        if len(shards) > 1:
+            logger.debug(f"Splitting search of job {job_id} into {len(shards)} shards")
+            dramatiq.group(
+                search_shard.message(
+                    data, job_id, i, len(shards), list(shard), n, cache_key, deadline
+                )
+                for i, shard in enumerate(shards)
+            ).run()
+            return
+
+    context = SearchContext(
+        deadline,
+        lambda: job_repository.is_cancelled(job_id),
+        ProgressReporter(lambda p, r: job_repository.update_progress(job_id, p, r)),
+    )
     similar_songs = loop.run_until_complete(
-        engine.find_similar_async(10, song.tracks[0])
+        engine.find_similar_async(n, song.tracks[0], context=context)
+    )
+    # Partial results depend on timing, they are not cached
+    if not context.partial:
+        cache.set(cache_key, similar_songs)
+    job_repository.update_job(
+        job_id, JobStatus.COMPLETED, similar_songs, context.partial
     )
-    job_repository.update_job(job_id, JobStatus.COMPLETED, similar_songs)
+
+
+@dramatiq.actor(max_retries=0)
+def search_shard(
+    data: dict,
+    job_id: str,
+    shard: int,
+    shard_count: int,
+    keys: list[str],
+    n: int,
+    cache_key: str,
+    deadline: Optional[float] = None,
+):
+    """Search songs with the given keys, the last shard to finish merges the
+    results of all shards. A failed shard counts as empty and partial, so that
+    the job still completes."""
+    job_repository = MongoRepositoryFactory().create_job_repository()
+    try:
+        song = JsonParser.parse(data)
+        engine, _ = get_engine(data)
+        context = SearchContext(deadline, lambda: job_repository.is_cancelled(job_id))
+        loop = asyncio.new_event_loop()
+        results = loop.run_until_complete(
+            engine.find_similar_async(n, song.tracks[0], keys, context)
+        )
+        partial = context.partial
+    except Exception:
+        logger.exception(f"Shard {shard} of job {job_id} failed")
+        results, partial = [], True
+    shard_results = job_repository.add_shard_results(
+        job_id, shard, shard_count, results, partial
+    )
+    if shard_results is None:
+        return
+
+    result_lists, partial = shard_results
+    strategy = strategy_registry.get(get_strategy_shortcut(data))
+    similar_songs = TopK.merge(result_lists, n, strategy.highest_first)
+    if not partial:
+        get_result_cache().set(cache_key, similar_songs)
+    job_repository.update_job(job_id, JobStatus.COMPLETED, similar_songs, partial)
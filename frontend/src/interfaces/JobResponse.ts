@@ -2,6 +2,8 @@ import { SearchResultResponse } from "./SearchResultResponse";
 
 export interface JobResponse {
     id: string;
-    status: "pending" | "completed";
+    status: "pending" | "running" | "completed";
     results: SearchResultResponse[] | null;
+    progress: number;
+    partial: boolean;
 }
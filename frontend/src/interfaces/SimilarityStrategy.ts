@@ -1,4 +1,12 @@
+export interface StrategyCapabilities {
+    batchable: boolean;
+    metric: boolean;
+    bounded: boolean;
+    index_backed: boolean;
+}
+
 export interface SimilarityStrategy {
     name: string;
     shortcut: string;
+    capabilities?: StrategyCapabilities;
 }